@@ -1,17 +1,23 @@
-from .utils import MessageData, message_data_to_list, EnvelopeData
-
 from .DMCText import (
     DMCMessageParser, 
     FormatParser, 
     DMCMessageBuilder, 
     put_into_message_envelope, 
-    count_compressed_ascii_characters
+    count_compressed_ascii_characters,
+    compact_square_dmc_size,
+    compact_rectangular_dmc_size
 )
-from .DMCGenerator import generate_dmc_from_string
 
-from typing import Union, Dict, List
+import threading
+from collections import OrderedDict
+from typing import Union, Dict, List, Any, Hashable, TYPE_CHECKING
 from pathlib import Path
-from PIL import Image
+
+# rendering (treepoem, pillow) and the data models (pydantic) are imported where they are needed, so that this
+# module (e.g. parse_dmc()) can be used without them
+if TYPE_CHECKING:
+    from PIL import Image
+    from .utils import MessageData
 
 
 class DataMatrixCode:
@@ -35,11 +41,16 @@ class DataMatrixCode:
         envelopes = dict()
         for env in data:
             for fmt, flds in env.items():
-                if fmt in data:
-                    for ky, val in flds:
-                        envelopes[fmt][ky] = val
+                if fmt not in envelopes:
+                    # copy, so that merging does not modify the input
+                    envelopes[fmt] = dict(flds) if isinstance(flds, dict) else list(flds)
+                elif isinstance(envelopes[fmt], dict) and isinstance(flds, dict):
+                    envelopes[fmt].update(flds)
                 else:
-                    envelopes[fmt] = flds
+                    # fields as strings (e.g. "S123456")
+                    if isinstance(envelopes[fmt], dict):
+                        envelopes[fmt] = [f"{ky}{val}" for ky, val in envelopes[fmt].items()]
+                    envelopes[fmt] += [f"{ky}{val}" for ky, val in flds.items()] if isinstance(flds, dict) else flds
 
         valid_content, _ = validate_envelope_format(envelopes)
         return valid_content
@@ -69,7 +80,28 @@ class DataMatrixCode:
     def n_ascii_characters(self) -> int:
         return count_compressed_ascii_characters(self.get_message())
 
+    def get_symbol_size(self, rectangular_dmc: bool = False) -> str:
+        """rows x columns of the most compact symbol for the message (estimated from the ASCII encodation)"""
+        message = self.get_message()
+        n_rows, n_cols = compact_rectangular_dmc_size(message) if rectangular_dmc else compact_square_dmc_size(message)
+        return f"{n_rows}x{n_cols}"
+
+    def validate_fields(self) -> Dict[str, List[dict]]:
+        """validation result of every field of the input data per format"""
+        results = dict()
+        for env in self.data:
+            for fmt, flds in env.items():
+                fields = [f"{ky}{val}" for ky, val in flds.items()] if isinstance(flds, dict) else flds
+                segments, _ = FormatParser(fmt, fields, strict=False, verbose=False).parse_compact()
+                results.setdefault(fmt, []).extend(
+                    {"data_identifier": di, "content": string, "valid": valid}
+                    for di, string, valid in zip(segments.data_identifiers, segments.strings, segments.code_valid)
+                )
+        return results
+
     def generate_image(self):
+        from .DMCGenerator import generate_dmc_from_string
+
         content_string = self.get_message()
         return generate_dmc_from_string(
             content_string=content_string,
@@ -94,23 +126,22 @@ def validate_envelope_format(
             messages = flds
         else:
             raise ValueError(f"Unexpected input type {type(flds)}.")
-        segments, segment_valid = FormatParser(fmt, messages, strict=False, verbose=False).parse(do_type_cast)
+        segments, segment_valid = FormatParser(fmt, messages, strict=False, verbose=False).parse_compact(do_type_cast)
         
         format_not_valid |= (not segment_valid)
         # keep only valid envelopes
-        if keep_only_valid_fields:
-            valid_envelopes[fmt] = {el["data_identifier"]: el["content"] for el in segments if el["code_valid"]}
-        else:
-            valid_envelopes[fmt] = {el["data_identifier"]: el["content"] for el in segments}
+        valid_envelopes[fmt] = segments.as_dict(only_valid=keep_only_valid_fields)
 
     all_formats_valid = not format_not_valid
     return valid_envelopes, all_formats_valid
 
 
-def generate_dmc(data: MessageData, file_path: Union[str, Path] = None) -> Union[Image.Image, Path]:
+def generate_dmc(data: "MessageData", file_path: Union[str, Path] = None) -> Union["Image.Image", Path]:
     """wrapper"""
+    from .utils import message_data_to_list
+
     args = {
-        "n_quiet_zone_moduls": data.n_quiet_zone_moduls,
+        "n_quiet_zone_modules": data.n_quiet_zone_moduls,
         "rectangular_dmc": data.rectangular_dmc,
         "use_format_envelope": data.use_format_envelope,
         "use_message_envelope": data.use_message_envelope
@@ -122,8 +153,10 @@ def generate_dmc(data: MessageData, file_path: Union[str, Path] = None) -> Union
     return DataMatrixCode(data=fields, **args).generate_image()
 
 
-def generate_message_string(data: MessageData) -> str:
+def generate_message_string(data: "MessageData") -> str:
     """wrapper"""
+    from .utils import message_data_to_list
+
     args = {
         "use_format_envelope": data.use_format_envelope,
         "use_message_envelope": data.use_message_envelope
@@ -133,13 +166,114 @@ def generate_message_string(data: MessageData) -> str:
     return DataMatrixCode(data=fields, **args).get_message()
 
 
-def parse_dmc(text: str, check_format: bool = True, do_type_cast: bool = False) -> Dict[str, List[str]]:
+def describe_dmc(data: "MessageData") -> Dict[str, Any]:
+    """wrapper: message string, validation of the fields, number of codewords and symbol size of one message"""
+    from .utils import message_data_to_list
+
+    code = DataMatrixCode(
+        data=message_data_to_list(data),
+        use_format_envelope=data.use_format_envelope,
+        use_message_envelope=data.use_message_envelope
+    )
+    return {
+        "message": code.get_message(),
+        "fields": code.validate_fields(),
+        "n_ascii_characters": code.n_ascii_characters,
+        "symbol_size": code.get_symbol_size(data.rectangular_dmc),
+    }
+
+
+class FrozenDict(dict):
+    """
+    read-only dictionary (e.g. a cached result that is shared by all callers); copy() returns a plain dict in which
+    nested FrozenDicts are plain dicts too
+    """
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"'{type(self).__name__}' object is read-only. Use copy() to modify it.")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def copy(self) -> dict:
+        return {key: value.copy() if isinstance(value, FrozenDict) else value for key, value in self.items()}
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class ParseCache:
+    """
+    Thread-safe LRU cache of the results of parse_dmc(), keyed by the message string and the options of the parser
+    (e.g. the same label scanned by several scanners or scanned again). The results are read-only (FrozenDict).
+    """
+    def __init__(self, max_items: int = 4096):
+        self.max_items = max_items
+        self._items: "OrderedDict[Hashable, FrozenDict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"ParseCache(max_items={self.max_items}, items={len(self._items)})"
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Union[FrozenDict, None]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._items.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: FrozenDict):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {"items": len(self._items), "max_items": self.max_items, "hits": self.hits, "misses": self.misses}
+
+
+# results of parse_dmc() (None: no caching)
+parse_cache: Union[ParseCache, None] = ParseCache()
+
+
+def parse_dmc(text: str, check_format: bool = True, do_type_cast: bool = False,
+              use_cache: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    fields per format of a message string; the results are cached (see parse_cache) and therefore read-only
+    (FrozenDict), use copy() to modify them
+    """
+    cache = parse_cache if use_cache else None
+    key = (text, check_format, do_type_cast)
+    if cache is not None:
+        content = cache.get(key)
+        if content is not None:
+            return content
+
     content = DMCMessageParser(text).get_content()
     content, _ = validate_envelope_format(content, do_type_cast, check_format)
+    content = FrozenDict((fmt, FrozenDict(flds)) for fmt, flds in content.items())
+    if cache is not None:
+        cache.put(key, content)
     return content
 
 
 if __name__ == "__main__":
+    from .utils import MessageData, EnvelopeData
+
     # Example generate_dmc(), a wrapper function to generate a DMC
     info = MessageData(messages=[EnvelopeData(fields={"S": 1234567})])
     img = generate_dmc(info)
@@ -0,0 +1,160 @@
+import asyncio
+import io
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from typing import Union, Iterable, Iterator, AsyncIterator, Deque, Tuple, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from .utils import MessageData
+
+# outputs of generate_many(): the message string, the pillow image or an encoded image / printer raster
+BATCH_OUTPUTS = ("message", "image", "png", "bmp", "pcx", "zpl", "zpl-hex")
+
+
+def generate_one(data: "MessageData", output: str = "image") -> Union[str, bytes, "Image.Image"]:
+    """message string, image or encoded image (output format, see BATCH_OUTPUTS) of one message"""
+    from .DMC import generate_message_string
+
+    message = generate_message_string(data)
+    if output == "message":
+        return message
+
+    from .DMCGenerator import generate_dmc_from_string, generate_raster_from_string
+    if output == "image":
+        return generate_dmc_from_string(message, rectangular_dmc=data.rectangular_dmc,
+                                        n_quiet_zone_modules=data.n_quiet_zone_moduls)
+
+    from .DMCPrinter import encode_raster
+    if output == "png" and data.module_size_dots is None:
+        img = generate_dmc_from_string(message, rectangular_dmc=data.rectangular_dmc,
+                                       n_quiet_zone_modules=data.n_quiet_zone_moduls)
+        buffer = io.BytesIO()
+        img.save(buffer, format="PNG")
+        return buffer.getvalue()
+    # printer rasters: every module is an exact block of module_size_dots dots
+    img = generate_raster_from_string(message, module_size_dots=data.module_size_dots or 4,
+                                      n_quiet_zone_modules=data.n_quiet_zone_moduls,
+                                      rectangular_dmc=data.rectangular_dmc)
+    return encode_raster(img, output, data.dpi)
+
+
+def _get_executor(workers: int, executor: Union[str, Executor]) -> Tuple[Executor, bool]:
+    """executor and whether it is owned (i.e. to be shut down) by the caller"""
+    if isinstance(executor, Executor):
+        return executor, False
+    elif executor == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dmc-generate"), True
+    elif executor == "process":
+        return ProcessPoolExecutor(max_workers=workers), True
+    raise ValueError(f"Unknown executor '{executor}'. Use 'thread', 'process' or an Executor.")
+
+
+def _check_options(output: str, workers: int, prefetch: Union[int, None]) -> int:
+    if output not in BATCH_OUTPUTS:
+        raise ValueError(f"Unknown output '{output}'. Use one of {list(BATCH_OUTPUTS)}.")
+    if workers < 0:
+        raise ValueError(f"The number of workers must not be negative, not {workers}.")
+    prefetch = 2 * max(1, workers) if prefetch is None else prefetch
+    if prefetch < 1:
+        raise ValueError(f"At least one message must be prefetched, not {prefetch}.")
+    return prefetch
+
+
+def generate_many(
+        data: Iterable["MessageData"],
+        workers: int = 4,
+        output: str = "image",
+        ordered: bool = True,
+        prefetch: int = None,
+        executor: Union[str, Executor] = "thread"
+) -> Iterator[Any]:
+    """
+    Lazily generates the messages of an iterable of MessageData on a pool of workers (threads, processes or a given
+    Executor). At most prefetch messages (default: 2 x workers) are in progress or finished but not yet consumed, so
+    the input is consumed only as fast as the results are, and memory stays flat for arbitrarily long inputs.
+    Yields the results in the order of the input, or with ordered=False as (index, result) as soon as they are
+    ready. An exception of a message is raised when its result is reached; closing the iterator cancels the pending
+    messages. workers=0 generates the messages one by one in the calling thread.
+    """
+    prefetch = _check_options(output, workers, prefetch)
+    if workers == 0:
+        for i, el in enumerate(data):
+            result = generate_one(el, output)
+            yield result if ordered else (i, result)
+        return
+
+    pool, owned = _get_executor(workers, executor)
+    items = enumerate(data)
+    pending: Deque[Tuple[int, Future]] = deque()
+    try:
+        for i, el in items:
+            pending.append((i, pool.submit(generate_one, el, output)))
+            if len(pending) >= prefetch:
+                break
+
+        while pending:
+            if ordered:
+                i, future = pending.popleft()
+                result = future.result()
+            else:
+                done, _ = wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+                i, future = next((i, future) for i, future in pending if future in done)
+                pending.remove((i, future))
+                result = (i, future.result())
+            # refill before handing out the result, so that the workers stay busy while the caller consumes it
+            for j, el in items:
+                pending.append((j, pool.submit(generate_one, el, output)))
+                break
+            yield result
+    finally:
+        for _, future in pending:
+            future.cancel()
+        if owned:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def generate_many_async(
+        data: Iterable["MessageData"],
+        workers: int = 4,
+        output: str = "image",
+        ordered: bool = True,
+        prefetch: int = None,
+        executor: Union[str, Executor] = "thread"
+) -> AsyncIterator[Any]:
+    """generate_many() for asyncio: async for img in generate_many_async(data): ... (the event loop is not blocked)"""
+    prefetch = _check_options(output, workers, prefetch)
+    loop = asyncio.get_running_loop()
+    # workers=0: one message at a time in the default executor of the loop
+    pool, owned = _get_executor(workers, executor) if workers else (None, False)
+    items = enumerate(data)
+    pending: Deque[Tuple[int, asyncio.Future]] = deque()
+
+    def submit(index: int, message_data: "MessageData"):
+        pending.append((index, loop.run_in_executor(pool, generate_one, message_data, output)))
+
+    try:
+        for i, el in items:
+            submit(i, el)
+            if len(pending) >= prefetch or not workers:
+                break
+
+        while pending:
+            if ordered:
+                i, future = pending.popleft()
+                result = await future
+            else:
+                done, _ = await asyncio.wait([future for _, future in pending], return_when=asyncio.FIRST_COMPLETED)
+                i, future = next((i, future) for i, future in pending if future in done)
+                pending.remove((i, future))
+                result = (i, future.result())
+            for j, el in items:
+                submit(j, el)
+                break
+            yield result
+    finally:
+        for _, future in pending:
+            future.cancel()
+        if owned:
+            pool.shutdown(wait=False, cancel_futures=True)
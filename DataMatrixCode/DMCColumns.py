@@ -0,0 +1,288 @@
+import csv
+import itertools
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+
+from .DMCText import DMCMessageParser, FormatParser, get_date_format, easy_datetime_format_converter
+from .utils import FORMAT_ANSI_MH_10, message_formats
+
+from typing import Union, Dict, List, Iterable, Iterator, Any, TextIO
+
+
+# types of the columns of the data identifiers
+COLUMN_STRING, COLUMN_NUMBER, COLUMN_DATE = "string", "number", "date"
+# output formats of write_columns()
+COLUMN_FORMATS = ("csv", "parquet", "arrow")
+# data identifiers of quantities and measures (typed as numbers); all other numeric fields are identifiers (GTIN,
+# SSCC, DUNS, ...) whose digits must be kept as text
+NUMBER_DATA_IDENTIFIERS = {
+    FORMAT_ANSI_MH_10: (
+        "2E", "3E", "4E", "5E", "6E",  # temperatures and relative humidities
+        "Q", "1Q", "2Q", "8Q", "11Q",  # quantities and weights
+        "27Q", "28Q", "29Q", "30Q",  # prices and percentages
+    )
+}
+
+
+def get_date_time_format(data_identifier: str, message_format: str = FORMAT_ANSI_MH_10) -> Union[str, None]:
+    """strptime() format of a date data identifier or None (no date or a format strptime cannot parse)"""
+    mapping = message_formats(message_format).get_di_mapping()
+    if data_identifier not in mapping or data_identifier[-1] != "D":
+        return None
+    m = get_date_format(mapping[data_identifier]["Explanation"])
+    if not m:
+        return None
+    try:
+        datetime_format = easy_datetime_format_converter(m.group())
+    except Exception:
+        # e.g. Julian dates (YDDD)
+        return None
+    # strptime() accepts every directive only once (not e.g. ranges YYYYMMDDYYYYMMDD)
+    directives = re.findall(r"%\w", datetime_format)
+    return datetime_format if len(set(directives)) == len(directives) else None
+
+
+def get_column_type(data_identifier: str, message_format: str = FORMAT_ANSI_MH_10) -> str:
+    """date (date format in the explanation), number (quantities and measures, see NUMBER_DATA_IDENTIFIERS) or string"""
+    if get_date_time_format(data_identifier, message_format):
+        return COLUMN_DATE
+    if data_identifier in NUMBER_DATA_IDENTIFIERS.get(message_formats(message_format).di_format, ()):
+        return COLUMN_NUMBER
+    # dates that strptime() cannot parse (e.g. Julian dates, ranges) are kept as text
+    return COLUMN_STRING
+
+
+class ColumnarParser:
+    """
+    Parses messages into columns (batches of lists per column) instead of dictionaries per field: one column per
+    data identifier with its content, typed for dates (datetime) and numbers (float), and a validity mask
+    '<DI>_valid' (None: field not in the message). Typed columns are None for invalid fields; string columns keep
+    the text. Fields of other data identifiers or formats go to the column 'extra' (JSON), messages that cannot be
+    parsed get an 'error'.
+    """
+    def __init__(self, data_identifiers: List[str], message_format: str = FORMAT_ANSI_MH_10,
+                 include_text: bool = False) -> None:
+        self.message_format = message_formats(message_format).di_format
+        self.data_identifiers = list(dict.fromkeys(data_identifiers))
+        self.types = {di: get_column_type(di, self.message_format) for di in self.data_identifiers}
+        self._date_formats = {di: get_date_time_format(di, self.message_format)
+                              for di, typ in self.types.items() if typ == COLUMN_DATE}
+        self.include_text = include_text
+
+        self.column_names = ["text"] if include_text else []
+        for di in self.data_identifiers:
+            self.column_names += [di, f"{di}_valid"]
+        self.column_names += ["extra", "error"]
+
+    def __repr__(self):
+        return f"ColumnarParser({self.message_format}, data_identifiers={self.data_identifiers})"
+
+    def new_batch(self) -> Dict[str, list]:
+        return {name: [] for name in self.column_names}
+
+    def _cast(self, data_identifier: str, text: str) -> Union[float, datetime, None]:
+        try:
+            if self.types[data_identifier] == COLUMN_DATE:
+                return datetime.strptime(text, self._date_formats[data_identifier])
+            return float(text)
+        except ValueError:
+            return None
+
+    def append(self, batch: Dict[str, list], text: str, index: int):
+        """
+        parses a message string into row index of the batch; only the columns of the fields of the message are
+        touched (the others are padded with None, see pad())
+        """
+        row: Dict[str, Any] = dict()
+        extra = dict()
+        try:
+            content = DMCMessageParser(text).get_content()
+            for fmt, fields in content.items():
+                if fmt != self.message_format:
+                    extra[fmt] = fields
+                    continue
+                segments, _ = FormatParser(fmt, fields, strict=False, verbose=False).parse_compact()
+                for di, value, valid in zip(segments.data_identifiers, segments.strings, segments.code_valid):
+                    if di not in self.types:
+                        extra[di] = value
+                        continue
+                    if self.types[di] != COLUMN_STRING:
+                        value = self._cast(di, value) if valid else None
+                        valid = value is not None
+                    row[di] = value
+                    row[f"{di}_valid"] = valid
+        except Exception as ex:
+            row = {"error": f"{type(ex).__name__}: {ex}"}
+        if extra:
+            row["extra"] = json.dumps(extra)
+        if self.include_text:
+            row["text"] = text
+        for name, value in row.items():
+            column = batch[name]
+            if len(column) < index:
+                column.extend([None] * (index - len(column)))
+            column.append(value)
+
+    @staticmethod
+    def pad(batch: Dict[str, list], n_rows: int) -> Dict[str, list]:
+        for column in batch.values():
+            if len(column) < n_rows:
+                column.extend([None] * (n_rows - len(column)))
+        return batch
+
+    def parse(self, texts: Iterable[str], batch_size: int = 10000) -> Iterator[Dict[str, list]]:
+        """batches of at most batch_size rows (one pass over the messages, memory bounded by the batch size)"""
+        batch, n = self.new_batch(), 0
+        for text in texts:
+            self.append(batch, text, n)
+            n += 1
+            if n >= batch_size:
+                yield self.pad(batch, n)
+                batch, n = self.new_batch(), 0
+        if n:
+            yield self.pad(batch, n)
+
+
+def find_data_identifiers(texts: Iterable[str], message_format: str = FORMAT_ANSI_MH_10) -> List[str]:
+    """data identifiers of the messages in the order of their first occurrence"""
+    message_format = message_formats(message_format)
+    pattern = re.compile(message_format.get_di_pattern())
+    found = dict()
+    for text in texts:
+        try:
+            fields = DMCMessageParser(text).get_content().get(message_format.di_format, [])
+        except Exception:
+            continue
+        for fld in fields:
+            m = pattern.match(fld)
+            if m:
+                found[m.group()] = None
+    return list(found)
+
+
+def parse_columns(
+        texts: Iterable[str],
+        data_identifiers: List[str] = None,
+        message_format: str = FORMAT_ANSI_MH_10,
+        batch_size: int = 10000,
+        include_text: bool = False
+) -> (ColumnarParser, Iterator[Dict[str, list]]):
+    """
+    parser and lazy batches of columns of the messages; without data_identifiers, the columns are the data
+    identifiers found in the first batch (later ones go to the column 'extra')
+    """
+    texts = iter(texts)
+    if data_identifiers is None:
+        first = list(itertools.islice(texts, batch_size))
+        data_identifiers = find_data_identifiers(first, message_format)
+        texts = itertools.chain(first, texts)
+    parser = ColumnarParser(data_identifiers, message_format, include_text)
+    return parser, parser.parse(texts, batch_size)
+
+
+_CSV_BOOLEANS = {True: "true", False: "false", None: None}
+
+
+def _csv_column(values: list, column_type: str) -> list:
+    """values of a typed column as CSV text (csv.writer writes None as empty field)"""
+    if column_type == "valid":
+        return [_CSV_BOOLEANS[value] for value in values]
+    elif column_type == COLUMN_NUMBER:
+        return [None if value is None else int(value) if value.is_integer() else value for value in values]
+    elif column_type == COLUMN_DATE:
+        return [None if value is None else value.isoformat() for value in values]
+    return values
+
+
+def iter_csv(parser: ColumnarParser, batches: Iterable[Dict[str, list]]) -> Iterator[str]:
+    """CSV text (header first, then one chunk per batch)"""
+    column_types = {f"{di}_valid": "valid" for di in parser.data_identifiers} | parser.types
+    buffer = _TextBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(parser.column_names)
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.clear()
+        columns = [_csv_column(batch[name], column_types.get(name, COLUMN_STRING)) for name in parser.column_names]
+        writer.writerows(zip(*columns))
+        yield buffer.getvalue()
+
+
+class _TextBuffer(list):
+    # minimal file-like object for csv.writer (cheaper than io.StringIO for a single join)
+    write = list.append
+
+    def getvalue(self) -> str:
+        return "".join(self)
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise ImportError("The output formats parquet and arrow require pyarrow (pip install pyarrow).")
+
+
+def get_arrow_schema(parser: ColumnarParser):
+    pa = _import_pyarrow()
+    types = {COLUMN_STRING: pa.string(), COLUMN_NUMBER: pa.float64(), COLUMN_DATE: pa.timestamp("s")}
+    fields = [pa.field("text", pa.string())] if parser.include_text else []
+    for di in parser.data_identifiers:
+        fields += [pa.field(di, types[parser.types[di]]), pa.field(f"{di}_valid", pa.bool_())]
+    fields += [pa.field("extra", pa.string()), pa.field("error", pa.string())]
+    return pa.schema(fields)
+
+
+def write_columns(
+        texts: Iterable[str],
+        file: Union[str, Path, TextIO, Any],
+        output_format: str = "csv",
+        data_identifiers: List[str] = None,
+        message_format: str = FORMAT_ANSI_MH_10,
+        batch_size: int = 10000,
+        include_text: bool = False
+) -> int:
+    """
+    parses the messages in a single pass into a CSV, Parquet or Arrow IPC file (path or open file) and returns the
+    number of rows; memory is bounded by batch_size
+    """
+    output_format = output_format.lower()
+    if output_format not in COLUMN_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Use one of {list(COLUMN_FORMATS)}.")
+    parser, batches = parse_columns(texts, data_identifiers, message_format, batch_size, include_text)
+
+    n_rows = 0
+
+    def count(batch_iterator: Iterable[Dict[str, list]]) -> Iterator[Dict[str, list]]:
+        nonlocal n_rows
+        for batch in batch_iterator:
+            n_rows += len(batch["extra"])
+            yield batch
+
+    if output_format == "csv":
+        fid = open(file, "w", newline="", encoding="utf-8") if isinstance(file, (str, Path)) else file
+        try:
+            for chunk in iter_csv(parser, count(batches)):
+                fid.write(chunk)
+        finally:
+            if fid is not file:
+                fid.close()
+        return n_rows
+
+    pa = _import_pyarrow()
+    schema = get_arrow_schema(parser)
+    file = str(file) if isinstance(file, Path) else file
+    if output_format == "parquet":
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(file, schema)
+    else:
+        writer = pa.ipc.new_file(file, schema)
+    try:
+        for batch in count(batches):
+            writer.write_batch(pa.RecordBatch.from_pydict(batch, schema=schema))
+    finally:
+        writer.close()
+    return n_rows
@@ -1,16 +1,93 @@
-import treepoem
+import threading
+import time
 import uuid
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Union, Dict, Any
-from PIL import Image, EpsImagePlugin
+from typing import List, Union, Dict, Any, Callable, Hashable, Tuple, TYPE_CHECKING
 import warnings
 import sys
 
-from .DMCText import DMCMessageBuilder, count_compressed_ascii_characters
+from .DMCText import DMCMessageBuilder, compact_rectangular_dmc_size
+
+# treepoem and pillow are imported on the first render, so that importing this module (e.g. DMCGenerator from the
+# package) stays cheap
+if TYPE_CHECKING:
+    from PIL import Image
+
 # mm to point conversion: 2.8346 pt per mm
 
 
+class RenderTimeout(TimeoutError):
+    """the deadline of a render passed"""
+
+
+def check_deadline(deadline: Union[float, None]):
+    # deadline: point in time of time.monotonic()
+    if deadline is not None and time.monotonic() >= deadline:
+        raise RenderTimeout("Deadline of the render exceeded.")
+
+
+def render_barcode(barcode_type: str, data: str, options: Union[Dict[str, Any], None] = None) -> "Image.Image":
+    """symbol (BWIPP via treepoem and ghostscript) as binary black/white image (pillow)"""
+    import treepoem
+
+    return treepoem.generate_barcode(barcode_type=barcode_type, data=data, options=options).convert('1')
+
+
+class MatrixCache:
+    """
+    Thread-safe LRU cache of module matrices (one pixel per module) and the module size of the rendered symbol in
+    pixels, keyed by message string and shape: quiet zones, module sizes and output formats are derived from the
+    cached matrix without rendering the symbol again.
+    """
+    def __init__(self, max_items: int = 4096):
+        self.max_items = max_items
+        self._items: "OrderedDict[Hashable, Tuple[Image.Image, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f"MatrixCache(max_items={self.max_items}, items={len(self._items)})"
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Union[Tuple["Image.Image", int], None]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._items.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Tuple["Image.Image", int]):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> Dict[str, Any]:
+        return {"items": len(self._items), "max_items": self.max_items, "hits": self.hits, "misses": self.misses}
+
+
 class DMCGenerator:
+    # module matrices of the rendered symbols (None: no caching)
+    matrix_cache: Union[MatrixCache, None] = MatrixCache()
+    # optional replacement of render_barcode with the additional argument deadline, e.g. to render in separate
+    # processes that can be killed if ghostscript hangs. Without it, the deadline is checked before and after the
+    # (uninterruptible) call of ghostscript.
+    symbol_renderer: Union[Callable[[str, str, Union[Dict[str, Any], None], Union[float, None]], "Image.Image"], None] = None
+
     def __init__(self, message: Union[str, List[str]] = None, modul_size_pt: int = 4) -> None:
         self.message = ''.join([c for c in message if c.isascii()])
         self.modul_size_pt = modul_size_pt
@@ -33,12 +110,28 @@ class DMCGenerator:
     def generate(self,
                  n_quiet_zone_modules: Union[int, None] = None,
                  rectangular_dmc: bool = False,
-                 file_path: Union[str, Path, None] = None
-                 ) -> Union[Image.Image, Path]:
+                 file_path: Union[str, Path, None] = None,
+                 deadline: Union[float, None] = None,
+                 use_cache: bool = True
+                 ) -> Union["Image.Image", Path]:
         # options Barcode Writer in Pure Postscript (BWIPP)
         # https://github.com/bwipp/postscriptbarcode/wiki/Data-Matrix
         # TODO: how to specify the modul size in pts?
+        # deadline: point in time (time.monotonic()) after which the render is aborted with RenderTimeout
+        # use_cache=False: neither reads nor fills the matrix cache (e.g. one-off batches)
 
+        modules, modul_size = self.get_matrix(rectangular_dmc, deadline=deadline, use_cache=use_cache)
+        dmc_image = self.modules_to_symbol(modules, modul_size)
+        # add quiet zone for final image of the code
+        img = self.add_quiet_zone(dmc_image, n_quiet_zone_modules)
+
+        if file_path is None:
+            return img
+        else:
+            return self.save_image(img, file_path)
+
+    def render_symbol(self, rectangular_dmc: bool = False, deadline: Union[float, None] = None) -> "Image.Image":
+        """Data-Matrix-Code without quiet zone as binary black/white image"""
         if rectangular_dmc:
             barcode_type = 'datamatrixrectangularextension'
             options = {'version': self.compact_rectangular_dmc_format()}
@@ -46,20 +139,75 @@ class DMCGenerator:
             barcode_type = 'datamatrix'
             options = None
         # create Data-Matrix-Code and convert image to binary black/white pixels (using pillow PIL)
-        dmc_image = treepoem.generate_barcode(barcode_type=barcode_type,
-                                              data=self.message,
-                                              options=options
-                                              ).convert('1')
-        # add quiet zone for final image of the code
-        img = self.add_quiet_zone(dmc_image, n_quiet_zone_modules)
+        check_deadline(deadline)
+        if self.symbol_renderer is not None:
+            return type(self).symbol_renderer(barcode_type, self.message, options, deadline)
+        img = render_barcode(barcode_type, self.message, options)
+        check_deadline(deadline)
+        return img
 
-        if file_path is None:
+    def get_matrix(self,
+                   rectangular_dmc: bool = False,
+                   deadline: Union[float, None] = None,
+                   use_cache: bool = True
+                   ) -> Tuple["Image.Image", int]:
+        """module matrix (one pixel per module) and the module size of the rendered symbol in pixels (cached)"""
+        key = (self.message, rectangular_dmc)
+        cache = self.matrix_cache if use_cache else None
+        matrix = cache.get(key) if cache is not None else None
+        if matrix is None:
+            symbol = self.render_symbol(rectangular_dmc, deadline=deadline)
+            modul_size = max(1, self.determine_modul_size_from_image(symbol))
+            matrix = (self.image_to_modules(symbol, modul_size), modul_size)
+            if cache is not None:
+                cache.put(key, matrix)
+        return matrix
+
+    def generate_modules(self,
+                         rectangular_dmc: bool = False,
+                         deadline: Union[float, None] = None,
+                         use_cache: bool = True
+                         ) -> "Image.Image":
+        """Data-Matrix-Code without quiet zone with one pixel per module"""
+        # a copy: the cached matrix must not be changed by the caller
+        return self.get_matrix(rectangular_dmc, deadline=deadline, use_cache=use_cache)[0].copy()
+
+    def generate_raster(self,
+                        module_size_dots: int = 4,
+                        n_quiet_zone_modules: Union[int, None] = 2,
+                        rectangular_dmc: bool = False,
+                        deadline: Union[float, None] = None,
+                        use_cache: bool = True
+                        ) -> "Image.Image":
+        """1-bit raster for label printers with module_size_dots x module_size_dots printer dots per module"""
+        from .DMCPrinter import modules_to_raster
+
+        modules = self.get_matrix(rectangular_dmc, deadline=deadline, use_cache=use_cache)[0]
+        return modules_to_raster(modules, module_size_dots, n_quiet_zone_modules)
+
+    @classmethod
+    def image_to_modules(cls, img: "Image.Image", modul_size: int = None) -> "Image.Image":
+        # downsample the rendered symbol to one pixel per module
+        from PIL import Image
+
+        if modul_size is None:
+            modul_size = cls.determine_modul_size_from_image(img)
+        if modul_size <= 1:
             return img
-        else:
-            return self.save_image(img, file_path)
+        size = (img.width // modul_size, img.height // modul_size)
+        return img.resize(size, Image.NEAREST, box=(0, 0) + cls.tuple_multiply(size, modul_size))
+
+    @classmethod
+    def modules_to_symbol(cls, modules: "Image.Image", modul_size: int) -> "Image.Image":
+        # upsample the module matrix to the resolution of the rendered symbol
+        from PIL import Image
+
+        if modul_size <= 1:
+            return modules.copy()
+        return modules.resize(cls.tuple_multiply(modules.size, modul_size), Image.NEAREST)
 
     @staticmethod
-    def save_image(img: Image.Image, file_path: Union[str, Path] = None) -> Path:
+    def save_image(img: "Image.Image", file_path: Union[str, Path] = None) -> Path:
         # current working directory as default input
         if file_path is None:
             file_path = Path().cwd()
@@ -79,20 +227,7 @@ class DMCGenerator:
 
     def compact_rectangular_dmc_format(self):
         # determine most compact rectangular format
-
-        binary_capacity = [3, 8, 14, 20, 30, 47, 54, 70, 78]
-        height = [8, 8, 12, 12, 16, 16, 20, 20, 22, 24]
-        width = [18, 32, 26, 36, 36, 48, 44, 48, 48]
-        # original
-        # binary_capacity = [3, 8, 14, 20, 30, 47]
-        # height = [8, 8, 12, 12, 16, 16]
-        # length = [18, 32, 26, 36, 36, 48]
-        n_compressed_ascii_chars = count_compressed_ascii_characters(self.message)
-
-        n_rows, n_cols = 0, 0
-        for cap, n_rows, n_cols in zip(binary_capacity, height, width):
-            if cap >= n_compressed_ascii_chars:
-                break
+        n_rows, n_cols = compact_rectangular_dmc_size(self.message)
         if n_rows > 16:
             warnings.warn('Data-matrix code rectangular extended (DMRE) version used. '
                           'Not all DMC-readers can handle this shape.')
@@ -101,7 +236,7 @@ class DMCGenerator:
         return f'{n_rows}x{n_cols}'
 
     @staticmethod
-    def determine_modul_size_from_image(img: Image) -> int:
+    def determine_modul_size_from_image(img: "Image.Image") -> int:
         # find starting point / starting offset
         offset = 0
         for i in range(min(img.size)):
@@ -118,8 +253,10 @@ class DMCGenerator:
 
         return modul_size
 
-    def add_quiet_zone(self, img: Image.Image, n_quiet_zone_modules: int = 2) -> Image.Image:
+    def add_quiet_zone(self, img: "Image.Image", n_quiet_zone_modules: int = 2) -> "Image.Image":
         # add quiet zone (pad image)
+        from PIL import Image
+
         if n_quiet_zone_modules:
             # size in pt
             sz_quiet_zone = int(n_quiet_zone_modules * self.modul_size_pt)
@@ -136,11 +273,17 @@ class DMCGenerator:
         return img_pad
     
 # wrapper
-def generate_dmc_from_string(content_string: str, **kwargs) -> Union[Image.Image, Path]:
+def generate_dmc_from_string(content_string: str, **kwargs) -> Union["Image.Image", Path]:
     return DMCGenerator(content_string).generate(**kwargs)
 
 
+def generate_raster_from_string(content_string: str, **kwargs) -> "Image.Image":
+    return DMCGenerator(content_string).generate_raster(**kwargs)
+
+
 if __name__ == "__main__":
+    from PIL import EpsImagePlugin
+
     if sys.platform.startswith("win") and EpsImagePlugin.gs_windows_binary is False:
         # This is a workaround if pillow cannot find ghostscript
         path_to_gs = Path(r"C:\Program Files\gs")
@@ -0,0 +1,129 @@
+import io
+from PIL import Image
+
+from .DMCPrinterCommands import COMMAND_FORMATS
+
+from typing import Tuple
+
+
+# raster formats of label printers and their media types
+PRINTER_FORMATS = {
+    "zpl": "text/plain",  # ZPL ^GF graphic field, ASCII hex (ASCII-compressed)
+    "zpl-hex": "text/plain",  # ZPL ^GF graphic field, plain ASCII hex
+    "pcx": "image/x-pcx",
+    "bmp": "image/bmp",
+}
+IMAGE_FORMATS = {"png": "image/png"} | PRINTER_FORMATS
+# all outputs of the image endpoints: images, rasters and barcode commands of label printers
+OUTPUT_FORMATS = IMAGE_FORMATS | COMMAND_FORMATS
+
+MM_PER_INCH = 25.4
+
+
+def module_size_to_dots(module_size_mm: float, dpi: int = 203) -> int:
+    """module size in printer dots (at least one dot) for the resolution of the printer"""
+    return max(1, int(round(module_size_mm / MM_PER_INCH * dpi)))
+
+
+def modules_to_raster(modules: Image.Image, module_size_dots: int = 4, n_quiet_zone_modules: int = 2) -> Image.Image:
+    """
+    1-bit raster of a code with one pixel per module: the quiet zone is added in modules and each module is
+    replicated to module_size_dots x module_size_dots dots, so that no resampling takes place.
+    """
+    if module_size_dots < 1:
+        raise ValueError(f"The module size must be at least one dot, not {module_size_dots}.")
+    n_quiet_zone_modules = n_quiet_zone_modules or 0
+
+    size = (modules.width + 2 * n_quiet_zone_modules, modules.height + 2 * n_quiet_zone_modules)
+    img = Image.new("1", size, 1)
+    img.paste(modules.convert("1"), (n_quiet_zone_modules, n_quiet_zone_modules))
+    if module_size_dots > 1:
+        img = img.resize((size[0] * module_size_dots, size[1] * module_size_dots), Image.NEAREST)
+    return img
+
+
+def raster_to_bytes(img: Image.Image) -> Tuple[bytes, int]:
+    """packed rows of the raster with 1 = black dot (printer convention) and the number of bytes per row"""
+    # pillow packs 1-bit images with 1 = white; invert before packing, so that the padding bits stay white
+    inverted = img.convert("L").point(lambda v: 255 - v).convert("1")
+    return inverted.tobytes(), (img.width + 7) // 8
+
+
+# ASCII compression of ZPL graphic fields: repeat counts 1..19 (G..Y) and 20..400 (g..z)
+_ZPL_COUNTS_LOW = {n: chr(ord("G") + n - 1) for n in range(1, 20)}
+_ZPL_COUNTS_HIGH = {20 * n: chr(ord("g") + n - 1) for n in range(1, 21)}
+
+
+def _zpl_repeat(char: str, n: int) -> str:
+    if n < 3:
+        return char * n
+    code = ""
+    while n >= 20:
+        high = min(400, (n // 20) * 20)
+        code += _ZPL_COUNTS_HIGH[high]
+        n -= high
+    if n:
+        code += _ZPL_COUNTS_LOW[n]
+    return code + char
+
+
+def compress_zpl_row(row: str, previous_row: str = None) -> str:
+    """ASCII-compresses a row of hex characters of a ZPL graphic field"""
+    if row == previous_row:
+        return ":"
+    # trailing zeros (white) / F (black) are filled by "," / "!"
+    fill = ""
+    stripped = row.rstrip("0")
+    if len(stripped) < len(row):
+        fill = ","
+    else:
+        stripped = row.rstrip("F")
+        if len(stripped) < len(row):
+            fill = "!"
+        else:
+            stripped = row
+
+    code, i = "", 0
+    while i < len(stripped):
+        j = i
+        while j < len(stripped) and stripped[j] == stripped[i]:
+            j += 1
+        code += _zpl_repeat(stripped[i], j - i)
+        i = j
+    return code + fill
+
+
+def raster_to_zpl(img: Image.Image, compress: bool = True, origin: Tuple[int, int] = (0, 0), label: bool = True) -> str:
+    """ZPL ^GF graphic field (ASCII hex) of a 1-bit raster, optionally as complete label (^XA ... ^XZ)"""
+    data, bytes_per_row = raster_to_bytes(img)
+    hex_data = data.hex().upper()
+    rows = [hex_data[i:i + 2 * bytes_per_row] for i in range(0, len(hex_data), 2 * bytes_per_row)]
+    if compress:
+        rows = [compress_zpl_row(row, rows[i - 1] if i > 0 else None) for i, row in enumerate(rows)]
+
+    field = f"^FO{origin[0]},{origin[1]}^GFA,{len(data)},{len(data)},{bytes_per_row},{''.join(rows)}^FS"
+    return f"^XA{field}^XZ" if label else field
+
+
+def raster_to_image_file(img: Image.Image, image_format: str = "PCX", dpi: int = 203) -> bytes:
+    """1-bit PCX / BMP (or PNG) file of a raster; the resolution of the printer is stored in the header (BMP, PNG)"""
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format.upper(), dpi=(dpi, dpi))
+    return buffer.getvalue()
+
+
+def encode_raster(img: Image.Image, output_format: str = "zpl", dpi: int = 203) -> bytes:
+    """encodes a 1-bit raster in an image or printer format (see IMAGE_FORMATS)"""
+    output_format = output_format.lower()
+    if output_format == "zpl":
+        return raster_to_zpl(img, compress=True).encode("ascii")
+    elif output_format == "zpl-hex":
+        return raster_to_zpl(img, compress=False).encode("ascii")
+    elif output_format in IMAGE_FORMATS:
+        return raster_to_image_file(img, output_format, dpi)
+    else:
+        raise ValueError(f"Unknown output format '{output_format}'. Use one of {list(IMAGE_FORMATS)}.")
+
+
+def get_media_type(output_format: str) -> str:
+    return OUTPUT_FORMATS[output_format.lower()]
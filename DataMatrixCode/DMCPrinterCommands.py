@@ -0,0 +1,76 @@
+from .DMCText import compact_rectangular_dmc_size
+
+from typing import Tuple, Iterable
+
+
+# barcode commands of printer languages: the printer draws the symbol itself
+COMMAND_FORMATS = {
+    "zpl-bx": "text/plain",  # ZPL ^BX (Data Matrix ECC 200)
+}
+
+# escape character of the ^BX field data (parameter g). "_" instead of the default "~", which is the prefix of
+# ZPL control commands
+ZPL_ESCAPE_CHARACTER = "_"
+# characters that terminate or alter the field data and must be escaped
+ZPL_SPECIAL_CHARACTERS = ("^", "~")
+
+
+def escape_zpl_field_data(message: str, escape_character: str = ZPL_ESCAPE_CHARACTER) -> str:
+    """
+    Escapes a message string for the field data (^FD) of a ZPL ^BX barcode: control characters (e.g. GS, RS, EOT of
+    the envelopes), the ZPL command prefixes and the escape character itself become <escape>dNNN (decimal ASCII code).
+    """
+    if not message.isascii():
+        raise ValueError(f"Message '{message}' is not a pure ASCII string.")
+
+    escaped = ""
+    for c in message:
+        if ord(c) < 32 or ord(c) == 127 or c in ZPL_SPECIAL_CHARACTERS or c == escape_character:
+            escaped += f"{escape_character}d{ord(c):03d}"
+        else:
+            escaped += c
+    return escaped
+
+
+def zpl_datamatrix(
+        message: str,
+        module_size_dots: int = 4,
+        n_quiet_zone_modules: int = 2,
+        rectangular_dmc: bool = False,
+        origin: Tuple[int, int] = (0, 0),
+        label: bool = True
+) -> str:
+    """
+    ZPL block that lets the printer draw the Data Matrix Code (^BX, ECC 200) of a message string. The quiet zone is
+    kept free by offsetting the field origin (^FO); rectangular codes get the size of the most compact symbol.
+    """
+    if module_size_dots < 1:
+        raise ValueError(f"The module size must be at least one dot, not {module_size_dots}.")
+
+    n_columns, n_rows, aspect_ratio = "", "", 1
+    if rectangular_dmc:
+        n_rows, n_columns = compact_rectangular_dmc_size(message)
+        if n_rows > 16:
+            raise ValueError(f"The message is too long for a rectangular code in ZPL (max. 16x48 modules; "
+                             f"DMRE {n_rows}x{n_columns} is not supported by ^BX).")
+        aspect_ratio = 2
+
+    quiet_zone = (n_quiet_zone_modules or 0) * module_size_dots
+    x, y = origin[0] + quiet_zone, origin[1] + quiet_zone
+    field = (f"^FO{x},{y}"
+             f"^BXN,{module_size_dots},200,{n_columns},{n_rows},,{ZPL_ESCAPE_CHARACTER},{aspect_ratio}"
+             f"^FD{escape_zpl_field_data(message)}^FS")
+    return f"^XA{field}^XZ" if label else field
+
+
+def zpl_datamatrix_labels(messages: Iterable[str], **kwargs) -> str:
+    """one ZPL label per message string"""
+    return "\n".join(zpl_datamatrix(msg, label=True, **kwargs) for msg in messages)
+
+
+def encode_command(message: str, output_format: str = "zpl-bx", **kwargs) -> bytes:
+    """printer command of a message string (see COMMAND_FORMATS)"""
+    if output_format.lower() == "zpl-bx":
+        return zpl_datamatrix(message, **kwargs).encode("ascii")
+    else:
+        raise ValueError(f"Unknown command format '{output_format}'. Use one of {list(COMMAND_FORMATS)}.")
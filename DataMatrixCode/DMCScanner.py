@@ -0,0 +1,158 @@
+import asyncio
+import codecs
+
+from .DMC import parse_dmc
+from .utils import message_formats
+
+from typing import Union, Dict, List, Callable, Iterable, Iterator, AsyncIterator, Any
+
+
+class DMCStreamParser:
+    """
+    Incremental parser of the continuous output of scanners (serial port, keyboard wedge, TCP): chunks of any size
+    are fed in, messages are framed by the head '[)>RS' and the tail EOT of the message envelope (ISO / IEC 15434)
+    and parsed as soon as they are complete. Characters between messages (noise, line breaks of the scanner) are
+    skipped. A message that is interrupted by the head of the next one, or that exceeds max_message_length without
+    a tail, is dropped. The buffer never holds more than one (incomplete) message, so memory stays constant.
+    Messages that cannot be parsed are counted in n_errors and skipped (raise_errors=False) or raise.
+    """
+    def __init__(self, check_format: bool = True, do_type_cast: bool = False, max_message_length: int = 4096,
+                 encoding: str = "latin-1", raise_errors: bool = False) -> None:
+        self.check_format = check_format
+        self.do_type_cast = do_type_cast
+        self.max_message_length = max_message_length
+        self.raise_errors = raise_errors
+        self.head = message_formats().get_message_envelope("head")
+        self.tail = message_formats().get_message_envelope("tail")
+        # bytes are decoded incrementally (multibyte characters may be split across chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._buffer = ""
+        # statistics
+        self.n_messages = 0
+        self.n_errors = 0
+        self.n_dropped = 0
+        self.n_skipped_characters = 0
+
+    def __repr__(self):
+        return f"DMCStreamParser(messages={self.n_messages}, errors={self.n_errors}, dropped={self.n_dropped})"
+
+    def _partial_head(self, text: str) -> int:
+        """length of the end of text that may be the beginning of a head"""
+        for n in range(min(len(self.head) - 1, len(text)), 0, -1):
+            if self.head.startswith(text[-n:]):
+                return n
+        return 0
+
+    def _skip(self, n: int):
+        self.n_skipped_characters += n
+        self._buffer = self._buffer[n:]
+
+    def frames(self, chunk: Union[bytes, str]) -> List[str]:
+        """
+        complete message strings (including the envelope) in the stream so far; the chunk is buffered right away, also
+        if the result is not used
+        """
+        self._buffer += self._decoder.decode(chunk) if isinstance(chunk, (bytes, bytearray, memoryview)) else chunk
+        return list(self._split_frames())
+
+    def _split_frames(self) -> Iterator[str]:
+        while self._buffer:
+            # synchronize to the next head
+            i = self._buffer.find(self.head)
+            if i < 0:
+                self._skip(len(self._buffer) - self._partial_head(self._buffer))
+                return
+            self._skip(i)
+
+            j = self._buffer.find(self.tail, len(self.head))
+            k = self._buffer.find(self.head, len(self.head))
+            if 0 <= k and (j < 0 or k < j):
+                # the next message starts before this one ended: the rest of this one got lost
+                self.n_dropped += 1
+                self._skip(k)
+                continue
+            if j < 0:
+                if len(self._buffer) > self.max_message_length:
+                    # no tail: drop it and look for the next head (there is none in the buffer, see above)
+                    self.n_dropped += 1
+                    self._skip(len(self._buffer) - self._partial_head(self._buffer))
+                return
+            end = j + len(self.tail)
+            frame, self._buffer = self._buffer[:end], self._buffer[end:]
+            yield frame
+
+    def parse(self, text: str) -> Union[Dict[str, List[str]], None]:
+        try:
+            content = parse_dmc(text, check_format=self.check_format, do_type_cast=self.do_type_cast)
+        except Exception:
+            self.n_errors += 1
+            if self.raise_errors:
+                raise
+            return None
+        self.n_messages += 1
+        return content
+
+    def iter_feed(self, chunk: Union[bytes, str]) -> Iterator[Dict[str, List[str]]]:
+        """parsed messages completed by the chunk; the chunk is buffered right away, the messages are parsed lazily"""
+        return self._parse_frames(self.frames(chunk))
+
+    def _parse_frames(self, frames: List[str]) -> Iterator[Dict[str, List[str]]]:
+        for frame in frames:
+            content = self.parse(frame)
+            if content is not None:
+                yield content
+
+    def feed(self, chunk: Union[bytes, str]) -> List[Dict[str, List[str]]]:
+        """parsed messages completed by the chunk"""
+        return list(self.iter_feed(chunk))
+
+    def reset(self):
+        """forgets an incomplete message (e.g. after the scanner reconnected)"""
+        self._decoder.reset()
+        self._buffer = ""
+
+    @property
+    def pending(self) -> int:
+        """number of buffered characters of an incomplete message"""
+        return len(self._buffer)
+
+
+def parse_stream(chunks: Iterable[Union[bytes, str]], **kwargs) -> Iterator[Dict[str, List[str]]]:
+    """lazily parses the messages of a stream of chunks, e.g. parse_stream(iter(lambda: port.read(64), b""))"""
+    parser = DMCStreamParser(**kwargs)
+    for chunk in chunks:
+        yield from parser.iter_feed(chunk)
+
+
+async def parse_stream_async(reader: asyncio.StreamReader, chunk_size: int = 1024,
+                             **kwargs) -> AsyncIterator[Dict[str, List[str]]]:
+    """async for content in parse_stream_async(reader): ... (until the end of the stream)"""
+    parser = DMCStreamParser(**kwargs)
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            break
+        for content in parser.iter_feed(chunk):
+            yield content
+
+
+class DMCStreamProtocol(asyncio.Protocol):
+    """
+    asyncio protocol for scanners on TCP or serial connections (e.g. loop.create_server(lambda: DMCStreamProtocol(
+    handle), port=...)); on_message is called with each parsed message. Each connection has its own parser.
+    """
+    def __init__(self, on_message: Callable[[Dict[str, List[str]]], Any], **kwargs) -> None:
+        self.on_message = on_message
+        self.parser = DMCStreamParser(**kwargs)
+        self.transport = None
+
+    def connection_made(self, transport: asyncio.BaseTransport):
+        self.transport = transport
+
+    def data_received(self, data: bytes):
+        for content in self.parser.iter_feed(data):
+            self.on_message(content)
+
+    def connection_lost(self, exc: Union[Exception, None]):
+        self.parser.reset()
+        self.transport = None
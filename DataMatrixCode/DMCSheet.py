@@ -0,0 +1,166 @@
+import io
+from PIL import Image, ImageDraw, ImageFont
+
+from .DMCGenerator import DMCGenerator
+
+from typing import Union, List, Tuple, Iterable, Callable
+
+
+# page sizes in mm (width, height)
+PAGE_SIZES = {
+    "A4": (210.0, 297.0),
+    "A5": (148.0, 210.0),
+    "Letter": (215.9, 279.4),
+}
+MM_PER_INCH = 25.4
+
+# readable names of the control characters of the message envelopes for the caption
+CONTROL_CHARACTERS = {"\x04": "<EOT>", "\x1c": "<FS>", "\x1d": "<GS>", "\x1e": "<RS>"}
+
+
+def mm_to_px(length_mm: float, dpi: int) -> int:
+    return int(round(length_mm / MM_PER_INCH * dpi))
+
+
+def printable_message(message: str) -> str:
+    """human-readable message string: control characters are replaced by their names"""
+    return "".join(CONTROL_CHARACTERS.get(c, f"<{ord(c):02X}>") if not c.isprintable() else c for c in message)
+
+
+class SheetLayout:
+    """
+    Grid of labels on a page. All lengths are in mm; the labels are centered in the cells of the grid.
+    The page is rasterized with dpi; each module of a code is rounded to an integer number of pixels.
+    """
+    def __init__(
+            self,
+            n_columns: int = 5,
+            n_rows: int = 10,
+            page_size: Union[str, Tuple[float, float]] = "A4",
+            margin_mm: float = 10,
+            gap_mm: float = 2,
+            module_size_mm: float = 0.5,
+            n_quiet_zone_modules: int = 2,
+            caption: bool = False,
+            caption_size_mm: float = 2.5,
+            dpi: int = 300
+    ) -> None:
+        if isinstance(page_size, str):
+            if page_size not in PAGE_SIZES:
+                raise ValueError(f"Unknown page size '{page_size}'. Use one of {list(PAGE_SIZES)} or (width, height) in mm.")
+            page_size = PAGE_SIZES[page_size]
+        if n_columns < 1 or n_rows < 1:
+            raise ValueError("A sheet needs at least one column and one row.")
+
+        self.n_columns = n_columns
+        self.n_rows = n_rows
+        self.page_size_mm = tuple(page_size)
+        self.margin_mm = margin_mm
+        self.gap_mm = gap_mm
+        self.module_size_mm = module_size_mm
+        self.n_quiet_zone_modules = n_quiet_zone_modules
+        self.caption = caption
+        self.caption_size_mm = caption_size_mm
+        self.dpi = dpi
+
+        self.page_size = (mm_to_px(self.page_size_mm[0], dpi), mm_to_px(self.page_size_mm[1], dpi))
+        self.module_size = max(1, mm_to_px(module_size_mm, dpi))
+        margin, gap = mm_to_px(margin_mm, dpi), mm_to_px(gap_mm, dpi)
+        self.cell_size = (
+            (self.page_size[0] - 2 * margin - (n_columns - 1) * gap) // n_columns,
+            (self.page_size[1] - 2 * margin - (n_rows - 1) * gap) // n_rows
+        )
+        if min(self.cell_size) <= 0:
+            raise ValueError(f"{n_columns}x{n_rows} labels do not fit on a page of {self.page_size_mm} mm.")
+        # upper left corners of the cells (row by row)
+        self.cells = [
+            (margin + i * (self.cell_size[0] + gap), margin + j * (self.cell_size[1] + gap))
+            for j in range(n_rows) for i in range(n_columns)
+        ]
+
+    def __repr__(self):
+        return f"SheetLayout({self.n_columns}x{self.n_rows}, page={self.page_size_mm}, dpi={self.dpi})"
+
+    @property
+    def labels_per_page(self) -> int:
+        return self.n_columns * self.n_rows
+
+    def get_font(self) -> ImageFont.ImageFont:
+        size = max(6, mm_to_px(self.caption_size_mm, self.dpi))
+        try:
+            return ImageFont.load_default(size=size)
+        except TypeError:
+            # pillow < 10.1: fixed-size bitmap font
+            return ImageFont.load_default()
+
+
+def draw_label(
+        page: Image.Image,
+        modules: Image.Image,
+        corner: Tuple[int, int],
+        layout: SheetLayout,
+        caption: str = None,
+        font: ImageFont.ImageFont = None
+) -> None:
+    """draws a code (one pixel per module) scaled to the module size into its cell of the page"""
+    size = (modules.width * layout.module_size, modules.height * layout.module_size)
+    quiet_zone = layout.n_quiet_zone_modules * layout.module_size
+    caption_height = font.getbbox("Xg")[3] + quiet_zone // 2 if caption is not None else 0
+    if (size[0] + 2 * quiet_zone > layout.cell_size[0]) or \
+            (size[1] + 2 * quiet_zone + caption_height > layout.cell_size[1]):
+        raise ValueError(f"A code of {modules.width}x{modules.height} modules does not fit into a cell of "
+                         f"{layout.cell_size} px. Reduce the module size or the number of labels per page.")
+
+    x = corner[0] + (layout.cell_size[0] - size[0]) // 2
+    y = corner[1] + (layout.cell_size[1] - size[1] - caption_height) // 2
+    page.paste(modules.resize(size, Image.NEAREST), (x, y))
+
+    if caption is not None:
+        draw = ImageDraw.Draw(page)
+        # shorten the caption to the width of the cell
+        while caption and draw.textlength(caption, font=font) > layout.cell_size[0]:
+            caption = caption[:-4] + "..." if len(caption) > 4 else ""
+        x_text = corner[0] + (layout.cell_size[0] - int(draw.textlength(caption, font=font))) // 2
+        draw.text((x_text, y + size[1] + quiet_zone // 2), caption, fill=0, font=font)
+
+
+def render_sheets(
+        messages: Iterable[str],
+        layout: SheetLayout = None,
+        rectangular_dmc: bool = False,
+        render: Callable[[str, bool], Image.Image] = None
+) -> List[Image.Image]:
+    """
+    Renders message strings onto pages (binary images) of a sheet layout. Each code is drawn directly into the
+    preallocated page; render(message, rectangular_dmc) returns a code with one pixel per module.
+    """
+    if layout is None:
+        layout = SheetLayout()
+    if render is None:
+        render = lambda msg, rect: DMCGenerator(msg).generate_modules(rectangular_dmc=rect)
+    font = layout.get_font() if layout.caption else None
+
+    pages = []
+    for i, message in enumerate(messages):
+        k = i % layout.labels_per_page
+        if k == 0:
+            pages.append(Image.new("1", layout.page_size, 1))
+        caption = printable_message(message) if layout.caption else None
+        draw_label(pages[-1], render(message, rectangular_dmc), layout.cells[k], layout, caption, font)
+    return pages
+
+
+def sheets_to_pdf(pages: List[Image.Image], dpi: int = 300) -> bytes:
+    """writes the pages into a single PDF"""
+    if not pages:
+        raise ValueError("No pages to write.")
+    buffer = io.BytesIO()
+    pages[0].save(buffer, format="PDF", save_all=True, append_images=pages[1:], resolution=dpi)
+    return buffer.getvalue()
+
+
+# wrapper
+def generate_sheet_pdf(messages: Iterable[str], layout: SheetLayout = None, **kwargs) -> bytes:
+    if layout is None:
+        layout = SheetLayout()
+    return sheets_to_pdf(render_sheets(messages, layout, **kwargs), dpi=layout.dpi)
@@ -0,0 +1,87 @@
+from .DMCText import DMCMessageBuilder, FormatParser
+from .utils import FORMAT_ANSI_MH_10, message_formats
+
+from typing import Union, Dict, List, Any, Iterable, Iterator, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+class DMCTemplate:
+    """
+    Message template for serialized labels: the static fields (e.g. part number P, supplier V, date D) are validated
+    and joined once; per label, only the value of the variable data identifier (e.g. the serial number S) is
+    validated and inserted between the precomputed prefix and suffix of the message string.
+    The variable field is always the last field of the message.
+    """
+    def __init__(
+            self,
+            fields: Dict[str, Any],
+            variable_data_identifier: str = "S",
+            message_format: str = FORMAT_ANSI_MH_10,
+            use_format_envelope: bool = False,
+            use_message_envelope: bool = True,
+            **kwargs
+    ) -> None:
+        self.variable_data_identifier = variable_data_identifier
+        self.message_format = message_format
+        self.use_format_envelope = use_format_envelope
+        self.use_message_envelope = use_message_envelope
+        # options for the image generation
+        self._kwargs = kwargs
+
+        if variable_data_identifier in fields:
+            raise ValueError(f"The variable data identifier '{variable_data_identifier}' must not be a static field.")
+
+        builder = DMCMessageBuilder(fields, message_format)
+        # validate static fields once (raises ValueError)
+        if fields:
+            FormatParser(message_format, builder.message.split(builder.fmt_sep), strict=True).parse_compact()
+        # parser to validate the variable field
+        self._parser = FormatParser(message_format, [], strict=True)
+        if variable_data_identifier not in self._parser.di_mapping:
+            raise ValueError(f"Unknown data identifier '{variable_data_identifier}' for {message_format}.")
+
+        # precompute prefix and suffix of the message string
+        body = (builder.message + builder.fmt_sep if builder.message else "") + variable_data_identifier
+        head, tail = "", ""
+        if use_format_envelope:
+            head, tail = builder.fmt_head, builder.fmt_tail
+        if use_message_envelope:
+            head = message_formats().get_message_envelope("head") + head
+            tail = tail + message_formats().get_message_envelope("tail")
+        self.prefix = head + body
+        self.suffix = tail
+
+        if not (self.prefix + self.suffix).isascii():
+            raise Warning(f"Template '{self.prefix}...{self.suffix}' is not a pure ASCII string.")
+
+    def __repr__(self):
+        return f"DMCTemplate({self.prefix!r} + <{self.variable_data_identifier}> + {self.suffix!r})"
+
+    def get_message(self, value: Union[str, int]) -> str:
+        """message string for one value of the variable field (raises ValueError if the value is not valid)"""
+        text = str(value)
+        valid, _ = self._parser.check_text(self.variable_data_identifier, text, cast=False)
+        if not valid:
+            raise ValueError(f"'{text}' is not a valid value for data identifier '{self.variable_data_identifier}'.")
+        return self.prefix + text + self.suffix
+
+    def messages(self, values: Iterable[Union[str, int]]) -> Iterator[str]:
+        for value in values:
+            yield self.get_message(value)
+
+    def render(self, serials: Iterable[Union[str, int]], **kwargs) -> Iterator[Tuple[Union[str, int], str, "Image.Image"]]:
+        """lazily generates (serial, message string, image) for all serials"""
+        from .DMCGenerator import generate_dmc_from_string
+
+        kwargs = self._kwargs | kwargs
+        for serial in serials:
+            message = self.get_message(serial)
+            yield serial, message, generate_dmc_from_string(message, **kwargs)
+
+
+def serial_range(start: int, stop: int, step: int = 1, width: int = 0, prefix: str = "") -> Iterator[str]:
+    """serial numbers like 'SN000001', 'SN000002', ...: range(start, stop, step) zero-padded to width digits"""
+    for i in range(start, stop, step):
+        yield f"{prefix}{i:0{width}d}"
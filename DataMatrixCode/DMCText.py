@@ -8,7 +8,7 @@ from .utils import (
     )
 
 from datetime import datetime
-from typing import List, Union, Dict, Any
+from typing import List, Union, Dict, Any, Iterator, NamedTuple, Tuple
 
 
 class DMCMessageParser:
@@ -158,6 +158,87 @@ def get_date_format(explanation: str):
     return re.search(pattern, explanation)
 
 
+class ParsedField(NamedTuple):
+    """one field of a parsed message; also readable like a dictionary (field["content"], dict(field))"""
+    data_identifier: str
+    content: Union[str, int, float, datetime]
+    code_valid: bool
+    string: str
+
+    def __getitem__(self, key: Union[str, int, slice]) -> Any:
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._fields
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return zip(self._fields, self)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._fields else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+
+class ParsedMessage:
+    """
+    Result of FormatParser.parse_compact(): the fields of a message as four parallel tuples (data identifiers,
+    contents, validity, original strings) instead of one dictionary per field. It is a sequence of ParsedField, which
+    are created on access; as_dict() is the dictionary {data identifier: content}, to_list() the list of dictionaries
+    of FormatParser.parse().
+    """
+    __slots__ = ("data_identifiers", "contents", "code_valid", "strings", "valid")
+
+    def __init__(self, data_identifiers: Tuple[str, ...], contents: Tuple[Any, ...], code_valid: Tuple[bool, ...],
+                 strings: Tuple[str, ...], valid: bool = True) -> None:
+        self.data_identifiers = data_identifiers
+        self.contents = contents
+        self.code_valid = code_valid
+        self.strings = strings
+        # all fields valid
+        self.valid = valid
+
+    def __repr__(self):
+        return f"ParsedMessage({list(self)}, valid={self.valid})"
+
+    def __len__(self) -> int:
+        return len(self.data_identifiers)
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[ParsedField, List[ParsedField]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return ParsedField(self.data_identifiers[index], self.contents[index], self.code_valid[index],
+                           self.strings[index])
+
+    def __iter__(self) -> Iterator[ParsedField]:
+        return map(ParsedField, self.data_identifiers, self.contents, self.code_valid, self.strings)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, ParsedMessage):
+            return list(self) == list(other)
+        if isinstance(other, list):
+            return [fld.to_dict() for fld in self] == [dict(el) for el in other]
+        return NotImplemented
+
+    def as_dict(self, only_valid: bool = False) -> Dict[str, Any]:
+        """{data identifier: content} of all (or only the valid) fields"""
+        if only_valid:
+            return {di: content for di, content, valid in zip(self.data_identifiers, self.contents, self.code_valid)
+                    if valid}
+        return dict(zip(self.data_identifiers, self.contents))
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """fields as dictionaries (the result of FormatParser.parse())"""
+        return [{"data_identifier": di, "content": content, "code_valid": valid, "string": string}
+                for di, content, valid, string in zip(self.data_identifiers, self.contents, self.code_valid,
+                                                      self.strings)]
+
+
 class FormatParser:
     def __init__(self, di_format: str, fields: List[str], strict: bool = True, verbose: bool = False) -> None:
         msg_formats = message_formats(di_format)
@@ -175,6 +256,8 @@ class FormatParser:
         if di not in self.di_mapping:
             msg = f"Data identifier '{di}' is not a valid identifier for {self.di_format}."
             valid_code = rais_error_or_warning(msg, self.strict, self.verbose)
+            # there is no format specification to check the text against
+            return valid_code, text
 
         # check if there is text at all (use len() in case bytes or similar are handed to the function).
         if len(text) == 0:
@@ -246,7 +329,13 @@ class FormatParser:
         return datetime_object
 
     def parse(self, cast: bool = False) -> (List[Dict[str, Union[str, int, datetime]]], bool):
-        info = []
+        """fields as dictionaries {data_identifier, content, code_valid, string} and whether all are valid"""
+        info, valid_code_overall = self.parse_compact(cast)
+        return info.to_list(), valid_code_overall
+
+    def parse_compact(self, cast: bool = False) -> (ParsedMessage, bool):
+        """parse() with the fields in a ParsedMessage (parallel tuples, about half the memory of the dictionaries)"""
+        data_identifiers, contents, code_valid, strings = [], [], [], []
         # initialize flag
         valid_code_overall = True
         for fld in self.fields:
@@ -260,15 +349,17 @@ class FormatParser:
                 valid_code_id, text = self.check_text(di, text_ogl, cast=cast)
                 # update overall flag for valid code
                 valid_code_overall = valid_code_overall and valid_code_id
-                # info.append((di, text, valid_code_id))
-                element = {"data_identifier": di, "content": text, "code_valid": valid_code_id, "string": text_ogl}
-                # print(f"DEBUG FormatParser.parse(): element={element}")
-                info.append(element)
+                data_identifiers.append(di)
+                contents.append(text)
+                code_valid.append(valid_code_id)
+                strings.append(text_ogl)
             else:
                 msg = f"No {self.di_format} data identifier found in '{fld}'. " \
                       f"It was expected that the string starts with the pattern '{self.di_pattern}'."
                 valid_code_overall = rais_error_or_warning(msg, self.strict, self.verbose)
 
+        info = ParsedMessage(tuple(data_identifiers), tuple(contents), tuple(code_valid), tuple(strings),
+                             valid_code_overall)
         return info, valid_code_overall
 
 
@@ -339,12 +430,10 @@ class DMCMessageBuilder:
                              use_format_envelope: bool = False,
                              use_message_envelope: bool = True
                              ) -> str:
-        if use_format_envelope:
-            self.message = self.put_into_format_envelope()
+        # self.message stays the bare fields, so that building again does not wrap the envelope twice
+        dmc_string = self.put_into_format_envelope() if use_format_envelope else self.message
         if use_message_envelope:
-            dmc_string = put_into_message_envelope(self.message)
-        else:
-            dmc_string = self.message
+            dmc_string = put_into_message_envelope(dmc_string)
 
         if not dmc_string.isascii():
             raise Warning(f"String '{dmc_string}' is not a pure ASCII string.")
@@ -375,6 +464,38 @@ def count_compressed_ascii_characters(msg: str) -> int:
     return n
 
 
+def compact_square_dmc_size(msg: str) -> (int, int):
+    """number of rows and columns of the smallest square DMC (ECC 200) for a message string in ASCII encodation"""
+    data_capacity = [3, 5, 8, 12, 18, 22, 30, 36, 44, 62, 86, 114, 144, 174, 204,
+                     280, 368, 456, 576, 696, 816, 1050, 1304, 1558]
+    size = [10, 12, 14, 16, 18, 20, 22, 24, 26, 32, 36, 40, 44, 48, 52,
+            64, 72, 80, 88, 96, 104, 120, 132, 144]
+    n_compressed_ascii_chars = count_compressed_ascii_characters(msg)
+
+    for cap, n in zip(data_capacity, size):
+        if cap >= n_compressed_ascii_chars:
+            return n, n
+    raise ValueError(f"The message is too long for a DMC ({n_compressed_ascii_chars} > {data_capacity[-1]} codewords).")
+
+
+def compact_rectangular_dmc_size(msg: str) -> (int, int):
+    """number of rows and columns of the most compact rectangular DMC (DMRE above 16 rows) for a message string"""
+    binary_capacity = [3, 8, 14, 20, 30, 47, 54, 70, 78]
+    height = [8, 8, 12, 12, 16, 16, 20, 20, 22, 24]
+    width = [18, 32, 26, 36, 36, 48, 44, 48, 48]
+    # original
+    # binary_capacity = [3, 8, 14, 20, 30, 47]
+    # height = [8, 8, 12, 12, 16, 16]
+    # length = [18, 32, 26, 36, 36, 48]
+    n_compressed_ascii_chars = count_compressed_ascii_characters(msg)
+
+    n_rows, n_cols = 0, 0
+    for cap, n_rows, n_cols in zip(binary_capacity, height, width):
+        if cap >= n_compressed_ascii_chars:
+            break
+    return n_rows, n_cols
+
+
 if __name__ == "__main__":
     dmc_text = "[)>\x1eS123456\x1dV123H48999\x1d18D202312011155\x1d15D24121990\x1dD230501\x04"
 
@@ -1,23 +1,81 @@
 from .DMCText import (
     DMCMessageBuilder, 
     DMCMessageParser, 
-    FormatParser
+    FormatParser,
+    ParsedField,
+    ParsedMessage
 )
-from .DMCGenerator import DMCGenerator, generate_dmc_from_string
+
+from .DMCTemplate import DMCTemplate, serial_range
+from .DMCPrinterCommands import zpl_datamatrix, encode_command, COMMAND_FORMATS
 
 # wrapper functions
 from .DMC import (
     DataMatrixCode, 
     generate_dmc, 
     generate_message_string,
+    describe_dmc,
     count_compressed_ascii_characters as count_ascii_characters,
     parse_dmc,
-    validate_envelope_format
+    validate_envelope_format,
+    ParseCache,
+    FrozenDict
 )
 
 from .utils import (
     FORMAT_ANSI_MH_10,
-    message_formats,
-    MessageData, 
-    EnvelopeData
+    message_formats
+)
+
+# the module imports treepoem and pillow on the first render. Importing the class eagerly binds it in place of the
+# submodule of the same name, also if DataMatrixCode.DMCGenerator is imported later on.
+from .DMCGenerator import (
+    DMCGenerator,
+    generate_dmc_from_string,
+    generate_raster_from_string,
+    RenderTimeout,
+    MatrixCache
 )
+
+# The image outputs and sheets (pillow) and the data models (pydantic) are imported on first access (PEP 562),
+# so that parse-only consumers do not pay for dependencies they never use. The same holds for batch generation,
+# scanner streams (asyncio, concurrent.futures) and the columnar parser.
+_LAZY_IMPORTS = {
+    "encode_raster": ".DMCPrinter",
+    "get_media_type": ".DMCPrinter",
+    "IMAGE_FORMATS": ".DMCPrinter",
+    "OUTPUT_FORMATS": ".DMCPrinter",
+    "SheetLayout": ".DMCSheet",
+    "render_sheets": ".DMCSheet",
+    "generate_sheet_pdf": ".DMCSheet",
+    "MessageData": ".utils",
+    "EnvelopeData": ".utils",
+    "TemplateData": ".utils",
+    "SheetData": ".utils",
+    "PrintData": ".utils",
+    "JobData": ".utils",
+    "generate_many": ".DMCBatch",
+    "generate_many_async": ".DMCBatch",
+    "BATCH_OUTPUTS": ".DMCBatch",
+    "DMCStreamParser": ".DMCScanner",
+    "DMCStreamProtocol": ".DMCScanner",
+    "parse_stream": ".DMCScanner",
+    "parse_stream_async": ".DMCScanner",
+    "ColumnarParser": ".DMCColumns",
+    "parse_columns": ".DMCColumns",
+    "write_columns": ".DMCColumns",
+    "iter_csv": ".DMCColumns",
+    "COLUMN_FORMATS": ".DMCColumns",
+}
+
+
+def __getattr__(name: str):
+    if name in _LAZY_IMPORTS:
+        import importlib
+        module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
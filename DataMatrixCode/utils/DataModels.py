@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, Dict, AnyStr, Union, List
+from typing import Optional, Dict, AnyStr, Union, List, Tuple
 from datetime import datetime
 
 from .formats import FORMAT_ANSI_MH_10
@@ -25,6 +25,61 @@ class MessageData(BaseModel):
     n_quiet_zone_moduls: Optional[int] = 2
     use_format_envelope:  Optional[bool] = False
     use_message_envelope:  Optional[bool] = True
+    # output: png or raster formats of label printers (zpl, zpl-hex, pcx, bmp) with the module size in printer dots
+    output_format: Optional[str] = "png"
+    module_size_dots: Optional[int] = None
+    dpi: Optional[int] = 203
+
+
+class TemplateData(BaseModel):
+    format: Optional[str] = FORMAT_ANSI_MH_10
+    # static fields
+    fields: Dict[str, Union[str, int, float, datetime]]
+    # variable field: explicit values or a range of serial numbers
+    variable_data_identifier: Optional[str] = "S"
+    serials: Optional[List[Union[str, int]]] = None
+    serial_start: Optional[int] = None
+    serial_stop: Optional[int] = None
+    serial_step: Optional[int] = 1
+    serial_width: Optional[int] = 0
+    serial_prefix: Optional[str] = ""
+    # formatting / appearance / options
+    rectangular_dmc:  Optional[bool] = False
+    n_quiet_zone_moduls: Optional[int] = 2
+    use_format_envelope:  Optional[bool] = False
+    use_message_envelope:  Optional[bool] = True
+
+
+class SheetData(BaseModel):
+    # message strings (e.g. from /message) or data of the messages
+    messages: Optional[List[str]] = None
+    data: Optional[List[MessageData]] = None
+    # layout: grid of labels, lengths in mm
+    n_columns: Optional[int] = 5
+    n_rows: Optional[int] = 10
+    page_size: Optional[Union[str, Tuple[float, float]]] = "A4"
+    margin_mm: Optional[float] = 10
+    gap_mm: Optional[float] = 2
+    module_size_mm: Optional[float] = 0.5
+    caption: Optional[bool] = False
+    dpi: Optional[int] = 300
+    # formatting / appearance / options
+    rectangular_dmc:  Optional[bool] = False
+    n_quiet_zone_moduls: Optional[int] = 2
+    output: Optional[str] = "pdf"  # pdf or png (single page)
+
+
+class PrintData(BaseModel):
+    printer: str
+    # labels to render in a printer format (output_format; png falls back to the default print format) or payloads
+    # that are already in the language of the printer (e.g. ZPL)
+    messages: Optional[List[MessageData]] = None
+    payloads: Optional[List[str]] = None
+    copies: Optional[int] = 1
+
+
+class JobData(BaseModel):
+    messages: List[MessageData]
 
 
 def envelope_data_to_dict(data: EnvelopeData) -> dict:
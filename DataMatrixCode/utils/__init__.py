@@ -1,13 +1,26 @@
-from .format_specifications import validate_format
+from .format_specifications import validate_format, sample_format
 
 from .formats import (
     FORMAT_ANSI_MH_10,
     message_formats,
 )
 
-from .DataModels import (
-    MessageData,
-    EnvelopeData,
-    envelope_data_to_dict,
-    message_data_to_list
-)
\ No newline at end of file
+# the data models depend on pydantic, which is only needed by the api and the generator wrappers.
+# They are imported on first access (PEP 562) to keep the import of the text / parser functions light.
+_DATA_MODELS = (
+    "MessageData",
+    "EnvelopeData",
+    "TemplateData",
+    "SheetData",
+    "PrintData",
+    "JobData",
+    "envelope_data_to_dict",
+    "message_data_to_list"
+)
+
+
+def __getattr__(name: str):
+    if name in _DATA_MODELS:
+        from . import DataModels
+        return getattr(DataModels, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
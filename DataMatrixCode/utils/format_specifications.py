@@ -1,7 +1,20 @@
 import re
+import random
+from functools import lru_cache
 
+from typing import List, Tuple
 
-def build_format_pattern(format_string: str, match_entire_string: bool = True) -> str:
+
+# placeholder for an open upper limit
+MAX_NUMBER_OF_CHARACTERS = 9999
+
+
+def split_format_specification(format_string: str) -> List[Tuple[str, str, int, int]]:
+    """
+    Splits a format specification like 'an3+n8' into its segments.
+    Returns a list of tuples (type, characters, minimal length, maximal length) where the type is one of
+    'an', 'a', 'n', or 'literal'; characters is the explicit character sequence for literals and empty otherwise.
+    """
     # break string into segments
     string_segments = re.findall(r'(?:[^\+\"\']|\"[^\"]*\"|\'[^\']*\')+', format_string)
 
@@ -17,8 +30,10 @@ def build_format_pattern(format_string: str, match_entire_string: bool = True) -
     pattern_characters = re.compile(r"a\d?")
     pattern_numbers = re.compile(r"n\d?")
 
-    pattern = ""
+    segments = []
     for seg in string_segments:
+        # some specifications of the data dictionary have blanks around the segments
+        seg = seg.strip()
         # extract minimal number of characters
         num_min = 0
         m = pattern_integer.search(seg)
@@ -26,25 +41,42 @@ def build_format_pattern(format_string: str, match_entire_string: bool = True) -
             num_min = int(m.group())
 
         # extract maximum number of characters
-        num_max = num_min if num_min > 0 else 9999
+        num_max = num_min if num_min > 0 else MAX_NUMBER_OF_CHARACTERS
         m = pattern_max_number.search(seg)
         if m:
             num_max = int(m.group())
 
-
         m = pattern_alphanum_patterns.match(seg)
         if m:
-            character_pattern = re.escape(m.group()[1:-1])
-            num_min, num_max = 1, 1
-        elif pattern_alphanum.match(seg):  # an: str.isalnum() "[^0-9a-zA-Z]+"
-            character_pattern = r"[a-zA-Z0-9\.\-\+_]"
-        elif pattern_characters.match(seg):  # a: str.isalpha()  "[a-zA-Z]+"
-            character_pattern = "[a-zA-Z]"
-        elif pattern_numbers.match(seg):  # n: str.isnumeric() "\d+(\.\d+)?"
-            character_pattern = r"[0-9\.]"
+            segments.append(("literal", m.group()[1:-1], 1, 1))
+        elif pattern_alphanum.match(seg):
+            segments.append(("an", "", num_min, num_max))
+        elif pattern_characters.match(seg):
+            segments.append(("a", "", num_min, num_max))
+        elif pattern_numbers.match(seg):
+            segments.append(("n", "", num_min, num_max))
+        elif pattern_integer.match(seg):
+            # a length without character type (e.g. 'an3+6' of 21B, 'an3+16...26' of 96S): any characters
+            segments.append(("an", "", num_min, num_max))
         else:
             raise ValueError(f"Unknown character specification {seg} in {format_string}. "
                              f"Was expecting an/a/n or an explicit character (sequence) given in quotation marks.")
+    return segments
+
+
+def build_format_pattern(format_string: str, match_entire_string: bool = True) -> str:
+    character_patterns = {
+        "an": r"[a-zA-Z0-9\.\-\+_]",  # an: str.isalnum() "[^0-9a-zA-Z]+"
+        "a": "[a-zA-Z]",  # a: str.isalpha()  "[a-zA-Z]+"
+        "n": r"[0-9\.]",  # n: str.isnumeric() "\d+(\.\d+)?"
+    }
+
+    pattern = ""
+    for seg_type, characters, num_min, num_max in split_format_specification(format_string):
+        if seg_type == "literal":
+            character_pattern = re.escape(characters)
+        else:
+            character_pattern = character_patterns[seg_type]
 
         # build pattern by add number of expected repetition
         pattern += character_pattern
@@ -60,14 +92,51 @@ def build_format_pattern(format_string: str, match_entire_string: bool = True) -
     return pattern
 
 
+def sample_format(
+        format_string: str,
+        rng: random.Random = None,
+        max_length: int = 35,
+        skip_characters: int = 0
+) -> str:
+    """
+    Inverse of build_format_pattern(): generates a random string that complies with the format specification.
+    Open upper limits are capped to max_length characters (per segment). The first skip_characters characters of the
+    specification are not generated, e.g. to skip the data identifier itself.
+    Letters are generated in upper case and numbers without a decimal point as these are the most common cases.
+    """
+    rng = rng if rng else random.Random()
+    alphabets = {"an": "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789", "a": "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "n": "0123456789"}
+
+    string = ""
+    for seg_type, characters, num_min, num_max in split_format_specification(format_string):
+        if seg_type == "literal":
+            segment = characters
+        else:
+            num_max = max(num_min, min(num_max, max_length))
+            segment = "".join(rng.choices(alphabets[seg_type], k=rng.randint(num_min, num_max)))
+
+        if skip_characters > 0:
+            n_skip = min(skip_characters, len(segment))
+            skip_characters -= n_skip
+            segment = segment[n_skip:]
+        string += segment
+    return string
+
+
+@lru_cache(maxsize=1024)
+def compile_format_pattern(format_specification: str) -> re.Pattern:
+    """compiled pattern of a format specification (cached, as there are only a few hundred specifications)"""
+    return re.compile(build_format_pattern(format_specification))
+
+
 def validate_format(format_specification: str, string_to_validate: str, strict: bool = True) -> bool:
-    val_pattern = build_format_pattern(format_specification)
+    val_pattern = compile_format_pattern(format_specification)
 
-    m = re.match(val_pattern, string_to_validate)
+    m = val_pattern.match(string_to_validate)
     if m is None:
         if strict:
             raise ValueError(f"Validation failed! "
-                             f"The string '{string_to_validate}' does not match the pattern {val_pattern} "
+                             f"The string '{string_to_validate}' does not match the pattern {val_pattern.pattern} "
                              f"for format {format_specification}.")
         else:
             return False
@@ -1,4 +1,5 @@
 from pathlib import Path
+from functools import lru_cache
 from typing import Union, Dict, List
 
 
@@ -6,6 +7,7 @@ FORMAT_ANSI_MH_10 = "ANSI-MH-10"
 PATH_TO_DI_FORMATS = {FORMAT_ANSI_MH_10: Path(__file__).parent / "ANSI-MH-10_DataIdentifiers.txt"}
 
 
+@lru_cache(maxsize=None)
 def load_mapping(filename: Union[Path, str]) -> Dict[str, Dict[str, str]]:
     # read file
     with open(filename, "r") as fid:
@@ -34,8 +36,8 @@ def load_mapping(filename: Union[Path, str]) -> Dict[str, Dict[str, str]]:
 MESSAGE_ENVELOPE = {"head": "\u005B\u0029\u003E\u001E", "tail": "\u0004"}
 
 FORMAT_ENVELOPES = {FORMAT_ANSI_MH_10: {"head": "06\u001D", "tail": "\u001e", "sep": "\u001D"}}
-DATA_IDENTIFIERS = {FORMAT_ANSI_MH_10: {"pattern": r"\d{0,2}[B-Z]",
-                                        "mapping": load_mapping(PATH_TO_DI_FORMATS[FORMAT_ANSI_MH_10])}}
+# the mapping of the data identifiers is read from PATH_TO_DI_FORMATS on first use (see message_formats.get_di_mapping)
+DATA_IDENTIFIERS = {FORMAT_ANSI_MH_10: {"pattern": r"\d{0,2}[B-Z]"}}
 
 # ---- wrappers
 def _get_envelope(envelope: dict, key: str = None) -> Union[str, Dict[str, str]]:
@@ -78,7 +80,7 @@ class message_formats:
             raise Exception(f"No Data Identifier format (di_format) has been set yet!")
 
     def get_di_mapping(self) -> Dict[str, Dict[str, str]]:
-        return DATA_IDENTIFIERS[self.di_format]["mapping"]
+        return load_mapping(PATH_TO_DI_FORMATS[self.di_format])
     
     def get_di_pattern(self) -> str:
         return DATA_IDENTIFIERS[self.di_format]["pattern"]
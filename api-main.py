@@ -1,36 +1,74 @@
+import asyncio
+import base64
 import datetime
+import json
+import math
 import os
+import tempfile
+import uuid
 from pathlib import Path
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from fastapi.encoders import jsonable_encoder
 from prometheus_fastapi_instrumentator import Instrumentator
 
-from starlette.background import BackgroundTask
 # import uvicorn
 
+from DataMatrixCode import DMC
 from DataMatrixCode import (
-    generate_dmc, 
     generate_dmc_from_string, 
+    generate_raster_from_string,
+    DMCGenerator,
+    encode_raster,
+    get_media_type,
+    OUTPUT_FORMATS,
+    COMMAND_FORMATS,
+    encode_command,
     generate_message_string, 
+    describe_dmc,
+    RenderTimeout,
+    MatrixCache,
+    ParseCache,
     count_ascii_characters,
     parse_dmc, 
+    parse_columns,
+    write_columns,
+    iter_csv,
+    COLUMN_FORMATS,
     MessageData, 
+    TemplateData,
+    SheetData,
+    PrintData,
+    JobData,
+    SheetLayout,
+    render_sheets,
+    generate_sheet_pdf,
+    DMCTemplate,
+    serial_range,
     FORMAT_ANSI_MH_10
 )
+from utils.env_vars import get_env_variable
+from utils.warmup import WarmUp
+from utils.image_cache import ImageCache, encode_image
+from utils.prewarm import Prewarmer, read_manifest
+from utils.jobs import JobStore, JobRunner
+from utils.lanes import LaneScheduler, LaneClassifier, LaneRejected
+from utils.printing import PrintSpooler
+from utils.artifacts import ArtifactStore, ArtifactFiles, ARTIFACT_EXTENSIONS
+from utils.shared_cache import SharedCache, pack_bitmap, unpack_bitmap
+from utils.cache_metrics import register_cache
+from utils.watchdog import RenderPool, RenderScope, CircuitBreaker, CircuitOpen, RenderCancelled, current_scope
+from utils.session import SessionOptions, SessionRequest, parse_frame, modules_to_rows, build_response, OUTPUT_MODULES
 
-from typing import Union, Dict
+from typing import Union, Dict, Iterator, AsyncIterator, Callable
 
 import logging
 
 
 api = FastAPI()
-IMAGE_FOLDER = Path("images")
-IMAGE_FOLDER.mkdir(parents=True, exist_ok=True)
-api.mount('/images', StaticFiles(directory=IMAGE_FOLDER), name='static')
-list_of_temp_files = []
-MAX_NUM_TEMP_FILES = 50
 DI_FORMAT = FORMAT_ANSI_MH_10
 
 FROM_JSON = "/from-json"
@@ -48,11 +86,111 @@ ENTRYPOINT_DMC_GENERATOR_API_COUNT_FROM_JSON = ENTRYPOINT_DMC_GENERATOR_API_COUN
 
 ENTRYPOINT_DMC_GENERATOR_API_PARSER = '/parser'
 ENTRYPOINT_DMC_GENERATOR_API_PARSER_FROM_TEXT = ENTRYPOINT_DMC_GENERATOR_API_PARSER + FROM_TEXT
+ENTRYPOINT_DMC_GENERATOR_API_PARSER_BULK = ENTRYPOINT_DMC_GENERATOR_API_PARSER + "/bulk"
+
+ENTRYPOINT_DMC_GENERATOR_API_TEMPLATE = "/template"
+ENTRYPOINT_DMC_GENERATOR_API_SHEET = "/sheet"
+
+ENTRYPOINT_PRINT = "/print"
+ENTRYPOINT_SESSION = "/session"
+ENTRYPOINT_JOBS = "/jobs"
+ENTRYPOINT_JOBS_UPLOAD = ENTRYPOINT_JOBS + "/upload"
+
+ENTRYPOINT_IMAGES = "/images"
+
+ENTRYPOINT_READY = "/ready"
+ENTRYPOINT_ADMIN_PREWARM = "/admin/prewarm"
+ENTRYPOINT_ADMIN_LANES = "/admin/lanes"
+ENTRYPOINT_ADMIN_RENDERER = "/admin/renderer"
 
+# warm-up before the service reports to be ready (DMC table, validators, ghostscript, pillow codecs)
+WARMUP = WarmUp(render=get_env_variable("WARMUP_RENDER", True))
+
+# in-memory cache of rendered images and its pre-population from a manifest of MessageData (JSONL)
+IMAGE_CACHE = ImageCache(max_bytes=int(get_env_variable("IMAGE_CACHE_SIZE_MB", 64) * 2**20))
+# module matrices of the rendered symbols: other quiet zones, module sizes and formats are derived without rendering
+DMCGenerator.matrix_cache = MatrixCache(max_items=get_env_variable("MATRIX_CACHE_ITEMS", 4096))
+# results of the parser (the same label scanned repeatedly)
+DMC.parse_cache = ParseCache(max_items=get_env_variable("PARSE_CACHE_ITEMS", 4096))
+# host-wide second tier of the image cache and cache of the rendered symbols, shared by all worker processes
+# (uvicorn --workers) on a host, e.g. SHARED_CACHE=/dev/shm/dmc-cache.sqlite
+SHARED_CACHE = SharedCache(
+    path=get_env_variable("SHARED_CACHE", None),
+    max_bytes=int(get_env_variable("SHARED_CACHE_SIZE_MB", 256) * 2**20),
+) if get_env_variable("SHARED_CACHE", None) else None
+
+# optional store of rendered images, served as static files /images/<content hash>.<extension> (requests with url=true)
+ARTIFACT_STORE = ArtifactStore(
+    directory=get_env_variable("ARTIFACT_DIR", "images"),
+    max_bytes=int(get_env_variable("ARTIFACT_STORE_SIZE_MB", 512) * 2**20),
+    ttl=get_env_variable("ARTIFACT_TTL", 24 * 3600),
+) if get_env_variable("ARTIFACT_STORE", False) else None
+if ARTIFACT_STORE is not None:
+    api.mount(
+        ENTRYPOINT_IMAGES,
+        ArtifactFiles(directory=ARTIFACT_STORE.directory, max_age=int(ARTIFACT_STORE.ttl)),
+        name='static'
+    )
+
+# module size of the raster formats of label printers in printer dots (if not specified)
+DEFAULT_MODULE_SIZE_DOTS = get_env_variable("DEFAULT_MODULE_SIZE_DOTS", 4)
+
+# maximum number of labels per template request
+TEMPLATE_MAX_SERIALS = get_env_variable("TEMPLATE_MAX_SERIALS", 10000)
+# maximum number of labels per print sheet request
+SHEET_MAX_LABELS = get_env_variable("SHEET_MAX_LABELS", 2000)
+
+# label printers for raw printing (port 9100), e.g. PRINTERS='{"line-1": "10.0.0.21:9100"}'
+PRINT_SPOOLER = PrintSpooler(
+    printers=get_env_variable("PRINTERS", dict()),
+    batch_size=get_env_variable("PRINT_BATCH_SIZE", 50),
+)
+# deadline of a request (clients can shorten it with the header X-Request-Timeout) and watchdog of the renders:
+# symbols are rendered in RENDER_PROCESSES processes that are killed if ghostscript hangs (0: render in threads)
+RENDER_TIMEOUT = get_env_variable("RENDER_TIMEOUT", 10)
+RENDER_POOL = RenderPool(n_processes=get_env_variable("RENDER_PROCESSES", 4), timeout=RENDER_TIMEOUT)
+# priority lanes in front of the renderer: interactive requests before batch traffic. Admitted renders wait for a
+# render process in the order they came, not by lane, so there are no more slots than render processes.
+LANES = LaneScheduler(
+    capacity=get_env_variable("RENDER_CONCURRENCY", RENDER_POOL.n_processes or 8),
+    lanes=get_env_variable("LANES", None),
+)
+if RENDER_POOL.n_processes and LANES.capacity > RENDER_POOL.n_processes:
+    logging.warning(f"RENDER_CONCURRENCY={LANES.capacity} exceeds RENDER_PROCESSES={RENDER_POOL.n_processes}; "
+                    f"the capacity of the lanes is limited to the number of render processes.")
+    LANES.capacity = RENDER_POOL.n_processes
+# lane of the renders of background workers (pre-warming, batch jobs): they only get capacity that no request waits for
+BACKGROUND_LANE = get_env_variable("BACKGROUND_LANE", LANES.lowest_lane)
+LANE_CLASSIFIER = LaneClassifier(
+    LANES,
+    # e.g. LANE_API_KEYS='{"<key of the bulk client>": "batch"}'
+    api_keys=get_env_variable("LANE_API_KEYS", dict()),
+    endpoints=get_env_variable("LANE_ENDPOINTS", {
+        ENTRYPOINT_DMC_GENERATOR_API_TEMPLATE: "batch",
+        ENTRYPOINT_DMC_GENERATOR_API_SHEET: "batch",
+    }),
+)
+
+# fail fast while the renderer is unhealthy
+RENDER_BREAKER = CircuitBreaker(
+    failure_threshold=get_env_variable("RENDER_FAILURE_THRESHOLD", 5),
+    reset_timeout=get_env_variable("RENDER_RESET_TIMEOUT", 30),
+)
+# interval to check whether the client of a running render went away
+DISCONNECT_POLL_INTERVAL = 0.25
+
+# batch jobs: persistent queue (SQLite) processed by background workers
+JOB_STORE = JobStore(get_env_variable("JOB_DATABASE", "data/jobs.sqlite"),
+                     lease_seconds=get_env_variable("JOB_LEASE_SECONDS", 300))
+
+# printer format of the labels if a print request asks for png
+PRINT_DEFAULT_FORMAT = get_env_variable("PRINT_DEFAULT_FORMAT", "zpl-bx")
 
 
 # create endpoint for prometheus: /metrics
 Instrumentator().instrument(api).expose(api)
+register_cache("parse_cache", lambda: DMC.parse_cache, "cache of parsed messages")
+register_cache("matrix_cache", lambda: DMCGenerator.matrix_cache, "cache of module matrices")
 
 # ----- Program info
 INFO = {
@@ -67,22 +205,69 @@ INFO = {
 
 
 # ----- helper functions
+@api.on_event('startup')
+def start_render_pool():
+    # before the warm-up, so that it warms up the render processes
+    RENDER_POOL.start()
+    DMCGenerator.symbol_renderer = render_symbol_guarded
+
+
+@api.on_event('startup')
+async def bind_lanes():
+    # before the background workers start, which take their render slots through the event loop
+    LANES.bind(asyncio.get_running_loop())
+
+
 @api.on_event('shutdown')
-def delete_all_temp_files():
-    print('shutting down...')
-    for i, fl in enumerate(list_of_temp_files):
-        print(len(list_of_temp_files) - i)
-        cleanup(Path(fl).as_posix())
+def stop_render_pool():
+    DMCGenerator.symbol_renderer = None
+    RENDER_POOL.stop()
+
+
+@api.on_event('startup')
+def start_warm_up():
+    if get_env_variable("WARMUP", True):
+        WARMUP.start()
+    else:
+        WARMUP.ready.set()
+
+
+@api.on_event('startup')
+def start_prewarm():
+    if PREWARMER.manifest:
+        PREWARMER.start()
+
 
+@api.on_event('startup')
+def start_print_spooler():
+    PRINT_SPOOLER.start()
 
-def cleanup(temp_file: Union[str, Path]):
-    # remove file
-    Path(temp_file).unlink()
 
+@api.on_event('startup')
+def start_job_runner():
+    JOB_RUNNER.start()
 
-def limit_temp_files():
-    while len(list_of_temp_files) > MAX_NUM_TEMP_FILES:
-        cleanup(list_of_temp_files.pop(0))
+
+@api.on_event('shutdown')
+def stop_job_runner():
+    JOB_RUNNER.stop(timeout=5)
+
+
+@api.on_event('shutdown')
+def stop_print_spooler():
+    PRINT_SPOOLER.stop(timeout=5)
+
+
+@api.on_event('startup')
+def start_artifact_eviction():
+    if ARTIFACT_STORE is not None:
+        ARTIFACT_STORE.start()
+
+
+@api.on_event('shutdown')
+def stop_artifact_eviction():
+    if ARTIFACT_STORE is not None:
+        ARTIFACT_STORE.stop(timeout=5)
 
 
 # ----- home
@@ -96,23 +281,233 @@ async def home() -> dict:
     return INFO
 
 
+# ----- readiness
+@api.get(ENTRYPOINT_READY)
+async def ready():
+    """readiness probe: 503 until the warm-up is done"""
+    return JSONResponse(content=jsonable_encoder(WARMUP.status()), status_code=200 if WARMUP.ready.is_set() else 503)
+
+
+# ----- renderer: deadlines, watchdog, circuit breaker
+def render_symbol_guarded(barcode_type: str, data: str, options: Union[dict, None], deadline: Union[float, None]):
+    """renderer of the symbols (DMCGenerator.symbol_renderer) of the api"""
+    scope = current_scope()
+    if scope is not None:
+        # work whose client went away or whose deadline passed while waiting is dropped before it reaches the renderer
+        scope.check()
+    use_cache = SHARED_CACHE is not None and (scope is None or scope.use_cache)
+    key = (barcode_type, data, tuple(sorted(options.items())) if options else None)
+    if use_cache:
+        content = SHARED_CACHE.get("symbol", key)
+        if content is not None:
+            return unpack_bitmap(content)
+
+    img = RENDER_BREAKER.call(RENDER_POOL.render, barcode_type, data, options, deadline)
+    if use_cache:
+        SHARED_CACHE.put("symbol", key, pack_bitmap(img))
+    return img
+
+
+def get_request_timeout(headers) -> float:
+    """timeout of the renders of a request in seconds: RENDER_TIMEOUT or less (header X-Request-Timeout)"""
+    try:
+        return min(RENDER_TIMEOUT, float(headers.get("x-request-timeout", RENDER_TIMEOUT)))
+    except ValueError:
+        return RENDER_TIMEOUT
+
+
+def render_exception(ex: Exception) -> HTTPException:
+    """HTTP error of a failed render; errors of the input are 400"""
+    if isinstance(ex, RenderTimeout):
+        return HTTPException(status_code=504, detail=str(ex))
+    elif isinstance(ex, CircuitOpen):
+        return HTTPException(status_code=503, detail=str(ex), headers={"Retry-After": str(math.ceil(ex.retry_after))})
+    elif isinstance(ex, CircuitBreaker.FAILURES):
+        # the renderer (e.g. ghostscript) failed, not the input
+        return HTTPException(status_code=503, detail=str(ex))
+    elif isinstance(ex, RenderCancelled):
+        # nobody is listening anymore (499: client closed request)
+        return HTTPException(status_code=499, detail=str(ex))
+    detail = ex.message if hasattr(ex, 'message') else f"{type(ex).__name__}: {ex}"
+    return HTTPException(status_code=400, detail=detail)
+
+
+async def run_in_scope(request: Union[Request, WebSocket, None], scope: RenderScope, fnc: Callable, *args, **kwargs):
+    """
+    runs a (blocking) render function in the thread pool within the render scope. The scope is cancelled if the
+    HTTP client disconnects or the request task is cancelled, which aborts queued and running renders.
+    """
+    task = asyncio.ensure_future(run_in_threadpool(scope.run, fnc, *args, **kwargs))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if isinstance(request, Request) and await request.is_disconnected():
+                scope.cancel()
+                return await task
+    except asyncio.CancelledError:
+        scope.cancel()
+        raise
+
+
+# ----- priority lanes
+async def run_in_lane(request: Union[Request, WebSocket], fnc: Callable, *args, **kwargs):
+    """runs a (blocking) render function in the thread pool once the lane of the request grants a slot"""
+    lane = LANE_CLASSIFIER.classify(request.url.path, request.headers)
+    # the deadline includes the wait for a slot
+    scope = RenderScope(get_request_timeout(request.headers))
+    try:
+        async with LANES.slot(lane):
+            return await run_in_scope(request, scope, fnc, *args, **kwargs)
+    except LaneRejected as ex:
+        raise HTTPException(status_code=503, detail=str(ex), headers={"Retry-After": "1"})
+
+
+@api.get(ENTRYPOINT_ADMIN_LANES)
+async def lanes_status() -> dict:
+    return LANES.status()
+
+
+@api.get(ENTRYPOINT_ADMIN_RENDERER)
+async def renderer_status() -> dict:
+    return {
+        "pool": RENDER_POOL.status(),
+        "circuit_breaker": RENDER_BREAKER.status(),
+        "matrix_cache": DMCGenerator.matrix_cache.info(),
+    }
+
+
 # ----- API: generator
-def dmc_as_fileresponse(data: MessageData, **kwargs):
-    """wrapper to return a FileResponse"""
+def get_image_key(message: str, rectangular_dmc: bool = False, n_quiet_zone_modules: int = 2,
+                  output_format: str = "png", module_size_dots: int = None, dpi: int = 203) -> tuple:
+    key = (message, rectangular_dmc, n_quiet_zone_modules)
+    if output_format != "png" or module_size_dots is not None:
+        key += (output_format, module_size_dots, dpi)
+    return key
+
+
+def get_image(
+        message: str,
+        rectangular_dmc: bool = False,
+        n_quiet_zone_modules: int = 2,
+        count: bool = True,
+        output_format: str = "png",
+        module_size_dots: int = None,
+        dpi: int = 203,
+        use_cache: bool = True
+) -> bytes:
+    """
+    returns the encoded image of a message string from the image cache or renders it. Printer formats (and PNGs with
+    a module size in printer dots) are encoded directly from the 1-bit raster of the modules; barcode commands of
+    printer languages are returned without rendering. Batch jobs bypass the cache (use_cache=False), so that they
+    do not evict the images of interactive requests.
+    """
+    output_format = output_format.lower()
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}'. Use one of {list(OUTPUT_FORMATS)}.")
+    if output_format in COMMAND_FORMATS:
+        # the printer draws the code: nothing to render or to cache
+        return encode_command(
+            message,
+            output_format,
+            module_size_dots=module_size_dots or DEFAULT_MODULE_SIZE_DOTS,
+            n_quiet_zone_modules=n_quiet_zone_modules,
+            rectangular_dmc=rectangular_dmc
+        )
+    key = get_image_key(message, rectangular_dmc, n_quiet_zone_modules, output_format, module_size_dots, dpi)
+    content = IMAGE_CACHE.get(key, count=count) if use_cache else None
+    if content is None and use_cache and SHARED_CACHE is not None:
+        # rendered by another worker process
+        content = SHARED_CACHE.get("image", key)
+        if content is not None:
+            IMAGE_CACHE.put(key, content)
+            return content
+    if content is None:
+        # deadline of the request (if any)
+        scope = current_scope()
+        deadline = scope.deadline if scope is not None else None
+        if key[3:]:
+            img = generate_raster_from_string(
+                message,
+                module_size_dots=module_size_dots or DEFAULT_MODULE_SIZE_DOTS,
+                n_quiet_zone_modules=n_quiet_zone_modules,
+                rectangular_dmc=rectangular_dmc,
+                deadline=deadline,
+                use_cache=use_cache
+            )
+            content = encode_raster(img, output_format, dpi)
+        else:
+            img = generate_dmc_from_string(
+                message,
+                rectangular_dmc=rectangular_dmc,
+                n_quiet_zone_modules=n_quiet_zone_modules,
+                deadline=deadline,
+                use_cache=use_cache
+            )
+            content = encode_image(img, "PNG")
+        if use_cache:
+            IMAGE_CACHE.put(key, content)
+            if SHARED_CACHE is not None:
+                SHARED_CACHE.put("image", key, content)
+    return content
+
+
+def get_image_options(data: MessageData) -> dict:
+    return {
+        "rectangular_dmc": data.rectangular_dmc,
+        "n_quiet_zone_modules": data.n_quiet_zone_moduls,
+        "output_format": data.output_format.lower(),
+        "module_size_dots": data.module_size_dots,
+        "dpi": data.dpi,
+    }
+
+
+def prewarm_message(data: dict) -> bool:
+    """renders a MessageData (dictionary) of the pre-warm manifest into the image cache; False if already cached"""
+    data = MessageData(**data)
+    message = generate_message_string(data)
+    options = get_image_options(data)
+    if get_image_key(message, **options) in IMAGE_CACHE:
+        return False
+    with LANES.thread_slot(BACKGROUND_LANE):
+        # pre-warming must not distort the hit rate of the requests
+        get_image(message, **options, count=False)
+    return True
+
+
+PREWARMER = Prewarmer(render=prewarm_message, manifest=get_env_variable("PREWARM_MANIFEST", None))
+
+
+def get_artifact(content: bytes, output_format: str) -> dict:
+    """stores an image in the artifact store and returns its URL"""
+    if ARTIFACT_STORE is None:
+        raise ValueError("URLs need the artifact store, which is disabled (ARTIFACT_STORE).")
+    name = ARTIFACT_STORE.put(content, ARTIFACT_EXTENSIONS[output_format])
+    return {"url": f"{ENTRYPOINT_IMAGES}/{name}", "media_type": get_media_type(output_format), "size": len(content)}
+
+
+def get_image_url(message: str, **kwargs) -> str:
+    return get_artifact(get_image(message, **kwargs), kwargs.get("output_format", "png"))["url"]
+
+
+def dmc_as_response(data: Union[MessageData, str], url: bool = False, **kwargs) -> Response:
+    """wrapper to return the image of a DMC (PNG or a raster format of label printers) or its URL (url=True)"""
 
     try:
         if isinstance(data, str):
-            img_path = generate_dmc_from_string(data, file_path=IMAGE_FOLDER, **kwargs)
+            content = get_image(data, **kwargs)
+            output_format = kwargs.get("output_format", "png")
         else:
-            img_path = generate_dmc(data, file_path=IMAGE_FOLDER)
+            options = get_image_options(data)
+            content = get_image(generate_message_string(data), **options)
+            output_format = options["output_format"]
+        if url:
+            return JSONResponse(content=get_artifact(content, output_format))
     except Exception as ex:
-        detail = ex.message if hasattr(ex, 'message') else f"{type(ex).__name__}: {ex}"
-        raise HTTPException(status_code=400, detail=detail)
+        raise render_exception(ex)
 
-    return FileResponse(img_path,
-                        media_type='image/png',
-                        background=BackgroundTask(cleanup, temp_file=img_path.as_posix())
-                        )
+    return Response(content=content, media_type=get_media_type(output_format))
 
 
 RETURN_HEAD_GENERATOR = """HTTP/1.1 200 OK
@@ -129,22 +524,427 @@ Content-Type: images/png; charset=UTF-8
 # ----- API generator: image from single message string
 @api.get(ENTRYPOINT_DMC_GENERATOR_API_IMAGE_FROM_TEXT)
 async def generate_dmc_from_text(
+    request: Request,
     text: str, 
     rectangular_dmc: bool = False, 
     n_quiet_zone_moduls: int = 2,
-    ) -> FileResponse:
+    output_format: str = "png",
+    module_size_dots: int = None,
+    dpi: int = 203,
+    url: bool = False,
+    ) -> Response:
     
-    return dmc_as_fileresponse(data=text, rectangular_dmc=rectangular_dmc, n_quiet_zone_moduls=n_quiet_zone_moduls,)
+    return await run_in_lane(
+        request,
+        dmc_as_response,
+        data=text,
+        url=url,
+        rectangular_dmc=rectangular_dmc,
+        n_quiet_zone_modules=n_quiet_zone_moduls,
+        output_format=output_format.lower(),
+        module_size_dots=module_size_dots,
+        dpi=dpi,
+    )
 
 
 
 # ----- API generator: image from JSON object
 @api.post(ENTRYPOINT_DMC_GENERATOR_API_IMAGE_FROM_JSON)
-async def generate_dmc_from_json(data: MessageData) -> FileResponse:
+async def generate_dmc_from_json(data: MessageData, request: Request, url: bool = False) -> Response:
     if not data:
         raise HTTPException(status_code=400, detail="Input data cannot be empty.")
 
-    return dmc_as_fileresponse(data)
+    return await run_in_lane(request, dmc_as_response, data, url=url)
+
+
+# ----- API generator: message string, validation, capacity and image in one call
+def multipart_response(parts: list) -> Response:
+    """multipart/mixed response of (media type, content) parts"""
+    boundary = uuid.uuid4().hex
+    body = b""
+    for media_type, content in parts:
+        body += f"--{boundary}\r\nContent-Type: {media_type}\r\n\r\n".encode("ascii") + content + b"\r\n"
+    body += f"--{boundary}--\r\n".encode("ascii")
+    return Response(content=body, media_type=f"multipart/mixed; boundary={boundary}")
+
+
+def get_dmc_with_info(data: MessageData, image: bool = True, multipart: bool = False, url: bool = False) -> Response:
+    """
+    builds the message once and returns it with the validation of the fields, the number of (compressed) ASCII
+    characters, the symbol size and the image (base64, with multipart=true as binary second part, or with url=true
+    as URL of the artifact store)
+    """
+    try:
+        info = describe_dmc(data)
+        options = get_image_options(data)
+        content = get_image(info["message"], **options) if image else None
+        if content is not None and url:
+            info["url"] = get_artifact(content, options["output_format"])["url"]
+            content = None
+    except Exception as ex:
+        raise render_exception(ex)
+
+    info["output_format"] = options["output_format"]
+    if content is None or multipart:
+        info = jsonable_encoder(info)
+        if content is None:
+            return JSONResponse(content=info)
+        return multipart_response([
+            ("application/json", json.dumps(info).encode("utf-8")),
+            (get_media_type(options["output_format"]), content)
+        ])
+    info["image"] = base64.b64encode(content).decode("ascii")
+    return JSONResponse(content=jsonable_encoder(info))
+
+
+@api.post(ENTRYPOINT_DMC_GENERATOR_API)
+async def generate_dmc_with_info(data: MessageData, request: Request, image: bool = True, multipart: bool = False,
+                                 url: bool = False) -> Response:
+    return await run_in_lane(request, get_dmc_with_info, data, image, multipart, url)
+
+
+# ----- API generator: serialized labels from a template
+def get_template_serials(data: TemplateData) -> list:
+    if data.serials is not None:
+        serials = data.serials
+    elif data.serial_start is not None and data.serial_stop is not None:
+        serials = range(data.serial_start, data.serial_stop, data.serial_step)
+    else:
+        raise ValueError("Either serials or serial_start and serial_stop are required.")
+
+    if len(serials) > TEMPLATE_MAX_SERIALS:
+        raise ValueError(f"Too many serials: {len(serials)} > {TEMPLATE_MAX_SERIALS}.")
+    if isinstance(serials, range):
+        serials = list(serial_range(
+            serials.start, serials.stop, serials.step, width=data.serial_width, prefix=data.serial_prefix
+        ))
+    return serials
+
+
+async def render_template(request: Request, template: DMCTemplate, serials: list, options: dict,
+                          lane: str, url: bool = False) -> AsyncIterator[str]:
+    """one JSON object per line (NDJSON) and label; invalid serials are reported without aborting the stream"""
+    timeout = get_request_timeout(request.headers)
+    for serial in serials:
+        if await request.is_disconnected():
+            break
+        try:
+            message = template.get_message(serial)
+            # one slot and one deadline per label: interactive requests can overtake a long template
+            scope = RenderScope(timeout)
+            async with LANES.slot(lane):
+                content = await run_in_scope(request, scope, get_image_url if url else get_image, message, **options)
+            record = {"serial": serial, "message": message}
+            if url:
+                record["url"] = content
+            else:
+                record["image"] = base64.b64encode(content).decode("ascii")
+        except Exception as ex:
+            record = {"serial": serial, "error": f"{type(ex).__name__}: {ex}"}
+        yield json.dumps(record) + "\n"
+
+
+@api.post(ENTRYPOINT_DMC_GENERATOR_API_TEMPLATE)
+async def generate_dmcs_from_template(data: TemplateData, request: Request, url: bool = False) -> StreamingResponse:
+    try:
+        # static fields are validated once
+        template = DMCTemplate(
+            data.fields,
+            variable_data_identifier=data.variable_data_identifier,
+            message_format=data.format,
+            use_format_envelope=data.use_format_envelope,
+            use_message_envelope=data.use_message_envelope,
+        )
+        serials = get_template_serials(data)
+    except Exception as ex:
+        detail = ex.message if hasattr(ex, 'message') else f"{type(ex).__name__}: {ex}"
+        raise HTTPException(status_code=400, detail=detail)
+    if url and ARTIFACT_STORE is None:
+        raise HTTPException(status_code=400, detail="URLs need the artifact store, which is disabled (ARTIFACT_STORE).")
+
+    options = {"rectangular_dmc": data.rectangular_dmc, "n_quiet_zone_modules": data.n_quiet_zone_moduls}
+    lane = LANE_CLASSIFIER.classify(request.url.path, request.headers)
+    return StreamingResponse(
+        render_template(request, template, serials, options, lane, url),
+        media_type="application/x-ndjson"
+    )
+
+
+# ----- API generator: print sheets (many codes on one page image or PDF)
+def render_dmc_sheet(data: SheetData) -> Response:
+    messages = list(data.messages or []) + [generate_message_string(msg) for msg in data.data or []]
+    if not messages:
+        raise HTTPException(status_code=400, detail="Input data cannot be empty.")
+    if len(messages) > SHEET_MAX_LABELS:
+        raise HTTPException(status_code=400, detail=f"Too many labels: {len(messages)} > {SHEET_MAX_LABELS}.")
+    if data.output not in ("pdf", "png"):
+        raise HTTPException(status_code=400, detail=f"Unknown output '{data.output}'. Use 'pdf' or 'png'.")
+
+    try:
+        layout = SheetLayout(
+            n_columns=data.n_columns,
+            n_rows=data.n_rows,
+            page_size=data.page_size,
+            margin_mm=data.margin_mm,
+            gap_mm=data.gap_mm,
+            module_size_mm=data.module_size_mm,
+            n_quiet_zone_modules=data.n_quiet_zone_moduls,
+            caption=data.caption,
+            dpi=data.dpi
+        )
+        if data.output == "png":
+            if len(messages) > layout.labels_per_page:
+                raise ValueError(f"{len(messages)} labels do not fit on a single page "
+                                 f"({layout.labels_per_page} labels). Use the output 'pdf'.")
+            page = render_sheets(messages, layout, rectangular_dmc=data.rectangular_dmc)[0]
+            return Response(content=encode_image(page, "PNG"), media_type="image/png")
+        else:
+            pdf = generate_sheet_pdf(messages, layout, rectangular_dmc=data.rectangular_dmc)
+            return Response(content=pdf, media_type="application/pdf")
+    except Exception as ex:
+        raise render_exception(ex)
+
+
+@api.post(ENTRYPOINT_DMC_GENERATOR_API_SHEET)
+async def generate_dmc_sheet(data: SheetData, request: Request) -> Response:
+    return await run_in_lane(request, render_dmc_sheet, data)
+
+
+# ----- session: continuous generation over a WebSocket
+def process_session_request(request: SessionRequest, options: SessionOptions) -> tuple:
+    message = request.get_message(options)
+    if options.output_format == OUTPUT_MODULES:
+        content = modules_to_rows(DMCGenerator(message).generate_modules(rectangular_dmc=options.rectangular_dmc))
+    else:
+        content = get_image(message, **options.image_options())
+    return build_response(request.id, message, content, options)
+
+
+@api.websocket(ENTRYPOINT_SESSION)
+async def generation_session(websocket: WebSocket):
+    """
+    The client sends message strings or requests {"id", "text"} / {"id", "data": MessageData} and receives the
+    responses {"id", "message", "image"} in the same order. The options are negotiated once by the first frame
+    {"type": "options", ...}. At most max_in_flight requests are buffered; then the server stops reading.
+    """
+    await websocket.accept()
+    lane = LANE_CLASSIFIER.classify(websocket.url.path, websocket.headers)
+
+    options = SessionOptions(output_formats=list(OUTPUT_FORMATS))
+    frame = await websocket.receive_text()
+    try:
+        first = parse_frame(frame, 0)
+    except Exception as ex:
+        first = (0, f"{type(ex).__name__}: {ex}")
+    if isinstance(first, dict):
+        try:
+            options = SessionOptions.from_dict(first, output_formats=list(OUTPUT_FORMATS))
+        except Exception as ex:
+            await websocket.send_json({"type": "error", "detail": f"{type(ex).__name__}: {ex}"})
+            await websocket.close(code=1003)
+            return
+        first = None
+    await websocket.send_json({"type": "ready", "options": options.to_dict()})
+
+    requests = asyncio.Queue(maxsize=options.max_in_flight)
+    if first is not None:
+        requests.put_nowait(first)
+    # requests still queued when the client goes away are dropped, the running one is cancelled
+    closed = asyncio.Event()
+    scope = None
+
+    async def receive():
+        next_id = 1 if first is not None else 0
+        try:
+            while True:
+                frame = await websocket.receive_text()
+                try:
+                    request = parse_frame(frame, next_id)
+                    if isinstance(request, dict):
+                        raise ValueError("The options can only be negotiated by the first frame of a session.")
+                except Exception as ex:
+                    request = (next_id, f"{type(ex).__name__}: {ex}")
+                next_id += 1
+                await requests.put(request)
+        except WebSocketDisconnect:
+            closed.set()
+            if scope is not None:
+                scope.cancel()
+        finally:
+            await requests.put(None)
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            request = await requests.get()
+            if request is None or closed.is_set():
+                break
+            if isinstance(request, tuple):
+                await websocket.send_json({"id": request[0], "error": request[1]})
+                continue
+            try:
+                scope = RenderScope(RENDER_TIMEOUT)
+                async with LANES.slot(lane):
+                    response, content = await run_in_scope(websocket, scope, process_session_request, request, options)
+            except RenderCancelled:
+                break
+            except Exception as ex:
+                await websocket.send_json({"id": request.id, "error": f"{type(ex).__name__}: {ex}"})
+                continue
+            await websocket.send_json(response)
+            if content is not None:
+                await websocket.send_bytes(content)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+
+
+# ----- jobs: large batches in the background
+def render_job_item(data: dict) -> tuple:
+    data = MessageData(**data)
+    message = generate_message_string(data)
+    # with the deadline of a request, and neither the images nor the symbols of the batch are cached
+    with LANES.thread_slot(BACKGROUND_LANE):
+        scope = RenderScope(RENDER_TIMEOUT, use_cache=False)
+        return message, scope.run(get_image, message, **get_image_options(data), count=False, use_cache=False)
+
+
+JOB_RUNNER = JobRunner(
+    JOB_STORE,
+    render=render_job_item,
+    n_workers=get_env_variable("JOB_WORKERS", 1),
+    chunk_size=get_env_variable("JOB_CHUNK_SIZE", 50),
+)
+
+
+def submit_job(items, options: dict = None) -> dict:
+    job_id = JOB_STORE.create_job(items, options)
+    JOB_RUNNER.notify()
+    return JOB_STORE.get_job(job_id)
+
+
+@api.post(ENTRYPOINT_JOBS)
+def create_job(data: JobData) -> dict:
+    if not data.messages:
+        raise HTTPException(status_code=400, detail="Input data cannot be empty.")
+    return submit_job(jsonable_encoder(msg) for msg in data.messages)
+
+
+@api.post(ENTRYPOINT_JOBS_UPLOAD)
+async def create_job_from_upload(request: Request) -> dict:
+    """creates a job from a JSONL body (one MessageData per line), which is streamed to disk first"""
+    with tempfile.NamedTemporaryFile("wb", suffix=".jsonl", delete=False) as fid:
+        async for chunk in request.stream():
+            fid.write(chunk)
+    path = Path(fid.name)
+    try:
+        job = await run_in_threadpool(submit_job, read_manifest(path))
+    except Exception as ex:
+        raise HTTPException(status_code=400, detail=f"{type(ex).__name__}: {ex}")
+    finally:
+        path.unlink()
+    return job
+
+
+@api.get(ENTRYPOINT_JOBS)
+async def list_jobs() -> list:
+    return JOB_STORE.list_jobs()
+
+
+@api.get(ENTRYPOINT_JOBS + "/{job_id}")
+async def get_job(job_id: str) -> dict:
+    job = JOB_STORE.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    return job
+
+
+@api.get(ENTRYPOINT_JOBS + "/{job_id}/results")
+def get_job_results(job_id: str, offset: int = 0, limit: int = 1000) -> StreamingResponse:
+    """
+    completed results as JSON lines {"index", "message", "image"} / {"index", "error"} from offset on. The header
+    X-Next-Offset is the offset of the next request; it equals the total once the job is done.
+    """
+    if JOB_STORE.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    rows = list(JOB_STORE.get_results(job_id, offset, limit))
+    next_offset = rows[-1][0] + 1 if rows else offset
+
+    def lines():
+        for idx, message, content, error in rows:
+            if error is None:
+                record = {"index": idx, "message": message, "image": base64.b64encode(content).decode("ascii")}
+            else:
+                record = {"index": idx, "error": error}
+            yield json.dumps(record) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Next-Offset": str(next_offset)})
+
+
+@api.delete(ENTRYPOINT_JOBS + "/{job_id}")
+def delete_job(job_id: str, keep_results: bool = False) -> dict:
+    """cancels a job; its data are deleted unless keep_results is set"""
+    if JOB_STORE.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found.")
+    cancelled = JOB_STORE.cancel(job_id)
+    if not keep_results:
+        JOB_STORE.delete(job_id)
+    return {"id": job_id, "cancelled": cancelled, "deleted": not keep_results}
+
+
+# ----- print: send labels to label printers
+def submit_print_job(data: PrintData) -> dict:
+    if data.printer not in PRINT_SPOOLER.printers:
+        raise HTTPException(status_code=404, detail=f"Unknown printer '{data.printer}'.")
+    try:
+        payloads = [payload.encode("ascii") for payload in data.payloads or []]
+        for msg in data.messages or []:
+            options = get_image_options(msg)
+            if options["output_format"] == "png":
+                options["output_format"] = PRINT_DEFAULT_FORMAT
+            payloads.append(get_image(generate_message_string(msg), **options))
+    except Exception as ex:
+        raise render_exception(ex)
+    if not payloads:
+        raise HTTPException(status_code=400, detail="Input data cannot be empty.")
+
+    jobs = [PRINT_SPOOLER.submit(data.printer, payload) for payload in payloads for _ in range(data.copies)]
+    return {"jobs": [job.id for job in jobs]}
+
+
+@api.post(ENTRYPOINT_PRINT)
+async def print_labels(data: PrintData, request: Request) -> dict:
+    return await run_in_lane(request, submit_print_job, data)
+
+
+@api.get(ENTRYPOINT_PRINT)
+async def print_status() -> dict:
+    return PRINT_SPOOLER.status()
+
+
+@api.get(ENTRYPOINT_PRINT + "/{job_id}")
+async def print_job_status(job_id: int) -> dict:
+    job = PRINT_SPOOLER.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Print job {job_id} not found.")
+    return job.info()
+
+
+# ----- admin: pre-populate the image cache
+@api.get(ENTRYPOINT_ADMIN_PREWARM)
+async def prewarm_status() -> dict:
+    return PREWARMER.status() | {"cache": IMAGE_CACHE.info()}
+
+
+@api.post(ENTRYPOINT_ADMIN_PREWARM)
+async def start_prewarm_manually() -> dict:
+    try:
+        started = PREWARMER.start()
+    except (ValueError, FileNotFoundError) as ex:
+        raise HTTPException(status_code=400, detail=f"{type(ex).__name__}: {ex}")
+    if not started:
+        raise HTTPException(status_code=409, detail="Pre-warming is already running.")
+    return PREWARMER.status()
 
 
 # ----- API generator: message
@@ -179,6 +979,98 @@ async def parse_message_to_json(text: str, check_format: bool = True) -> dict:
     return messages
 
 
+def read_lines(path: Path) -> Iterator[str]:
+    """non-empty lines of a file (one message string per line)"""
+    with open(path, "r", encoding="utf-8", newline="\n") as fid:
+        for line in fid:
+            line = line.rstrip("\r\n")
+            if line:
+                yield line
+
+
+# media types of the columnar outputs
+COLUMN_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+
+class TemporaryFileResponse(FileResponse):
+    """FileResponse that removes the file afterwards, also if the client disconnected (skips background tasks)"""
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            Path(self.path).unlink(missing_ok=True)
+
+
+@api.post(ENTRYPOINT_DMC_GENERATOR_API_PARSER_BULK)
+async def parse_messages_to_columns(
+        request: Request,
+        output_format: str = "csv",
+        data_identifiers: str = None,
+        include_text: bool = False
+) -> Response:
+    """
+    parses many message strings (body: one per line, streamed to disk first) into columns, one per data identifier
+    (comma-separated data_identifiers or those of the first messages) with its validity mask; dates and numbers
+    are typed. Returns CSV (streamed) or a Parquet or Arrow file.
+    """
+    output_format = output_format.lower()
+    if output_format not in COLUMN_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unknown output format '{output_format}'. "
+                                                    f"Use one of {list(COLUMN_FORMATS)}.")
+    data_identifiers = [di.strip() for di in data_identifiers.split(",") if di.strip()] if data_identifiers else None
+
+    with tempfile.NamedTemporaryFile("wb", suffix=".txt", delete=False) as fid:
+        try:
+            async for chunk in request.stream():
+                fid.write(chunk)
+        except BaseException:
+            fid.close()
+            Path(fid.name).unlink(missing_ok=True)
+            raise
+    path = Path(fid.name)
+
+    if output_format == "csv":
+        # the upload is removed after the response, also if it is never sent
+        cleanup = BackgroundTask(path.unlink, missing_ok=True)
+        try:
+            # reads the first messages (columns), so that invalid input is reported before the response starts
+            parser, batches = await run_in_threadpool(parse_columns, read_lines(path), data_identifiers,
+                                                      include_text=include_text)
+        except BaseException as ex:
+            await cleanup()
+            if isinstance(ex, (ValueError, KeyError)):
+                raise HTTPException(status_code=400, detail=f"{type(ex).__name__}: {ex}")
+            raise
+
+        def rows() -> Iterator[str]:
+            # also removes the upload if the stream is aborted (the background task does not run then)
+            try:
+                yield from iter_csv(parser, batches)
+            finally:
+                path.unlink(missing_ok=True)
+        return StreamingResponse(rows(), media_type=COLUMN_MEDIA_TYPES[output_format], background=cleanup)
+
+    with tempfile.NamedTemporaryFile("wb", suffix=f".{output_format}", delete=False) as fid:
+        output_path = Path(fid.name)
+    try:
+        await run_in_threadpool(write_columns, read_lines(path), output_path, output_format, data_identifiers,
+                                include_text=include_text)
+    except BaseException as ex:
+        output_path.unlink(missing_ok=True)
+        if isinstance(ex, ImportError):
+            raise HTTPException(status_code=501, detail=str(ex))
+        elif isinstance(ex, (ValueError, KeyError)):
+            raise HTTPException(status_code=400, detail=f"{type(ex).__name__}: {ex}")
+        raise
+    finally:
+        path.unlink(missing_ok=True)
+    return TemporaryFileResponse(output_path, media_type=COLUMN_MEDIA_TYPES[output_format],
+                                 filename=f"messages.{output_format}")
+
 if __name__ == '__main__':
     filename_log = os.environ["LOGFILE"] if "LOGFILE" in os.environ else "log"
     #
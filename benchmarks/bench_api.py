@@ -0,0 +1,137 @@
+"""
+End-to-end throughput of the fastAPI service (api-main.py) against a local uvicorn server.
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import http.client
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from runner import benchmark, ROOT
+from bench_library import require, DMC_TEXT
+
+from typing import Dict, List, Tuple, Any
+
+
+def get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_server(workers: int = 1, port: int = None, env: Dict[str, str] = None, timeout: float = 30):
+    """starts api-main:api with uvicorn as a subprocess and waits until it answers requests"""
+    port = port if port else get_free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "api-main:api", "--host=127.0.0.1", f"--port={port}",
+           f"--workers={workers}", "--log-level=warning"]
+    process = subprocess.Popen(cmd, cwd=ROOT, env=os.environ | (env or dict()))
+    try:
+        t0 = time.monotonic()
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}.")
+            try:
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+                conn.request("GET", "/")
+                conn.getresponse().read()
+                conn.close()
+                break
+            except OSError:
+                if time.monotonic() - t0 > timeout:
+                    raise TimeoutError(f"Server did not start within {timeout}s.")
+                time.sleep(0.2)
+        yield port, process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def closed_loop(
+        port: int,
+        request: Tuple[str, str, Any],
+        n_requests: int,
+        concurrency: int
+) -> Dict[str, Any]:
+    """sends n_requests with a fixed number of concurrent keep-alive connections"""
+    method, url, body = request
+    headers = {"Content-Type": "application/json"} if body is not None else dict()
+    payload = json.dumps(body) if body is not None else None
+
+    latencies: List[float] = []
+    errors = [0]
+    counter = iter(range(n_requests))
+    lock = threading.Lock()
+
+    def worker():
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    break
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, url, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                ok = response.status < 400
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                ok = False
+            dt = time.perf_counter() - t0
+            with lock:
+                latencies.append(dt)
+                errors[0] += not ok
+        conn.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    t_start = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    duration = time.perf_counter() - t_start
+
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "duration_s": duration,
+        "throughput_rps": len(latencies) / duration,
+        "p50_s": quantiles[49],
+        "p95_s": quantiles[94],
+        "p99_s": quantiles[98],
+    }
+
+
+MESSAGE_DATA = {"messages": [{"fields": {"S": "123456", "V": "123H48999", "P": "12345-AB"}}]}
+REQUESTS = {
+    "parser": ("GET", "/parser/from-text?" + urlencode({"text": DMC_TEXT}), None),
+    "count": ("GET", "/count-ascii-characters/from-text?" + urlencode({"text": DMC_TEXT}), None),
+    "image-from-text": ("GET", "/image/from-text?" + urlencode({"text": DMC_TEXT}), None),
+    "image-from-json": ("POST", "/image/from-json", MESSAGE_DATA),
+}
+
+
+def bench_api_throughput(endpoint: str, workers: int = 1, concurrency: int = 8, n_requests: int = 500):
+    for module in ["fastapi", "uvicorn", "treepoem", "PIL", "prometheus_fastapi_instrumentator"]:
+        require(module)
+
+    with local_server(workers=workers) as (port, _):
+        # warm up
+        closed_loop(port, REQUESTS[endpoint], min(20, n_requests), 1)
+        return closed_loop(port, REQUESTS[endpoint], n_requests, concurrency)
+
+
+for _endpoint in REQUESTS:
+    benchmark("api.throughput", group="api", params={"endpoint": _endpoint})(bench_api_throughput)
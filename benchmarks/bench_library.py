@@ -0,0 +1,253 @@
+"""
+Benchmark cases for the hot paths of the DataMatrixCode package.
+"""
+import importlib
+
+from runner import benchmark, SkipBenchmark
+
+
+DMC_TEXT = "[)>\x1eS123456\x1dV123H48999\x1d18D202312011155\x1d15D24121990\x04"
+FIELDS = ["S123456", "V123H48999", "18D202312011155", "15D24121990", "D230501", "P12345-AB", "Q100", "1T987654"]
+
+# number of characters of the serial number: covers small, medium, and large symbol sizes
+SYMBOL_SIZES = [10, 40, 150, 500]
+
+
+def require(module: str):
+    try:
+        return importlib.import_module(module)
+    except ImportError as ex:
+        raise SkipBenchmark(f"{type(ex).__name__}: {ex}")
+
+
+# ----- message string
+@benchmark("count_compressed_ascii_characters", params={"n_chars": 1000})
+@benchmark("count_compressed_ascii_characters", params={"n_chars": 60})
+def bench_count_compressed_ascii_characters(n_chars: int):
+    dmc_text = require("DataMatrixCode.DMCText")
+    text = (DMC_TEXT * (n_chars // len(DMC_TEXT) + 1))[:n_chars]
+    return lambda: dmc_text.count_compressed_ascii_characters(text)
+
+
+@benchmark("validate_format", params={"spec": "an3+an3...35+\"+\"+a1...3"})
+@benchmark("validate_format", params={"spec": "an3+n8"})
+def bench_validate_format(spec: str):
+    format_specifications = require("DataMatrixCode.utils.format_specifications")
+    examples = {"an3+n8": "27D20170615", "an3+an3...35+\"+\"+a1...3": "26HLHHIBC987XY65+LK"}
+    text = examples[spec]
+    return lambda: format_specifications.validate_format(spec, text)
+
+
+@benchmark("FormatParser.parse", params={"n_fields": 8, "cast": True})
+@benchmark("FormatParser.parse", params={"n_fields": 8, "cast": False})
+@benchmark("FormatParser.parse", params={"n_fields": 1, "cast": False})
+def bench_format_parser(n_fields: int, cast: bool):
+    dmc = require("DataMatrixCode")
+    fields = FIELDS[:n_fields]
+    return lambda: dmc.FormatParser(dmc.FORMAT_ANSI_MH_10, fields, strict=False).parse(cast)
+
+
+@benchmark("FormatParser.parse_compact", params={"n_fields": 8, "cast": False})
+@benchmark("FormatParser.parse_compact", params={"n_fields": 1, "cast": False})
+def bench_format_parser_compact(n_fields: int, cast: bool):
+    dmc = require("DataMatrixCode")
+    fields = FIELDS[:n_fields]
+    return lambda: dmc.FormatParser(dmc.FORMAT_ANSI_MH_10, fields, strict=False).parse_compact(cast)
+
+
+@benchmark("FormatParser.parse.corpus", params={"n_messages": 2000, "seed": 0, "method": "parse_compact"})
+@benchmark("FormatParser.parse.corpus", params={"n_messages": 2000, "seed": 0, "method": "parse"})
+def bench_format_parser_corpus(n_messages: int, seed: int, method: str):
+    """
+    memory of the kept results per parsed message and throughput of FormatParser.parse or parse_compact (not timed
+    by the runner)
+    """
+    import time
+    import tracemalloc
+    dmc = require("DataMatrixCode")
+    corpus = require("corpus")
+    texts = [rec["text"] for rec in corpus.CorpusGenerator(seed).generate(n_messages, invalid_ratio=0.1)]
+    contents = []
+    for text in texts:
+        try:
+            contents.append(dmc.DMCMessageParser(text).get_content()[dmc.FORMAT_ANSI_MH_10])
+        except Exception:
+            pass
+
+    def parse_all() -> list:
+        return [getattr(dmc.FormatParser(dmc.FORMAT_ANSI_MH_10, fields, strict=False), method)()[0]
+                for fields in contents]
+
+    parse_all()
+    tracemalloc.start()
+    results = parse_all()
+    n_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+
+    times = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        parse_all()
+        times.append(time.perf_counter() - t0)
+    return {
+        "bytes_per_message": n_bytes / len(contents),
+        "messages_per_s": len(contents) / min(times),
+        "fields_per_message": sum(len(fields) for fields in contents) / len(contents),
+    }
+
+
+@benchmark("DMCMessageParser.get_content")
+def bench_message_parser():
+    dmc = require("DataMatrixCode")
+    return lambda: dmc.DMCMessageParser(DMC_TEXT).get_content()
+
+
+@benchmark("parse_dmc", params={"check_format": True})
+def bench_parse_dmc(check_format: bool):
+    dmc = require("DataMatrixCode")
+    # uncached: the cost of parsing
+    return lambda: dmc.parse_dmc(DMC_TEXT, check_format=check_format, use_cache=False)
+
+
+@benchmark("parse_dmc.cached", params={"check_format": True})
+def bench_parse_dmc_cached(check_format: bool):
+    """repeated scans of the same label"""
+    dmc = require("DataMatrixCode")
+    dmc.parse_dmc(DMC_TEXT, check_format=check_format)
+    return lambda: dmc.parse_dmc(DMC_TEXT, check_format=check_format)
+
+
+@benchmark("parse_dmc.corpus", params={"n_messages": 200, "seed": 0})
+def bench_parse_dmc_corpus(n_messages: int, seed: int):
+    """parses a synthetic corpus of messages (see corpus.py); time per corpus"""
+    dmc = require("DataMatrixCode")
+    corpus = require("corpus")
+    texts = [rec["text"] for rec in corpus.CorpusGenerator(seed).generate(n_messages, invalid_ratio=0.1)]
+
+    def fnc():
+        for text in texts:
+            dmc.parse_dmc(text, use_cache=False)
+    return fnc
+
+
+@benchmark("write_columns.corpus", params={"n_messages": 200, "seed": 0})
+def bench_write_columns_corpus(n_messages: int, seed: int):
+    """parses a synthetic corpus into CSV columns in one pass; time per corpus"""
+    import io
+    dmc = require("DataMatrixCode")
+    corpus = require("corpus")
+    texts = [rec["text"] for rec in corpus.CorpusGenerator(seed).generate(n_messages, invalid_ratio=0.1)]
+    return lambda: dmc.write_columns(texts, io.StringIO(), "csv")
+
+
+@benchmark("DMCMessageBuilder", params={"n_fields": 8})
+@benchmark("DMCMessageBuilder", params={"n_fields": 2})
+def bench_message_builder(n_fields: int):
+    dmc = require("DataMatrixCode")
+    fields = dict()
+    for fld in FIELDS[:n_fields]:
+        di = dmc.FormatParser(dmc.FORMAT_ANSI_MH_10, [fld]).parse()[0][0]["data_identifier"]
+        fields[di] = fld[len(di):]
+
+    def fnc():
+        builder = dmc.DMCMessageBuilder(fields)
+        return builder.get_message_string(use_format_envelope=True, use_message_envelope=True)
+    return fnc
+
+
+@benchmark("DMCTemplate.messages", params={"n_labels": 1000})
+def bench_template(n_labels: int):
+    dmc = require("DataMatrixCode")
+    template = dmc.DMCTemplate({"P": "12345-AB", "V": "123H48999", "Q": "100"}, use_format_envelope=True)
+
+    def fnc():
+        return list(template.messages(dmc.serial_range(0, n_labels, width=8)))
+    return fnc
+
+
+@benchmark("DMCMessageBuilder.serials", params={"n_labels": 1000})
+def bench_builder_serials(n_labels: int):
+    dmc = require("DataMatrixCode")
+    fields = {"P": "12345-AB", "V": "123H48999", "Q": "100"}
+
+    def fnc():
+        messages = []
+        for serial in dmc.serial_range(0, n_labels, width=8):
+            builder = dmc.DMCMessageBuilder(fields | {"S": serial})
+            messages.append(builder.get_message_string(use_format_envelope=True, use_message_envelope=True))
+        return messages
+    return fnc
+
+
+# ----- image
+def bench_generate_image(n_chars: int, rectangular: bool):
+    require("treepoem")
+    require("PIL")
+    dmc = require("DataMatrixCode")
+    serial = ("1234567890" * (n_chars // 10 + 1))[:n_chars]
+    data = {dmc.FORMAT_ANSI_MH_10: {"S": serial, "V": "123H48999"}}
+
+    def fnc():
+        # cold: the symbol is rendered every time
+        dmc.DMCGenerator.matrix_cache.clear()
+        code = dmc.DataMatrixCode(data, use_format_envelope=False, use_message_envelope=True, rectangular_dmc=rectangular)
+        return code.generate_image()
+    return fnc
+
+
+for _n_chars in SYMBOL_SIZES:
+    benchmark("DataMatrixCode.generate_image", group="image", params={"n_chars": _n_chars, "rectangular": False})(
+        bench_generate_image
+    )
+# rectangular codes are limited to small messages (DMRE)
+for _n_chars in SYMBOL_SIZES[:2]:
+    benchmark("DataMatrixCode.generate_image", group="image", params={"n_chars": _n_chars, "rectangular": True})(
+        bench_generate_image
+    )
+
+
+@benchmark("DMCGenerator variants from cached matrix", group="image", params={"n_chars": 150})
+def bench_generate_variants(n_chars: int):
+    require("treepoem")
+    require("PIL")
+    dmc = require("DataMatrixCode")
+    serial = ("1234567890" * (n_chars // 10 + 1))[:n_chars]
+    message = dmc.DataMatrixCode({dmc.FORMAT_ANSI_MH_10: {"S": serial}}, use_format_envelope=False,
+                                 use_message_envelope=True).get_message()
+    generator = dmc.DMCGenerator(message)
+    generator.get_matrix()
+
+    def fnc():
+        # other quiet zones and a printer raster of the same message: no render
+        return [generator.generate(n_quiet_zone_modules=n) for n in (0, 2, 4)] + [generator.generate_raster(6)]
+    return fnc
+
+
+@benchmark("generate_many", group="image", params={"n_labels": 50, "workers": 4})
+@benchmark("generate_many", group="image", params={"n_labels": 50, "workers": 0})
+def bench_generate_many(n_labels: int, workers: int):
+    require("treepoem")
+    require("PIL")
+    dmc = require("DataMatrixCode")
+    data = [dmc.MessageData(messages=[dmc.EnvelopeData(fields={"P": "12345-AB", "S": f"{i:08d}"})])
+            for i in range(n_labels)]
+
+    def fnc():
+        # cold: every symbol is rendered
+        dmc.DMCGenerator.matrix_cache.clear()
+        return list(dmc.generate_many(data, workers=workers, output="png"))
+    return fnc
+
+
+@benchmark("generate_sheet_pdf", group="image", params={"n_labels": 50})
+def bench_sheet(n_labels: int):
+    require("treepoem")
+    require("PIL")
+    dmc = require("DataMatrixCode")
+    messages = list(dmc.DMCTemplate({"P": "12345-AB", "V": "123H48999"}).messages(dmc.serial_range(0, n_labels, width=8)))
+    layout = dmc.SheetLayout(n_columns=5, n_rows=10, caption=True)
+
+    def fnc():
+        return dmc.generate_sheet_pdf(messages, layout)
+    return fnc
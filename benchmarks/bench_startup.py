@@ -0,0 +1,36 @@
+"""
+Cold-start time of the DataMatrixCode package, measured in a fresh interpreter per run.
+"""
+import json
+import subprocess
+import sys
+
+from runner import benchmark, ROOT
+
+
+HEAVY_MODULES = ["PIL", "treepoem", "pydantic", "fastapi"]
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+@benchmark("startup.python", group="startup")
+def bench_startup_python():
+    """interpreter start-up without any import as reference"""
+    return lambda: run_python("pass")
+
+
+@benchmark("startup.import", group="startup", params={"code": "import DataMatrixCode"})
+@benchmark("startup.import", group="startup", params={"code": "from DataMatrixCode import parse_dmc; parse_dmc('[)>\\x1eS1\\x04')"})
+@benchmark("startup.import", group="startup", params={"code": "from DataMatrixCode import DMCGenerator"})
+def bench_startup_import(code: str):
+    return lambda: run_python(code)
+
+
+@benchmark("startup.loaded_modules", group="startup", params={"code": "import DataMatrixCode"})
+@benchmark("startup.loaded_modules", group="startup", params={"code": "from DataMatrixCode import parse_dmc; parse_dmc('[)>\\x1eS1\\x04')"})
+def bench_startup_loaded_modules(code: str):
+    """which of the heavy dependencies are loaded (not timed; 1 = loaded)"""
+    check = f"import sys, json; print(json.dumps({{m: int(m in sys.modules) for m in {HEAVY_MODULES!r}}}))"
+    return json.loads(run_python(code + "\n" + check).stdout)
@@ -0,0 +1,241 @@
+"""
+Synthetic corpus of messages for benchmarks and load tests.
+
+The content of every data identifier is generated from its format specification (the 'Meta Data' column of the
+data identifier table, e.g. 'an3+n8'), i.e. the inverse of DataMatrixCode.utils.format_specifications.build_format_pattern.
+Date identifiers get a random date in the format given in their explanation. Invalid variants violate the
+specification deliberately (too long, too short, illegal character, no content, unknown data identifier).
+
+Each line of the output is a JSON object with the keys:
+    id            running number
+    valid         True if all fields comply with their format specification
+    invalid       list of the manipulated data identifiers and how they were manipulated
+    message_data  JSON representation of DataMatrixCode.MessageData (body for /image/from-json)
+    text          raw message string as delivered by a scanner (incl. envelopes and control characters)
+
+Example:
+    python benchmarks/corpus.py --n-messages 10000 --seed 42 --output benchmarks/results/corpus.jsonl
+"""
+import argparse
+import json
+import random
+import re
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from DataMatrixCode.utils import FORMAT_ANSI_MH_10, message_formats, validate_format, sample_format
+from DataMatrixCode.DMCText import DMCMessageBuilder, get_date_format, easy_datetime_format_converter
+
+from typing import Dict, List, Tuple, Union, Iterator, Any
+
+
+DATE_MIN = datetime(2000, 1, 1)
+DATE_RANGE_S = int((datetime(2035, 12, 31) - DATE_MIN).total_seconds())
+INVALID_VARIANTS = ["too_long", "too_short", "illegal_character", "empty", "unknown_data_identifier"]
+
+
+class CorpusGenerator:
+    def __init__(
+            self,
+            seed: int = 0,
+            di_format: str = FORMAT_ANSI_MH_10,
+            data_identifiers: List[str] = None,
+            max_field_length: int = 35,
+            n_attempts: int = 10
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.di_format = di_format
+        self.mapping = message_formats(di_format).get_di_mapping()
+        re_di = re.compile(message_formats(di_format).get_di_pattern())
+        self.max_field_length = max_field_length
+        self.n_attempts = n_attempts
+
+        # data identifiers for which valid content can be generated
+        self.data_identifiers = []
+        self.unsupported = dict()
+        for di in (data_identifiers if data_identifiers else self.mapping.keys()):
+            if di not in self.mapping:
+                raise ValueError(f"Unknown data identifier '{di}' for {di_format}.")
+            if not re_di.fullmatch(di):
+                # e.g. ranges of identifiers like '11Z - 99Z'
+                self.unsupported[di] = "not a single data identifier"
+                continue
+            try:
+                self.sample_content(di)
+                self.data_identifiers.append(di)
+            except ValueError as ex:
+                self.unsupported[di] = str(ex)
+
+    def __repr__(self):
+        return f"CorpusGenerator({self.di_format}, {len(self.data_identifiers)} data identifiers)"
+
+    def _is_valid(self, di: str, content: str) -> bool:
+        meta_data = self.mapping[di]["Meta Data"]
+        if meta_data != "":
+            return validate_format(meta_data, di + content, strict=False)
+        return len(content) > 0
+
+    def _sample_date(self, di: str) -> Union[str, None]:
+        m = get_date_format(self.mapping[di]["Explanation"])
+        if not m:
+            return None
+        datetime_format = easy_datetime_format_converter(m.group())
+        date = DATE_MIN + timedelta(seconds=self.rng.randrange(DATE_RANGE_S))
+        content = date.strftime(datetime_format)
+        # the parser must be able to cast the content back (see FormatParser._cast_text())
+        datetime.strptime(content, datetime_format)
+        return content
+
+    def sample_content(self, di: str) -> str:
+        """generates valid content (without the data identifier itself) for a data identifier"""
+        meta_data = self.mapping[di]["Meta Data"]
+        for _ in range(self.n_attempts):
+            content = None
+            if di[-1] == "D":
+                try:
+                    content = self._sample_date(di)
+                except Exception as ex:
+                    raise ValueError(f"Date format of '{di}' cannot be processed: {ex}")
+            if content is None:
+                if meta_data != "":
+                    content = sample_format(meta_data, self.rng, self.max_field_length, skip_characters=len(di))
+                else:
+                    # no specification: printable ASCII characters
+                    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-./ "
+                    content = "".join(self.rng.choices(alphabet[:-1], k=1) +
+                                      self.rng.choices(alphabet, k=self.rng.randint(0, self.max_field_length - 1)))
+            if self._is_valid(di, content):
+                return content
+        raise ValueError(f"Could not generate content for '{di}' that complies with '{meta_data}'.")
+
+    def sample_invalid_content(self, di: str) -> Tuple[str, str, str]:
+        """generates content that violates the format specification; returns (data identifier, content, variant)"""
+        variants = INVALID_VARIANTS[:]
+        self.rng.shuffle(variants)
+        for variant in variants:
+            content = self.sample_content(di)
+            di_ = di
+            if variant == "too_long":
+                # repeat the last character (same character class) beyond the maximal length
+                content += content[-1:] * (self.max_field_length + self.rng.randint(1, 10))
+            elif variant == "too_short":
+                content = content[:self.rng.randint(0, max(0, len(content) - 1))]
+            elif variant == "illegal_character":
+                i = self.rng.randrange(len(content))
+                content = content[:i] + self.rng.choice("#$%&*") + content[i + 1:]
+            elif variant == "empty":
+                content = ""
+            elif variant == "unknown_data_identifier":
+                di_ = self.rng.choice(["A", "0A", "99Z", "9Y"])
+                if di_ in self.mapping:
+                    continue
+                return di_, content, variant
+
+            if not self._is_valid(di_, content):
+                return di_, content, variant
+        raise ValueError(f"Could not generate invalid content for '{di}'.")
+
+    def sample_message(
+            self,
+            n_fields: Tuple[int, int] = (1, 6),
+            invalid: bool = False,
+            use_format_envelope: bool = False
+    ) -> Dict[str, Any]:
+        n = self.rng.randint(*n_fields)
+        dis = self.rng.sample(self.data_identifiers, k=min(n, len(self.data_identifiers)))
+        fields = {di: self.sample_content(di) for di in dis}
+
+        manipulated = []
+        if invalid:
+            di = self.rng.choice(dis)
+            di_, content, variant = self.sample_invalid_content(di)
+            # keep the position of the field in the message
+            fields = {(di_ if ky == di else ky): (content if ky == di else vl) for ky, vl in fields.items()}
+            manipulated.append({"data_identifier": di_, "variant": variant})
+
+        text = DMCMessageBuilder(fields, self.di_format).get_message_string(
+            use_format_envelope=use_format_envelope,
+            use_message_envelope=True
+        )
+        message_data = {
+            "messages": [{"format": self.di_format, "fields": fields}],
+            "rectangular_dmc": False,
+            "n_quiet_zone_moduls": 2,
+            "use_format_envelope": use_format_envelope,
+            "use_message_envelope": True,
+        }
+        return {"valid": not invalid, "invalid": manipulated, "message_data": message_data, "text": text}
+
+    def generate(
+            self,
+            n_messages: int,
+            n_fields: Tuple[int, int] = (1, 6),
+            invalid_ratio: float = 0.0,
+            format_envelope_ratio: float = 0.0
+    ) -> Iterator[Dict[str, Any]]:
+        for i in range(n_messages):
+            record = self.sample_message(
+                n_fields=n_fields,
+                invalid=self.rng.random() < invalid_ratio,
+                use_format_envelope=self.rng.random() < format_envelope_ratio
+            )
+            yield {"id": i} | record
+
+
+def load_corpus(path: Union[str, Path]) -> List[Dict[str, Any]]:
+    with open(path, "r") as fid:
+        return [json.loads(ln) for ln in fid if ln.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generates a synthetic corpus of DMC messages (JSONL).")
+    parser.add_argument("--output", "-o", type=str, required=True, help="Path to the JSONL output file.")
+    parser.add_argument("--raw-output", type=str, default=None,
+                        help="Optional path for the raw message strings only (one per line).")
+    parser.add_argument("--n-messages", "-n", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-fields", type=int, default=1)
+    parser.add_argument("--max-fields", type=int, default=6)
+    parser.add_argument("--max-field-length", type=int, default=35,
+                        help="Cap for format specifications without an upper limit.")
+    parser.add_argument("--invalid-ratio", type=float, default=0.0, help="Share of messages with an invalid field.")
+    parser.add_argument("--format-envelope-ratio", type=float, default=0.0,
+                        help="Share of messages that use a format envelope.")
+    parser.add_argument("--data-identifiers", type=str, default=None,
+                        help="Comma-separated list of data identifiers to use, e.g. 'P,S,V,1T,D'. Default: all.")
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(
+        seed=args.seed,
+        data_identifiers=args.data_identifiers.split(",") if args.data_identifiers else None,
+        max_field_length=args.max_field_length
+    )
+    if generator.unsupported:
+        print(f"Skipping {len(generator.unsupported)} data identifiers with unsupported specifications: "
+              f"{', '.join(generator.unsupported)}", file=sys.stderr)
+
+    path = Path(args.output)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fid_raw = open(args.raw_output, "w", newline="\n") if args.raw_output else None
+    try:
+        with open(path, "w") as fid:
+            for record in generator.generate(
+                    args.n_messages,
+                    n_fields=(args.min_fields, args.max_fields),
+                    invalid_ratio=args.invalid_ratio,
+                    format_envelope_ratio=args.format_envelope_ratio
+            ):
+                fid.write(json.dumps(record) + "\n")
+                if fid_raw:
+                    fid_raw.write(record["text"] + "\n")
+    finally:
+        if fid_raw:
+            fid_raw.close()
+    print(f"{args.n_messages} messages written to {path}")
+
+
+if __name__ == "__main__":
+    main()
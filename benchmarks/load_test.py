@@ -0,0 +1,261 @@
+"""
+Load test of the fastAPI service: starts api-main:api locally with N uvicorn workers and replays a JSONL corpus
+(see corpus.py) against the endpoints, either with a fixed number of concurrent clients (closed loop) or with a fixed
+arrival rate (open loop, Poisson arrivals). Latencies in the open loop are measured from the scheduled arrival time,
+i.e. they include the time a request waits for a free connection.
+
+Reports throughput, p50/p95/p99 latency and error rates per endpoint as well as CPU and RSS per server process.
+
+Examples:
+    python benchmarks/load_test.py --workers 4 --concurrency 32 --duration 30
+    python benchmarks/load_test.py --corpus benchmarks/results/corpus.jsonl --rate 200 --endpoints parser-from-text
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import httpx
+import psutil
+
+from bench_api import local_server
+from corpus import CorpusGenerator, load_corpus
+from runner import get_git_info, save_results
+
+from typing import Dict, List, Tuple, Any
+
+
+# endpoint name -> function that builds the request (method, url, params, json body) from a corpus record
+ENDPOINTS = {
+    "image-from-json": lambda rec: ("POST", "/image/from-json", None, rec["message_data"]),
+    "image-from-text": lambda rec: ("GET", "/image/from-text", {"text": rec["text"]}, None),
+    "parser-from-text": lambda rec: ("GET", "/parser/from-text", {"text": rec["text"]}, None),
+    "message": lambda rec: ("GET", "/message", None, rec["message_data"]),
+}
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.status_codes: Dict[str, int] = dict()
+        self.errors = 0
+
+    def add(self, latency: float, status: str, ok: bool):
+        self.latencies.append(latency)
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        self.errors += not ok
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        n = len(self.latencies)
+        quantiles = statistics.quantiles(self.latencies, n=100) if n > 1 else self.latencies * 99
+        return {
+            "requests": n,
+            "errors": self.errors,
+            "error_rate": self.errors / n if n else None,
+            "status_codes": self.status_codes,
+            "throughput_rps": n / duration if duration else None,
+            "p50_s": quantiles[49] if n else None,
+            "p95_s": quantiles[94] if n else None,
+            "p99_s": quantiles[98] if n else None,
+            "max_s": max(self.latencies) if n else None,
+        }
+
+
+class ProcessMonitor(threading.Thread):
+    """samples CPU and RSS of the server process and all of its children (uvicorn workers)"""
+    def __init__(self, pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.root = psutil.Process(pid)
+        self.interval = interval
+        self.samples: Dict[int, Dict[str, list]] = dict()
+        self._processes: Dict[int, psutil.Process] = dict()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                processes = [self.root] + self.root.children(recursive=True)
+            except psutil.NoSuchProcess:
+                break
+            for proc in processes:
+                # keep the process objects as cpu_percent() measures since the last call
+                proc = self._processes.setdefault(proc.pid, proc)
+                try:
+                    with proc.oneshot():
+                        cpu, rss = proc.cpu_percent(), proc.memory_info().rss
+                except psutil.Error:
+                    continue
+                smp = self.samples.setdefault(proc.pid, {"cpu_percent": [], "rss_bytes": []})
+                smp["cpu_percent"].append(cpu)
+                smp["rss_bytes"].append(rss)
+
+    def stop(self) -> List[Dict[str, Any]]:
+        self._stop_event.set()
+        self.join()
+        summary = []
+        for pid, smp in self.samples.items():
+            # the first cpu_percent() call of a process always returns 0.0
+            cpu = smp["cpu_percent"][1:] or smp["cpu_percent"]
+            summary.append({
+                "pid": pid,
+                "role": "main" if pid == self.root.pid else "worker",
+                "cpu_percent_mean": statistics.fmean(cpu),
+                "cpu_percent_max": max(cpu),
+                "rss_mb_mean": statistics.fmean(smp["rss_bytes"]) / 2**20,
+                "rss_mb_max": max(smp["rss_bytes"]) / 2**20,
+            })
+        return summary
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, record: dict, stats: Dict[str, EndpointStats], t0: float):
+    method, url, params, body = ENDPOINTS[endpoint](record)
+    try:
+        response = await client.request(method, url, params=params, json=body)
+        await response.aread()
+        status, ok = str(response.status_code), response.status_code < 400
+    except httpx.HTTPError as ex:
+        status, ok = type(ex).__name__, False
+    stats[endpoint].add(time.perf_counter() - t0, status, ok)
+
+
+def request_sequence(corpus: List[dict], endpoints: List[str]):
+    i = 0
+    while True:
+        yield endpoints[i % len(endpoints)], corpus[i % len(corpus)]
+        i += 1
+
+
+async def closed_loop(base_url: str, corpus, endpoints, concurrency: int, duration: float) -> Tuple[dict, float]:
+    stats = {ep: EndpointStats() for ep in endpoints}
+    sequence = request_sequence(corpus, endpoints)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        t_end = time.perf_counter() + duration
+
+        async def client_loop():
+            while time.perf_counter() < t_end:
+                endpoint, record = next(sequence)
+                await send(client, endpoint, record, stats, time.perf_counter())
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*[client_loop() for _ in range(concurrency)])
+    return stats, time.perf_counter() - t_start
+
+
+async def open_loop(
+        base_url: str,
+        corpus,
+        endpoints,
+        rate: float,
+        duration: float,
+        max_in_flight: int,
+        seed: int
+) -> Tuple[dict, float, int]:
+    stats = {ep: EndpointStats() for ep in endpoints}
+    sequence = request_sequence(corpus, endpoints)
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    dropped = 0
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        tasks = set()
+        t_start = time.perf_counter()
+        t_next = t_start
+        while t_next < t_start + duration:
+            await asyncio.sleep(max(0.0, t_next - time.perf_counter()))
+            endpoint, record = next(sequence)
+            if len(tasks) >= max_in_flight:
+                # the client cannot keep up with the arrival rate; do not distort the measurement
+                dropped += 1
+            else:
+                task = asyncio.create_task(send(client, endpoint, record, stats, t_next))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            t_next += rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+    return stats, time.perf_counter() - t_start, dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local load test of the Data-Matrix-Code Generator api.")
+    parser.add_argument("--workers", "-w", type=int, default=1, help="Number of uvicorn workers.")
+    parser.add_argument("--corpus", type=str, default=None,
+                        help="JSONL corpus (see corpus.py). Default: 1000 synthetic messages.")
+    parser.add_argument("--endpoints", "-e", type=str, default=",".join(ENDPOINTS),
+                        help=f"Comma-separated list of endpoints ({', '.join(ENDPOINTS)}); requests are distributed "
+                             f"round-robin.")
+    parser.add_argument("--concurrency", "-c", type=int, default=8, help="Concurrent clients (closed loop).")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Arrival rate in requests/s (open loop). Overrides --concurrency.")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Limit of outstanding requests (open loop).")
+    parser.add_argument("--duration", "-d", type=float, default=20, help="Duration of the measurement in seconds.")
+    parser.add_argument("--warmup", type=float, default=2, help="Duration of the warm-up in seconds (not measured).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", "-o", type=str, default=None, help="Path to a JSON file for the report.")
+    args = parser.parse_args()
+
+    endpoints = args.endpoints.split(",")
+    unknown = [ep for ep in endpoints if ep not in ENDPOINTS]
+    if unknown:
+        parser.error(f"Unknown endpoints: {unknown}")
+
+    if args.corpus:
+        corpus = load_corpus(args.corpus)
+    else:
+        corpus = list(CorpusGenerator(args.seed).generate(1000))
+
+    with local_server(workers=args.workers) as (port, process):
+        base_url = f"http://127.0.0.1:{port}"
+        if args.warmup > 0:
+            asyncio.run(closed_loop(base_url, corpus, endpoints, args.concurrency, args.warmup))
+
+        monitor = ProcessMonitor(process.pid)
+        monitor.start()
+        dropped = 0
+        if args.rate:
+            stats, duration, dropped = asyncio.run(
+                open_loop(base_url, corpus, endpoints, args.rate, args.duration, args.max_in_flight, args.seed)
+            )
+        else:
+            stats, duration = asyncio.run(closed_loop(base_url, corpus, endpoints, args.concurrency, args.duration))
+        processes = monitor.stop()
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git": get_git_info(),
+        "settings": vars(args) | {"n_corpus": len(corpus)},
+        "duration_s": duration,
+        "dropped": dropped,
+        "endpoints": {ep: st.summary(duration) for ep, st in stats.items()},
+        "processes": processes,
+    }
+
+    print(f"{'endpoint':20s} {'requests':>9s} {'rps':>9s} {'errors':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for ep, res in report["endpoints"].items():
+        if res["requests"] == 0:
+            print(f"{ep:20s} {0:9d}")
+            continue
+        print(f"{ep:20s} {res['requests']:9d} {res['throughput_rps']:9.1f} {res['error_rate']:7.1%} "
+              f"{res['p50_s'] * 1e3:9.2f} {res['p95_s'] * 1e3:9.2f} {res['p99_s'] * 1e3:9.2f}")
+    if dropped:
+        print(f"{dropped} requests dropped because more than {args.max_in_flight} were in flight.")
+    print()
+    print(f"{'pid':>8s} {'role':8s} {'cpu % mean':>11s} {'cpu % max':>10s} {'rss MB max':>11s}")
+    for proc in processes:
+        print(f"{proc['pid']:8d} {proc['role']:8s} {proc['cpu_percent_mean']:11.1f} {proc['cpu_percent_max']:10.1f} "
+              f"{proc['rss_mb_max']:11.1f}")
+
+    if args.output:
+        print(f"Report written to {save_results(report, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Local TCP stand-in for label printers (raw port 9100) to test the print spooler without hardware.
+
+It accepts any number of connections, counts the received bytes and ZPL labels (^XA ... ^XZ), can simulate the
+print speed of the printer (the socket is read only as fast as labels are printed, so that TCP back-pressure
+reaches the sender) and can drop connections (optionally only the first max_drops ones) to test the reconnects.
+
+    python benchmarks/printer_standin.py --port 9100 --labels-per-second 5
+    python benchmarks/printer_standin.py --port 9101 --drop-every 100000 --output labels.zpl
+    python benchmarks/printer_standin.py --port 9102 --drop-every 100000 --max-drops 1
+"""
+import argparse
+import socketserver
+import threading
+import time
+from pathlib import Path
+
+from typing import Union, Dict, Any
+
+
+# end of a ZPL label
+LABEL_END = b"^XZ"
+
+
+class PrinterStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 9100,
+            labels_per_second: float = 0,
+            drop_every: int = 0,
+            output: Union[str, Path, None] = None,
+            max_drops: int = 0
+    ):
+        super().__init__((host, port), PrinterHandler)
+        self.labels_per_second = labels_per_second
+        self.drop_every = drop_every
+        self.max_drops = max_drops
+        self.output = open(output, "ab") if output else None
+        self.lock = threading.Lock()
+        self.n_connections = 0
+        self.n_bytes = 0
+        self.n_labels = 0
+        self.n_dropped = 0
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def received(self, chunk: bytes, tail: bytes = b"") -> int:
+        """
+        counts the labels that end in the chunk; tail are the last bytes of the previous chunk of the connection, as
+        the end of a label may be split across two chunks
+        """
+        with self.lock:
+            self.n_bytes += len(chunk)
+            n_labels = (tail + chunk).count(LABEL_END)
+            self.n_labels += n_labels
+            if self.output:
+                self.output.write(chunk)
+        return n_labels
+
+    def start(self) -> threading.Thread:
+        thread = threading.Thread(target=self.serve_forever, name="printer-stand-in", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.output:
+            self.output.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"connections": self.n_connections, "bytes": self.n_bytes, "labels": self.n_labels,
+                "dropped": self.n_dropped}
+
+
+class PrinterHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        server: PrinterStandIn = self.server
+        with server.lock:
+            server.n_connections += 1
+        n_bytes = 0
+        tail = b""
+        while True:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                break
+            n_labels = server.received(chunk, tail)
+            # shorter than LABEL_END: a label is not counted twice
+            tail = (tail + chunk)[-(len(LABEL_END) - 1):]
+            n_bytes += len(chunk)
+            if server.labels_per_second and n_labels:
+                time.sleep(n_labels / server.labels_per_second)
+            if server.drop_every and n_bytes >= server.drop_every:
+                with server.lock:
+                    drop = not server.max_drops or server.n_dropped < server.max_drops
+                    if drop:
+                        server.n_dropped += 1
+                if drop:
+                    break
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local TCP stand-in for a label printer (raw port 9100).")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--labels-per-second", type=float, default=0, help="simulated print speed (0: unlimited)")
+    parser.add_argument("--drop-every", type=int, default=0, help="drop the connection after this many bytes")
+    parser.add_argument("--max-drops", type=int, default=0, help="drop at most this many connections (0: unlimited)")
+    parser.add_argument("--output", type=str, default=None, help="append the received data to this file")
+    parser.add_argument("--interval", type=float, default=5, help="seconds between status lines")
+    args = parser.parse_args()
+
+    printer = PrinterStandIn(args.host, args.port, args.labels_per_second, args.drop_every, args.output,
+                             args.max_drops)
+    printer.start()
+    print(f"Printer stand-in listening on {args.host}:{printer.port}")
+    try:
+        while True:
+            time.sleep(args.interval)
+            print(printer.stats())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        printer.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Runs the benchmark suite and writes the results as JSON, optionally comparing them to a previous run.
+
+Examples:
+    python benchmarks/run_benchmarks.py --output bench/HEAD.json
+    python benchmarks/run_benchmarks.py --groups library --filter parse --compare bench/baseline.json
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# make the repository root (DataMatrixCode, api-main.py) and this folder importable
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from runner import BENCHMARKS, run_benchmarks, compare_results, load_results, save_results
+# register benchmark cases
+import bench_library  # noqa: F401
+import bench_api  # noqa: F401
+import bench_startup  # noqa: F401
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite of the Data-Matrix-Code Generator Service.")
+    parser.add_argument("--output", "-o", type=str, default=None, help="Path to the JSON file for the results.")
+    parser.add_argument("--filter", "-k", type=str, default=None, help="Regex pattern to select benchmarks by name.")
+    parser.add_argument("--groups", "-g", type=str, default=None,
+                        help="Comma-separated list of benchmark groups, e.g. 'library,image,api'. Default: all.")
+    parser.add_argument("--repeat", "-r", type=int, default=5, help="Number of repetitions per benchmark.")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimal duration of a repetition in seconds.")
+    parser.add_argument("--compare", "-c", type=str, default=None, help="JSON file of a previous run to compare with.")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change that is flagged in comparisons.")
+    parser.add_argument("--list", action="store_true", help="List all benchmarks and exit.")
+    args = parser.parse_args()
+
+    if args.list:
+        for name, bm in BENCHMARKS.items():
+            print(f"{bm.group:10s} {name}")
+        return
+
+    results = run_benchmarks(
+        pattern=args.filter,
+        groups=args.groups.split(",") if args.groups else None,
+        repeat=args.repeat,
+        min_time=args.min_time,
+    )
+
+    if args.output:
+        path = save_results(results, args.output)
+        print(f"Results written to {path}")
+
+    if args.compare:
+        print()
+        print("\n".join(compare_results(load_results(args.compare), results, args.threshold)))
+
+
+if __name__ == "__main__":
+    main()
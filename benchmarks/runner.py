@@ -0,0 +1,195 @@
+"""
+Minimal benchmark framework: a registry of benchmark cases, a timing loop, and a JSON results format that can be
+compared between commits.
+
+A case is a function that does its (untimed) setup and returns either
+- a zero-argument callable, which is timed by the runner, or
+- a dict with already measured values (e.g. throughput of a load test), which is stored as it is.
+A case may raise `SkipBenchmark` if an optional dependency is missing.
+"""
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+from typing import Callable, Dict, List, Union, Any
+
+
+SCHEMA_VERSION = 1
+ROOT = Path(__file__).resolve().parent.parent
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+class Benchmark:
+    def __init__(self, name: str, group: str, setup: Callable[[], Union[Callable[[], Any], Dict[str, Any]]], params: dict = None):
+        self.name = name
+        self.group = group
+        self.setup = setup
+        self.params = params if params else dict()
+
+    def __repr__(self):
+        return f"Benchmark({self.name}, group={self.group})"
+
+
+BENCHMARKS: Dict[str, Benchmark] = dict()
+
+
+def benchmark(name: str, group: str = "library", params: dict = None):
+    """decorator to register a benchmark case"""
+    def decorator(fnc):
+        key = name
+        if params:
+            key += "[" + ",".join([f"{ky}={vl}" for ky, vl in params.items()]) + "]"
+        BENCHMARKS[key] = Benchmark(key, group, lambda: fnc(**(params or dict())), params)
+        return fnc
+    return decorator
+
+
+# ----- timing
+def autorange(fnc: Callable[[], Any], min_time: float = 0.2) -> int:
+    """determine the number of loops so that one repetition takes at least min_time seconds (like timeit)"""
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fnc()
+        dt = time.perf_counter() - t0
+        if dt >= min_time:
+            return number
+        number *= 2 if dt > min_time / 10 else 10
+
+
+def time_callable(fnc: Callable[[], Any], repeat: int = 5, min_time: float = 0.2) -> Dict[str, Any]:
+    number = autorange(fnc, min_time)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fnc()
+        times.append((time.perf_counter() - t0) / number)
+
+    median = statistics.median(times)
+    return {
+        "unit": "s",
+        "loops": number,
+        "repeat": repeat,
+        "times": times,
+        "min": min(times),
+        "median": median,
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "ops_per_s": 1 / median if median > 0 else None,
+    }
+
+
+def run_benchmarks(
+        pattern: str = None,
+        groups: List[str] = None,
+        repeat: int = 5,
+        min_time: float = 0.2,
+        verbose: bool = True
+) -> Dict[str, Any]:
+    re_filter = re.compile(pattern) if pattern else None
+
+    results, skipped = dict(), dict()
+    for name, bm in BENCHMARKS.items():
+        if groups and bm.group not in groups:
+            continue
+        if re_filter and not re_filter.search(name):
+            continue
+
+        try:
+            case = bm.setup()
+            if callable(case):
+                res = time_callable(case, repeat, min_time)
+            else:
+                res = dict(case)
+        except SkipBenchmark as ex:
+            skipped[name] = str(ex)
+            if verbose:
+                print(f"{name:60s} skipped ({ex})")
+            continue
+
+        res["group"] = bm.group
+        res["params"] = bm.params
+        results[name] = res
+        if verbose:
+            print(f"{name:60s} {format_result(res)}")
+
+    return {
+        "schema": SCHEMA_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "git": get_git_info(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "benchmarks": results,
+        "skipped": skipped,
+    }
+
+
+def format_result(res: Dict[str, Any]) -> str:
+    if "median" in res:
+        return f"median {format_time(res['median'])} ± {format_time(res['stdev'])} ({res['loops']} loops x {res['repeat']})"
+    return ", ".join([f"{ky}={vl:.4g}" if isinstance(vl, float) else f"{ky}={vl}"
+                      for ky, vl in res.items() if not isinstance(vl, (dict, list)) and ky != "group"])
+
+
+def format_time(seconds: float) -> str:
+    for unit, factor in [("s", 1), ("ms", 1e-3), ("us", 1e-6)]:
+        if seconds >= factor:
+            return f"{seconds / factor:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def get_git_info() -> Dict[str, Any]:
+    def _git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=10).stdout.strip()
+
+    try:
+        return {"commit": _git("rev-parse", "HEAD"), "dirty": _git("status", "--porcelain", "--untracked-files=no") != ""}
+    except (OSError, subprocess.SubprocessError):
+        return {"commit": None, "dirty": None}
+
+
+# ----- comparison
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.1) -> List[str]:
+    """compares the medians of two result files; returns a list of printable lines"""
+    lines = [f"{'benchmark':60s} {'baseline':>12s} {'current':>12s} {'ratio':>7s}"]
+    for name, res in current["benchmarks"].items():
+        if name not in baseline["benchmarks"] or "median" not in res:
+            continue
+        t_base = baseline["benchmarks"][name]["median"]
+        t_curr = res["median"]
+        ratio = t_curr / t_base if t_base else float("nan")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  slower"
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        lines.append(f"{name:60s} {format_time(t_base):>12s} {format_time(t_curr):>12s} {ratio:7.2f}{flag}")
+    return lines
+
+
+def load_results(path: Union[str, Path]) -> Dict[str, Any]:
+    with open(path, "r") as fid:
+        results = json.load(fid)
+    if results.get("schema") != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported schema version {results.get('schema')} in {path}.")
+    return results
+
+
+def save_results(results: Dict[str, Any], path: Union[str, Path]) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as fid:
+        json.dump(results, fid, indent=2, default=str)
+    return path
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the library (DataMatrixCode) and the helpers of the api (utils) are imported from the root of the repository
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
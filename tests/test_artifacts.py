@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+
+from utils.artifacts import ArtifactStore
+
+
+def age(store: ArtifactStore, name: str, seconds: float):
+    t = time.time() - seconds
+    os.utime(store.directory / name, (t, t))
+
+
+def test_put_stores_content_once(tmp_path):
+    store = ArtifactStore(tmp_path, max_bytes=10000)
+    name = store.put(b"x" * 100)
+    assert name == ArtifactStore.get_name(b"x" * 100) and name.endswith(".png")
+    assert (tmp_path / name).read_bytes() == b"x" * 100
+    assert store.put(b"x" * 100) == name
+    assert name in store and len(store) == 1
+    assert store.info()["bytes"] == 100
+    # only the files of the store
+    assert sorted(path.name for path in tmp_path.iterdir() if not path.name.startswith(".")) == [name]
+
+
+def test_ttl_counts_from_the_last_put(tmp_path):
+    store = ArtifactStore(tmp_path, ttl=60)
+    old, renewed, new = store.put(b"old"), store.put(b"renewed"), store.put(b"new")
+    age(store, old, 120)
+    age(store, renewed, 120)
+    # stored again (e.g. by another worker): its time to live starts again
+    ArtifactStore(tmp_path, ttl=60).put(b"renewed")
+    assert store.evict() == 1
+    assert old not in store and renewed in store and new in store
+
+
+def test_size_limit_holds_for_all_workers(tmp_path):
+    # two worker processes with their own store on the same directory
+    a = ArtifactStore(tmp_path, max_bytes=1000)
+    b = ArtifactStore(tmp_path, max_bytes=1000)
+    names = []
+    for i in range(8):
+        store = a if i % 2 else b
+        names.append(store.put(bytes([i]) * 200))
+        age(store, names[-1], 100 - i)
+    # each worker wrote only 800 bytes, the store holds 1600
+    assert a.evict() == 3
+    assert [name in a for name in names] == [False] * 3 + [True] * 5
+    assert a.info()["bytes"] == b.info()["bytes"] == 1000
+
+
+def test_eviction_keeps_files_stored_again_concurrently(tmp_path):
+    stores = [ArtifactStore(tmp_path, max_bytes=2000, ttl=0.05) for _ in range(4)]
+    missing = []
+    stop = threading.Event()
+
+    def put(store: ArtifactStore, i: int):
+        while not stop.is_set():
+            for j in range(5):
+                name = store.put(f"{i}-{j}".encode() * 50)
+                # the returned file must exist (until its ttl ran out)
+                if not (tmp_path / name).is_file():
+                    missing.append(name)
+
+    def evict(store: ArtifactStore):
+        while not stop.is_set():
+            store.evict()
+
+    threads = [threading.Thread(target=put, args=(store, i)) for i, store in enumerate(stores[:2])]
+    threads += [threading.Thread(target=evict, args=(store,)) for store in stores[2:]]
+    for thread in threads:
+        thread.start()
+    time.sleep(1)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert missing == []
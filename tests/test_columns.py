@@ -0,0 +1,55 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from DataMatrixCode.DMCColumns import (ColumnarParser, get_column_type, parse_columns, iter_csv,
+                                       COLUMN_STRING, COLUMN_NUMBER, COLUMN_DATE)
+
+
+MESSAGES = [
+    "[)>\x1e06\x1d8P00012345678905\x1d24S012345678\x1d2Q12.5\x1dD231201\x1e\x04",
+    "[)>\x1e06\x1d8P00099999999999\x1d2Q7\x1d21BABC123\x1d18SABC12345X1\x1d96S00012345678901234\x1e\x04",
+    "[)>\x1e06\x1d2QX\x1d1P1234\x1e\x04",
+]
+
+
+def test_column_types():
+    # identifiers keep their digits (leading zeros, more digits than a float64 holds)
+    for di in ("8P", "8S", "24S", "12V", "S", "21B", "18S", "96S"):
+        assert get_column_type(di) == COLUMN_STRING, di
+    for di in ("Q", "2Q", "8Q", "3E"):
+        assert get_column_type(di) == COLUMN_NUMBER, di
+    assert get_column_type("D") == COLUMN_DATE
+
+
+def test_columnar_parser():
+    parser = ColumnarParser(["8P", "24S", "2Q", "D", "21B", "18S", "96S"])
+    batch, = parser.parse(MESSAGES)
+    assert batch["8P"] == ["00012345678905", "00099999999999", None]
+    assert batch["24S"] == ["012345678", None, None]
+    assert batch["2Q"] == [12.5, 7.0, None]
+    assert batch["2Q_valid"] == [True, True, False]
+    assert batch["D"] == [datetime(2023, 12, 1), None, None]
+    assert batch["21B"] == [None, "ABC123", None]
+    assert batch["18S"] == [None, "ABC12345X1", None]
+    assert batch["96S"] == [None, "00012345678901234", None]
+    assert batch["error"] == [None, None, None]
+    assert json.loads(batch["extra"][2]) == {"1P": "1234"}
+
+
+def test_batches_and_errors():
+    parser, batches = parse_columns(MESSAGES * 3 + [None], batch_size=4)
+    batches = list(batches)
+    assert [len(batch["error"]) for batch in batches] == [4, 4, 2]
+    assert parser.data_identifiers == ["8P", "24S", "2Q", "D", "21B", "18S", "96S", "1P"]
+    assert batches[-1]["error"][-1] is not None
+    assert all(len(column) == 4 for column in batches[0].values())
+
+
+def test_csv_keeps_identifiers():
+    parser, batches = parse_columns(MESSAGES[:2])
+    rows = list(csv.DictReader(io.StringIO("".join(iter_csv(parser, batches)))))
+    assert [row["8P"] for row in rows] == ["00012345678905", "00099999999999"]
+    assert [row["2Q"] for row in rows] == ["12.5", "7"]
+    assert rows[0]["D_valid"] == "true"
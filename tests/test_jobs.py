@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+import time
+
+from utils.jobs import JobStore, JOB_DONE, ITEM_PENDING
+
+
+def test_claim_store_and_results(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite")
+    job_id = store.create_job(({"text": f"S{i}"} for i in range(5)), {"output": "png"}, chunk_size=2)
+    assert store.get_job(job_id)["total"] == 5
+
+    claimed, items = store.claim_chunk(3)
+    assert claimed == job_id and [idx for idx, _ in items] == [0, 1, 2]
+    assert store.store_results(job_id, [(idx, f"m{idx}", b"x", None if idx else "failed") for idx, _ in items]) == 3
+    assert store.completed(job_id) == 3
+
+    _, items = store.claim_chunk(3)
+    assert [idx for idx, _ in items] == [3, 4]
+    store.store_results(job_id, [(idx, f"m{idx}", b"x", None) for idx, _ in items])
+    job = store.get_job(job_id)
+    assert (job["status"], job["done"], job["errors"], job["options"]) == (JOB_DONE, 5, 1, {"output": "png"})
+    assert [row[0] for row in store.get_results(job_id, offset=1, limit=2)] == [1, 2]
+    assert store.claim_chunk() == (None, [])
+
+
+def test_round_robin_between_jobs(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite")
+    first = store.create_job({"i": i} for i in range(10))
+    second = store.create_job({"i": i} for i in range(2))
+    claimed = [store.claim_chunk(2)[0] for _ in range(3)]
+    assert claimed == [first, second, first]
+
+
+def test_two_stores_claim_disjoint_items(tmp_path):
+    a, b = JobStore(tmp_path / "jobs.sqlite"), JobStore(tmp_path / "jobs.sqlite")
+    job_id = a.create_job({"i": i} for i in range(5))
+    _, items_a = a.claim_chunk(3)
+    # a second store (process) that starts does not take over the items leased to the first one
+    c = JobStore(tmp_path / "jobs.sqlite")
+    _, items_b = b.claim_chunk(3)
+    assert [idx for idx, _ in items_a] == [0, 1, 2] and [idx for idx, _ in items_b] == [3, 4]
+    assert c.claim_chunk(3) == (None, [])
+    # only the owner of the lease stores the results
+    assert b.store_results(job_id, [(idx, "m", b"x", None) for idx, _ in items_a]) == 0
+    assert a.store_results(job_id, [(idx, "m", b"x", None) for idx, _ in items_a]) == 3
+    assert b.store_results(job_id, [(idx, "m", b"x", None) for idx, _ in items_b]) == 2
+    assert a.get_job(job_id)["status"] == JOB_DONE and a.get_job(job_id)["done"] == 5
+
+
+def test_expired_leases_are_claimed_again(tmp_path):
+    a = JobStore(tmp_path / "jobs.sqlite", lease_seconds=0.05)
+    b = JobStore(tmp_path / "jobs.sqlite", lease_seconds=60)
+    job_id = a.create_job({"i": i} for i in range(3))
+    _, items = a.claim_chunk(3)
+    assert b.claim_chunk(3) == (None, [])
+    time.sleep(0.1)
+    # the process of a stopped: its items are processed by b
+    assert b.claim_chunk(3) == (job_id, items)
+    assert a.store_results(job_id, [(idx, "stale", b"", None) for idx, _ in items]) == 0
+    assert b.store_results(job_id, [(idx, "m", b"x", None) for idx, _ in items]) == 3
+    assert {message for _, message, _, _ in b.get_results(job_id)} == {"m"}
+
+
+def test_recover(tmp_path):
+    a = JobStore(tmp_path / "jobs.sqlite", lease_seconds=0.05)
+    a.create_job({"i": i} for i in range(4))
+    a.claim_chunk(4)
+    b = JobStore(tmp_path / "jobs.sqlite")
+    assert b.recover() == 0
+    time.sleep(0.1)
+    assert b.recover() == 4
+    assert [idx for idx, _ in b.claim_chunk(10)[1]] == [0, 1, 2, 3]
+
+
+def test_concurrent_stores_claim_every_item_once(tmp_path):
+    JobStore(tmp_path / "jobs.sqlite").create_job({"i": i} for i in range(500))
+    claimed = []
+
+    def work():
+        store = JobStore(tmp_path / "jobs.sqlite")
+        while True:
+            job_id, items = store.claim_chunk(7)
+            if not items:
+                break
+            claimed.extend(idx for idx, _ in items)
+            store.store_results(job_id, [(idx, "m", b"", None) for idx, _ in items])
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == list(range(500))
+
+
+def test_migrates_databases_without_leases(tmp_path):
+    path = tmp_path / "jobs.sqlite"
+    db = sqlite3.connect(path)
+    db.executescript("""
+        CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, total INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0, errors INTEGER NOT NULL DEFAULT 0, options TEXT, created TEXT NOT NULL,
+            finished TEXT, last_served REAL NOT NULL DEFAULT 0);
+        CREATE TABLE items (job_id TEXT NOT NULL, idx INTEGER NOT NULL, input TEXT NOT NULL, status TEXT NOT NULL,
+            message TEXT, result BLOB, error TEXT, PRIMARY KEY (job_id, idx));
+        INSERT INTO jobs (id, status, total, created) VALUES ('old', 'running', 1, '2024-01-01');
+        INSERT INTO items (job_id, idx, input, status) VALUES ('old', 0, '{}', 'running');
+    """)
+    db.commit()
+    db.close()
+
+    store = JobStore(path)
+    status, = store._db.execute("SELECT status FROM items WHERE job_id = 'old'").fetchone()
+    assert status == ITEM_PENDING
+    assert store.claim_chunk() == ("old", [(0, "{}")])
@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.lanes import LaneScheduler, LaneClassifier, LaneRejected
+
+
+LANES = {
+    "interactive": {"priority": 0, "max_concurrency": 2, "max_queue": 10, "queue_timeout": 5},
+    "batch": {"priority": 1, "max_concurrency": 1, "max_queue": 1, "queue_timeout": 0.05},
+}
+
+
+def test_higher_priority_is_served_first():
+    async def run():
+        scheduler = LaneScheduler(capacity=1, lanes=LANES | {"batch": LANES["batch"] | {"queue_timeout": 5}})
+        order = []
+
+        async def request(lane_name: str):
+            async with scheduler.slot(lane_name):
+                order.append(lane_name)
+                await asyncio.sleep(0.01)
+
+        await scheduler.acquire("interactive")
+        batch = asyncio.create_task(request("batch"))
+        await asyncio.sleep(0)
+        interactive = [asyncio.create_task(request("interactive")) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert scheduler.status()["lanes"]["batch"]["queued"] == 1
+        scheduler.release("interactive")
+        await asyncio.gather(*interactive, batch)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(run())
+    # the batch request waited longer, but only gets the slot after the interactive ones
+    assert order == ["interactive", "interactive", "batch"]
+    assert scheduler.in_flight == 0
+    assert all(lane["queued"] == 0 and lane["in_flight"] == 0 for lane in scheduler.status()["lanes"].values())
+
+
+def test_lane_budget_and_rejections():
+    async def run():
+        scheduler = LaneScheduler(capacity=4, lanes=LANES)
+        await scheduler.acquire("batch")
+        # the batch lane has a budget of one render
+        waiting = asyncio.create_task(scheduler.acquire("batch"))
+        await asyncio.sleep(0)
+        with pytest.raises(LaneRejected, match="full"):
+            await scheduler.acquire("batch")
+        with pytest.raises(LaneRejected) as info:
+            await waiting
+        assert info.value.reason == "busy (queue timeout)"
+        # other lanes still get the free capacity
+        await scheduler.acquire("interactive")
+        assert scheduler.in_flight == 2
+        scheduler.release("interactive")
+        scheduler.release("batch")
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.in_flight == 0 and not scheduler.lanes["batch"].waiting
+
+
+def test_cancelled_waiter_does_not_leak_its_slot():
+    async def run():
+        scheduler = LaneScheduler(capacity=1, lanes=LANES)
+        await scheduler.acquire("interactive")
+        waiting = asyncio.create_task(scheduler.acquire("interactive"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        scheduler.release("interactive")
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.in_flight == 0 and scheduler.lanes["interactive"].in_flight == 0
+
+
+def test_thread_slot():
+    async def run():
+        scheduler = LaneScheduler(capacity=1, lanes=LANES)
+        with pytest.raises(RuntimeError):
+            scheduler.thread_slot()
+        scheduler.bind(asyncio.get_running_loop())
+        in_flight = []
+
+        def work():
+            # retries while the batch lane rejects it (queue timeout of 0.05 s)
+            with scheduler.thread_slot(scheduler.lowest_lane, retry_interval=0.01):
+                in_flight.append(scheduler.in_flight)
+
+        await scheduler.acquire("interactive")
+        thread = threading.Thread(target=work)
+        thread.start()
+        await asyncio.sleep(0.2)
+        assert in_flight == []
+        scheduler.release("interactive")
+        await asyncio.to_thread(thread.join)
+        await asyncio.sleep(0)
+        return scheduler, in_flight
+
+    scheduler, in_flight = asyncio.run(run())
+    assert in_flight == [1]
+    assert scheduler.in_flight == 0
+
+
+def test_lane_classifier():
+    scheduler = LaneScheduler(lanes=LANES)
+    classifier = LaneClassifier(scheduler, api_keys={"key": "batch"}, endpoints={"/jobs": "batch"})
+    assert classifier.classify("/image", {}) == "interactive"
+    assert classifier.classify("/image", {"x-api-key": "key"}) == "batch"
+    assert classifier.classify("/image", {"x-priority": "batch"}) == "batch"
+    # clients cannot raise their priority above the one of the endpoint
+    assert classifier.classify("/jobs", {"x-priority": "interactive"}) == "batch"
+    with pytest.raises(ValueError):
+        LaneClassifier(scheduler, endpoints={"/jobs": "unknown"})
+
+
+def test_thread_slot_deadline():
+    async def run():
+        scheduler = LaneScheduler(capacity=1, lanes=LANES | {"batch": LANES["batch"] | {"queue_timeout": 5}})
+        scheduler.bind(asyncio.get_running_loop())
+        await scheduler.acquire("interactive")
+
+        def work():
+            with scheduler.thread_slot("batch", retry_interval=0.01, deadline=time.monotonic() + 0.2):
+                pass
+
+        t0 = time.monotonic()
+        with pytest.raises(LaneRejected, match="deadline"):
+            await asyncio.to_thread(work)
+        # not the queue timeout of the lane (5 s)
+        assert time.monotonic() - t0 < 2
+        assert scheduler.lanes["batch"].in_flight == 0 and not scheduler.lanes["batch"].waiting
+        scheduler.release("interactive")
+        return scheduler
+
+    assert asyncio.run(run()).in_flight == 0
+
+
+def test_thread_slot_gives_up_on_an_unresponsive_loop():
+    loop = asyncio.new_event_loop()
+    scheduler = LaneScheduler(capacity=1, lanes=LANES)
+    # the loop does not run (e.g. it is blocked)
+    scheduler.bind(loop)
+    slot = scheduler.thread_slot("batch", retry_interval=0.01, deadline=time.monotonic() + 0.1)
+    slot.loop_grace = 0.05
+    t0 = time.monotonic()
+    with pytest.raises(LaneRejected):
+        slot.__enter__()
+    assert time.monotonic() - t0 < 1
+    # once the loop runs again, the slots of the abandoned attempts are given back
+    loop.run_until_complete(asyncio.sleep(0.05))
+    loop.close()
+    assert scheduler.in_flight == 0
@@ -0,0 +1,41 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def run(code: str):
+    # fresh interpreter: the order of the imports matters
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+@pytest.mark.parametrize("first", [
+    "from DataMatrixCode import DMCGenerator",
+    "import DataMatrixCode.DMCGenerator",
+    "from DataMatrixCode.DMCGenerator import DMCGenerator",
+])
+def test_dmc_generator_is_the_class(first):
+    run(f"""
+{first}
+import DataMatrixCode.DMCGenerator
+from DataMatrixCode import DMCGenerator
+assert isinstance(DMCGenerator, type), DMCGenerator
+import DataMatrixCode
+assert DataMatrixCode.DMCGenerator is DMCGenerator
+assert DMCGenerator.__module__ == "DataMatrixCode.DMCGenerator"
+""")
+
+
+def test_import_does_not_load_the_renderer():
+    run("""
+import sys
+import DataMatrixCode
+from DataMatrixCode import DMCGenerator, RenderTimeout
+for module in ["treepoem", "PIL", "pydantic", "asyncio"]:
+    assert module not in sys.modules, module
+""")
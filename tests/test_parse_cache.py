@@ -0,0 +1,33 @@
+import pickle
+
+import pytest
+
+from DataMatrixCode import FrozenDict, ParseCache, parse_dmc
+
+
+def test_parse_cache_evicts_least_recently_used():
+    cache = ParseCache(max_items=2)
+    cache.put("a", FrozenDict(x=1))
+    cache.put("b", FrozenDict(x=2))
+    assert cache.get("a") == {"x": 1}
+    cache.put("c", FrozenDict(x=3))
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == {"x": 1} and cache.get("c") == {"x": 3}
+    assert cache.info() == {"items": 2, "max_items": 2, "hits": 3, "misses": 1}
+
+
+def test_parse_dmc_results_are_read_only():
+    text = "[)>\x1eS123456\x1dV123H48999\x04"
+    content = parse_dmc(text)
+    assert parse_dmc(text) is content
+    with pytest.raises(TypeError):
+        content["ANSI-MH-10"]["S"] = "1"
+    with pytest.raises(TypeError):
+        content.update(x=1)
+
+    copy = content.copy()
+    assert type(copy) is dict and type(copy["ANSI-MH-10"]) is dict
+    copy["ANSI-MH-10"]["S"] = "1"
+    assert content["ANSI-MH-10"]["S"] == "123456"
+    assert pickle.loads(pickle.dumps(content)) == content
@@ -0,0 +1,91 @@
+import io
+import re
+
+import pytest
+from PIL import Image
+
+from DataMatrixCode.DMCPrinter import (compress_zpl_row, raster_to_zpl, modules_to_raster, module_size_to_dots,
+                                       encode_raster, get_media_type)
+
+
+def decompress_zpl(data: str, bytes_per_row: int) -> str:
+    """inverse of the ASCII compression of a ZPL graphic field (hex characters of all rows)"""
+    counts = {chr(ord("G") + n - 1): n for n in range(1, 20)} | {chr(ord("g") + n - 1): 20 * n for n in range(1, 21)}
+    rows, row, n = [], "", 0
+    for c in data:
+        if c in counts:
+            n += counts[c]
+        elif c == ":":
+            rows.append(rows[-1])
+        elif c in ",!":
+            rows.append(row + ("0" if c == "," else "F") * (2 * bytes_per_row - len(row)))
+            row = ""
+        else:
+            row += c * max(n, 1)
+            n = 0
+            if len(row) == 2 * bytes_per_row:
+                rows.append(row)
+                row = ""
+    return "".join(rows)
+
+
+@pytest.mark.parametrize("row", ["0000", "FFFF", "F000", "0FFF", "ABCD", "A" * 46, "1" + "0" * 31, "FF00FF" * 70])
+def test_compress_zpl_row_roundtrip(row):
+    assert decompress_zpl(compress_zpl_row(row), len(row) // 2) == row
+
+
+def test_compress_zpl_row_repeats():
+    assert compress_zpl_row("AAAA") == "JA"
+    assert compress_zpl_row("A" * 45) == "hKA"
+    assert compress_zpl_row("F0" + "0" * 6) == "F,"
+    assert compress_zpl_row("0F" + "F" * 6) == "0!"
+    assert compress_zpl_row("0F0F", "0F0F") == ":"
+
+
+def test_raster_to_zpl_graphic_field():
+    modules = Image.new("1", (10, 10), 1)
+    modules.paste(0, (0, 0, 5, 10))
+    img = modules_to_raster(modules, module_size_dots=3, n_quiet_zone_modules=2)
+
+    plain = raster_to_zpl(img, compress=False)
+    compressed = raster_to_zpl(img, compress=True)
+    pattern = re.compile(r"\^XA\^FO0,0\^GFA,(\d+),(\d+),(\d+),(.*)\^FS\^XZ")
+    n_bytes, _, bytes_per_row, hex_data = pattern.fullmatch(plain).groups()
+    assert int(bytes_per_row) == (img.width + 7) // 8
+    assert int(n_bytes) == int(bytes_per_row) * img.height
+    assert len(hex_data) == 2 * int(n_bytes)
+
+    *header, compressed_data = pattern.fullmatch(compressed).groups()
+    assert header == [n_bytes, n_bytes, bytes_per_row]
+    assert len(compressed_data) < len(hex_data)
+    assert decompress_zpl(compressed_data, int(bytes_per_row)) == hex_data
+
+
+def test_modules_to_raster():
+    modules = Image.new("1", (4, 3), 1)
+    modules.putpixel((0, 0), 0)
+    img = modules_to_raster(modules, module_size_dots=module_size_to_dots(0.5, dpi=203), n_quiet_zone_modules=1)
+    assert module_size_to_dots(0.5, dpi=203) == 4 and module_size_to_dots(0.01) == 1
+    assert img.size == (6 * 4, 5 * 4)
+    # one module is a block of 4 x 4 dots, without resampling
+    assert {img.getpixel((x, y)) for x in range(4, 8) for y in range(4, 8)} == {0}
+    assert img.getpixel((8, 4)) and img.getpixel((3, 3))
+    with pytest.raises(ValueError):
+        modules_to_raster(modules, module_size_dots=0)
+
+
+@pytest.mark.parametrize("output_format", ["pcx", "bmp", "png"])
+def test_encode_raster_image_files(output_format):
+    img = modules_to_raster(Image.new("1", (10, 10), 0), module_size_dots=2)
+    decoded = Image.open(io.BytesIO(encode_raster(img, output_format, dpi=300)))
+    assert decoded.format == output_format.upper() and decoded.size == img.size
+    assert decoded.convert("1").tobytes() == img.tobytes()
+    assert get_media_type(output_format).startswith("image/")
+
+
+def test_encode_raster_zpl():
+    img = modules_to_raster(Image.new("1", (10, 10), 0), module_size_dots=2)
+    assert encode_raster(img, "zpl").startswith(b"^XA^FO0,0^GFA,")
+    assert len(encode_raster(img, "zpl")) < len(encode_raster(img, "zpl-hex"))
+    with pytest.raises(ValueError):
+        encode_raster(img, "gif")
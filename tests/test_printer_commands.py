@@ -0,0 +1,44 @@
+import pytest
+
+from DataMatrixCode import zpl_datamatrix, encode_command, parse_dmc
+from DataMatrixCode.DMCPrinterCommands import escape_zpl_field_data, zpl_datamatrix_labels
+
+
+def unescape_zpl_field_data(field_data: str, escape_character: str = "_") -> str:
+    parts = field_data.split(escape_character)
+    return parts[0] + "".join(chr(int(part[1:4])) + part[4:] for part in parts[1:])
+
+
+def test_escape_zpl_field_data():
+    message = "[)>\x1e06\x1dP1^2~3_4\x1e\x04"
+    assert escape_zpl_field_data(message) == "[)>_d03006_d029P1_d0942_d1263_d0954_d030_d004"
+    with pytest.raises(ValueError):
+        escape_zpl_field_data("Prüfung")
+
+
+def test_zpl_datamatrix():
+    command = zpl_datamatrix("[)>\x1eS123\x04", module_size_dots=5, n_quiet_zone_modules=2, origin=(10, 20))
+    assert command == "^XA^FO20,30^BXN,5,200,,,,_,1^FD[)>_d030S123_d004^FS^XZ"
+    # no unescaped control characters or ZPL command prefixes in the field data
+    field_data = command.split("^FD")[1][:-len("^FS^XZ")]
+    assert field_data.isprintable() and "~" not in field_data and "^" not in field_data
+    with pytest.raises(ValueError):
+        zpl_datamatrix("S123", module_size_dots=0)
+
+
+def test_escaped_message_is_parsed_again():
+    message = "[)>\x1e06\x1dP1^2\x1dS_1~\x1e\x04"
+    field_data = zpl_datamatrix(message).split("^FD")[1][:-len("^FS^XZ")]
+    assert unescape_zpl_field_data(field_data) == message
+    assert parse_dmc(unescape_zpl_field_data(field_data), use_cache=False) == parse_dmc(message, use_cache=False)
+
+
+def test_rectangular_and_labels():
+    command = zpl_datamatrix("[)>\x1eS123\x04", rectangular_dmc=True, label=False)
+    assert command.startswith("^FO8,8^BXN,4,200,") and command.endswith(",_,2^FD[)>_d030S123_d004^FS")
+    with pytest.raises(ValueError):
+        zpl_datamatrix("[)>\x1eS" + "A" * 60 + "\x04", rectangular_dmc=True)
+    assert zpl_datamatrix_labels(["S1", "S2"]).count("^XA") == 2
+    assert encode_command("S1") == zpl_datamatrix("S1").encode("ascii")
+    with pytest.raises(ValueError):
+        encode_command("S1", "epl")
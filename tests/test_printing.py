@@ -0,0 +1,135 @@
+import socket
+import time
+
+import pytest
+
+from benchmarks.printer_standin import PrinterStandIn
+from utils.printing import PrintJob, PrinterConnection, Printer, PrintSpooler, parse_printer_address
+
+
+def label(i: int, padding: int = 0) -> bytes:
+    # ^FX: comment (makes the label larger without changing what is printed)
+    return f"^XA^FO10,10^FDlabel-{i}^FS^FX{'x' * padding}^XZ".encode("ascii")
+
+
+def printer_job(printer: Printer, payload: bytes) -> PrintJob:
+    job = PrintJob(printer.name, payload)
+    printer.submit(job)
+    return job
+
+
+def wait_for(condition, timeout: float = 10):
+    t_end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > t_end:
+            raise TimeoutError("Condition not met.")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def stand_in(request, tmp_path):
+    printer = PrinterStandIn(port=0, output=tmp_path / "received.zpl", **getattr(request, "param", dict()))
+    printer.start()
+    yield printer
+    printer.stop()
+
+
+def received(printer: PrinterStandIn) -> bytes:
+    printer.output.flush()
+    with open(printer.output.name, "rb") as fid:
+        return fid.read()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_parse_printer_address():
+    assert parse_printer_address("10.0.0.21:9101") == ("10.0.0.21", 9101)
+    assert parse_printer_address("printer-1") == ("printer-1", 9100)
+    assert parse_printer_address(("10.0.0.21", "9102")) == ("10.0.0.21", 9102)
+
+
+def test_stand_in_counts_labels_split_across_chunks(stand_in):
+    assert stand_in.received(b"^XA^FDa^FS^X") == 0
+    assert stand_in.received(b"Z^XA^FDb^FS^", b"^X") == 1
+    assert stand_in.received(b"XZ", b"S^") == 1
+    assert stand_in.n_labels == 2
+
+
+def test_waiting_jobs_are_sent_in_one_batch(stand_in):
+    spooler = PrintSpooler({"line-1": ("127.0.0.1", stand_in.port)}, batch_size=8)
+    jobs = [spooler.submit("line-1", label(i)) for i in range(10)]
+    spooler.start()
+    try:
+        assert all(job.done.wait(10) for job in jobs)
+    finally:
+        spooler.stop()
+    assert [job.status for job in jobs] == ["sent"] * 10
+    assert spooler.status()["line-1"]["batches"] == 2
+    wait_for(lambda: stand_in.n_labels == 10)
+    assert stand_in.n_connections == 1
+    assert received(stand_in) == b"".join(label(i) for i in range(10))
+    with pytest.raises(KeyError):
+        spooler.submit("line-2", label(0))
+
+
+@pytest.mark.parametrize("stand_in", [{"drop_every": 1}], indirect=True)
+def test_reconnects_after_the_printer_closed_the_connection(stand_in):
+    printer = Printer("line-1", ("127.0.0.1", stand_in.port), backoff=0.01)
+    printer.start()
+    try:
+        for i in range(3):
+            job = printer_job(printer, label(i))
+            assert job.done.wait(10) and job.status == "sent"
+            wait_for(lambda: stand_in.n_dropped == i + 1)
+    finally:
+        printer.stop()
+    # an idle connection that the printer closed is detected before the next write
+    assert stand_in.n_connections == 3
+    assert received(stand_in) == label(0) + label(1) + label(2)
+
+
+def test_backoff_while_the_printer_is_unreachable():
+    connection = PrinterConnection("line-1", "127.0.0.1", free_port(), timeout=1, backoff=0.2, max_backoff=0.5)
+    waits = []
+    for _ in range(3):
+        with pytest.raises(OSError):
+            connection.send(label(0))
+        waits.append(connection.wait_time())
+    assert 0.1 < waits[0] <= 0.2 and 0.3 < waits[1] <= 0.4 and 0.4 < waits[2] <= 0.5
+    assert not connection.connected
+
+
+def test_failed_jobs_after_the_retries():
+    printer = Printer("line-1", ("127.0.0.1", free_port()), max_retries=2, backoff=0.01)
+    printer.start()
+    try:
+        job = printer_job(printer, label(0))
+        assert job.done.wait(10)
+    finally:
+        printer.stop()
+    assert job.status == "failed" and "ConnectionRefusedError" in job.error
+    assert printer.status()["failed"] == 1
+
+
+@pytest.mark.parametrize("stand_in", [{"drop_every": 2**16, "max_drops": 1}], indirect=True)
+def test_broken_batch_is_sent_again(stand_in):
+    # a batch much larger than the socket buffers: the printer drops the connection in the middle of the write
+    labels = [label(i, padding=2**16) for i in range(100)]
+    printer = Printer("line-1", ("127.0.0.1", stand_in.port), batch_size=100, batch_bytes=2**24, backoff=0.01)
+    for payload in labels:
+        printer_job(printer, payload)
+    printer.start()
+    try:
+        wait_for(lambda: printer.status()["jobs"] == 100)
+    finally:
+        printer.stop()
+    assert stand_in.n_dropped == 1 and stand_in.n_connections == 2
+    assert printer.status()["batches"] == 1 and printer.status()["failed"] == 0
+    # at least once: the labels received before the drop are printed again
+    data = received(stand_in)
+    assert data.endswith(b"".join(labels))
+    assert 0 < len(data) - len(b"".join(labels)) < len(b"".join(labels))
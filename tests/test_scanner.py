@@ -0,0 +1,91 @@
+import asyncio
+import random
+
+import pytest
+
+from DataMatrixCode.DMCScanner import DMCStreamParser, parse_stream, parse_stream_async
+
+
+MESSAGES = [
+    "[)>\x1e06\x1dS123456\x1dV123H48999\x1e\x04",
+    "[)>\x1eP12345-AB\x1dS1\x04",
+    "[)>\x1e06\x1d2Q12\x1d8P00012345678905\x1e\x04",
+]
+STREAM = "\r\n".join(MESSAGES) + "\r\n"
+
+
+def split_randomly(data, rng: random.Random):
+    chunks, i = [], 0
+    while i < len(data):
+        n = rng.randint(1, 7)
+        chunks.append(data[i:i + n])
+        i += n
+    return chunks
+
+
+def test_feed_whole_stream():
+    parser = DMCStreamParser()
+    expected = parser.feed(STREAM)
+    assert len(expected) == len(MESSAGES)
+    assert expected[1] == {"ANSI-MH-10": {"P": "12345-AB", "S": "1"}}
+    assert parser.pending == 0
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_feed_random_chunks(seed):
+    expected = DMCStreamParser().feed(STREAM)
+    rng = random.Random(seed)
+    for data in (STREAM, STREAM.encode("latin-1")):
+        parser = DMCStreamParser()
+        messages = []
+        for chunk in split_randomly(data, rng):
+            messages += parser.feed(chunk)
+        assert messages == expected
+        assert parser.n_messages == len(MESSAGES) and parser.n_dropped == 0
+
+
+def test_frames_buffers_eagerly():
+    parser = DMCStreamParser()
+    head, tail = MESSAGES[0][:10], MESSAGES[0][10:]
+    # the results are not used: the chunks must be buffered nevertheless
+    assert parser.frames(head) == []
+    parser.iter_feed(tail[:5])
+    assert parser.pending == len(head) + 5
+    assert parser.frames(tail[5:]) == [MESSAGES[0]]
+
+
+def test_drops_interrupted_and_oversized_messages():
+    parser = DMCStreamParser(max_message_length=64)
+    # interrupted by the head of the next message
+    messages = parser.feed("[)>\x1eS12" + MESSAGES[1])
+    # no tail within max_message_length
+    messages += parser.feed("[)>\x1eS")
+    for _ in range(10):
+        messages += parser.feed("1" * 20)
+        assert parser.pending <= 64
+    messages += parser.feed("\x04" + MESSAGES[1])
+    assert len(messages) == 2
+    assert parser.n_dropped == 2
+
+
+def test_skips_noise_between_messages():
+    parser = DMCStreamParser()
+    assert len(parser.feed("\r\nnoise[)" + MESSAGES[1] + "\n[)>" + MESSAGES[0] + "[)")) == 2
+    assert parser.n_skipped_characters == len("\r\nnoise[)") + len("\n[)>")
+    assert parser.pending == 2
+
+
+def test_parse_stream():
+    chunks = split_randomly(STREAM.encode("latin-1"), random.Random(0))
+    assert list(parse_stream(chunks)) == DMCStreamParser().feed(STREAM)
+
+
+def test_parse_stream_async():
+    async def collect():
+        reader = asyncio.StreamReader()
+        for chunk in split_randomly(STREAM.encode("latin-1"), random.Random(1)):
+            reader.feed_data(chunk)
+        reader.feed_eof()
+        return [content async for content in parse_stream_async(reader, chunk_size=5)]
+
+    assert asyncio.run(collect()) == DMCStreamParser().feed(STREAM)
@@ -0,0 +1,39 @@
+from PIL import Image
+
+from utils.shared_cache import SharedCache, pack_bitmap, unpack_bitmap
+
+
+def test_shared_cache(tmp_path):
+    cache = SharedCache(tmp_path / "cache.sqlite", max_bytes=1000)
+    assert cache.get("png", ("S1", 1)) is None
+    assert cache.put("png", ("S1", 1), b"x" * 100)
+    assert cache.get("png", ("S1", 1)) == b"x" * 100
+    assert cache.get("zpl", ("S1", 1)) is None
+    # entries larger than the cache are not stored
+    assert not cache.put("png", "large", b"x" * 1001)
+
+    # another process (connection) sees the entries
+    assert SharedCache(tmp_path / "cache.sqlite").get("png", ("S1", 1)) == b"x" * 100
+
+    img = Image.new("1", (13, 7), 1)
+    img.putpixel((3, 2), 0)
+    unpacked = unpack_bitmap(pack_bitmap(img))
+    assert unpacked.size == img.size and unpacked.tobytes() == img.tobytes()
+    assert unpacked.getpixel((3, 2)) == 0
+
+
+def test_shared_cache_evicts_least_recently_used(tmp_path):
+    cache = SharedCache(tmp_path / "cache.sqlite", max_bytes=1000, touch_interval=0)
+    db = cache._connection()
+    for i in range(10):
+        cache.put("png", i, b"x" * 100)
+        # distinct access times
+        db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (i, cache.make_key("png", i)))
+    assert cache.info()["bytes"] == 1000
+    cache.get("png", 0)
+    # put() checks the size after every 1/16 of max_bytes and evicts down to 90 %
+    cache.put("png", 10, b"x" * 100)
+    assert cache.info()["bytes"] == 900
+    assert cache.get("png", 0) is not None and cache.get("png", 10) is not None
+    assert cache.get("png", 1) is None and cache.get("png", 2) is None
+    assert cache.evict() == 0
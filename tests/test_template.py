@@ -0,0 +1,37 @@
+import pytest
+
+from DataMatrixCode import DMCTemplate, DMCMessageBuilder, parse_dmc, serial_range
+
+
+def test_template_messages():
+    fields = {"P": "12345-AB", "V": "123H48999"}
+    template = DMCTemplate(fields)
+    assert template.prefix == "[)>\x1eP12345-AB\x1dV123H48999\x1dS"
+    assert template.suffix == "\x04"
+    for serial, message in zip(["SN001", 2], template.messages(["SN001", 2])):
+        assert message == template.prefix + str(serial) + template.suffix
+        assert parse_dmc(message, use_cache=False) == {"ANSI-MH-10": fields | {"S": str(serial)}}
+
+
+def test_template_envelopes():
+    template = DMCTemplate({"P": "12345-AB"}, use_format_envelope=True, use_message_envelope=False)
+    builder = DMCMessageBuilder({"P": "12345-AB"})
+    assert template.prefix == builder.fmt_head + "P12345-AB" + builder.fmt_sep + "S"
+    assert template.suffix == builder.fmt_tail
+    assert DMCTemplate({}).get_message("1") == "[)>\x1eS1\x04"
+
+
+def test_template_validation():
+    with pytest.raises(ValueError):
+        DMCTemplate({"S": "1"})
+    with pytest.raises(ValueError):
+        DMCTemplate({"P": "12345-AB"}, variable_data_identifier="XYZ")
+    with pytest.raises(ValueError):
+        DMCTemplate({"18D": "2023"})
+    with pytest.raises(ValueError):
+        DMCTemplate({"P": "12345-AB"}, variable_data_identifier="18D").get_message("no date")
+
+
+def test_serial_range():
+    assert list(serial_range(8, 12, 2, width=3, prefix="SN")) == ["SN008", "SN010"]
+    assert list(serial_range(1, 3)) == ["1", "2"]
@@ -0,0 +1,31 @@
+import json
+
+from DataMatrixCode import FormatParser, ParsedField, ParsedMessage
+
+
+def test_format_parser_parse_returns_list():
+    fields, valid = FormatParser("ANSI-MH-10", ["S123", "2Q12"]).parse()
+    assert valid
+    assert fields == [
+        {"data_identifier": "S", "content": "123", "code_valid": True, "string": "123"},
+        {"data_identifier": "2Q", "content": "12", "code_valid": True, "string": "12"},
+    ]
+    assert json.loads(json.dumps(fields + [])) == fields
+
+
+def test_format_parser_parse_compact():
+    parser = FormatParser("ANSI-MH-10", ["S123", "2Q12"])
+    message, valid = parser.parse_compact()
+    assert valid and message.valid
+    assert isinstance(message, ParsedMessage) and len(message) == 2
+    assert message.data_identifiers == ("S", "2Q")
+    assert message == parser.parse()[0]
+    assert message.to_list() == parser.parse()[0]
+    assert message.as_dict() == {"S": "123", "2Q": "12"}
+
+    field = message[1]
+    assert isinstance(field, ParsedField)
+    assert field == ("2Q", "12", True, "12")
+    assert field["content"] == field.content == "12"
+    assert dict(field) == field.to_dict() == message.to_list()[1]
+    assert message[-1:] == [field]
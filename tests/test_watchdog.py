@@ -0,0 +1,46 @@
+import pytest
+import treepoem
+
+from utils.watchdog import CircuitBreaker, CircuitOpen, RenderCancelled, RenderProcessError, is_input_error
+from DataMatrixCode.DMCGenerator import RenderTimeout
+
+
+def fail(ex: Exception):
+    raise ex
+
+
+def test_is_input_error():
+    assert is_input_error(ValueError("unknown option"))
+    assert is_input_error(treepoem.TreepoemError("BWIPP: bwipp.datamatrixTooLong"))
+    # ghostscript is missing or failed
+    assert not is_input_error(treepoem.TreepoemError("Cannot determine path to ghostscript"))
+    assert not is_input_error(RenderProcessError("The render process died."))
+
+
+def test_circuit_breaker_opens_on_failures_of_the_renderer():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for ex in (RenderTimeout("deadline"), treepoem.TreepoemError("ghostscript failed"), OSError("gs")):
+        with pytest.raises(type(ex)):
+            breaker.call(fail, ex)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.call(lambda: None)
+
+
+def test_circuit_breaker_ignores_errors_of_the_input():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    for ex in (ValueError("invalid"), treepoem.TreepoemError("BWIPP: bwipp.datamatrixBadData"),
+               RenderCancelled("gone"), ValueError("invalid")):
+        with pytest.raises(type(ex)):
+            breaker.call(fail, ex)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.n_failures == 0
+
+
+def test_circuit_breaker_half_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    with pytest.raises(RenderProcessError):
+        breaker.call(fail, RenderProcessError("crashed"))
+    assert breaker.state == CircuitBreaker.OPEN
+    # after reset_timeout a trial call closes the circuit again
+    assert breaker.call(lambda: 42) == 42
+    assert breaker.state == CircuitBreaker.CLOSED
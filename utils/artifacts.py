@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from stat import S_ISREG
+
+from prometheus_client import Counter, Gauge
+from starlette.staticfiles import StaticFiles
+
+from typing import Union, Dict, List, Tuple, Any, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: eviction is not coordinated between processes
+    fcntl = None
+
+
+ARTIFACTS_STORED = Counter("dmc_artifacts_stored_total", "Number of artifacts written to the artifact store.")
+ARTIFACTS_EVICTED = Counter("dmc_artifacts_evicted_total", "Number of artifacts evicted from the artifact store.",
+                            ["reason"])
+ARTIFACT_BYTES = Gauge("dmc_artifact_store_bytes", "Total size of the files in the artifact store.")
+ARTIFACT_ITEMS = Gauge("dmc_artifact_store_items", "Number of files in the artifact store.")
+
+# file extensions of the output formats
+ARTIFACT_EXTENSIONS = {
+    "png": ".png",
+    "bmp": ".bmp",
+    "pcx": ".pcx",
+    "zpl": ".zpl",
+    "zpl-hex": ".zpl",
+    "zpl-bx": ".zpl",
+}
+
+
+class ArtifactStore:
+    """
+    Rendered images as files named by the hash of their content (immutable, so they can be served as static files
+    and cached by clients and proxies). Files that were not stored (again) for ttl seconds are deleted, and the oldest
+    files are deleted while the store exceeds max_bytes.
+    The files on disk are the index that all worker processes share: eviction scans the directory under an exclusive
+    file lock, while put() holds a shared one. So the limits hold for the whole store, and a file that another
+    worker stored again (newer modification time) is not deleted.
+    """
+    def __init__(self, directory: Union[str, Path] = "images", max_bytes: int = 512 * 2**20, ttl: float = 24 * 3600,
+                 interval: float = 60):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.interval = interval
+        self._lock_path = self.directory / ".lock"
+        # size and number of the files as of the last scan, plus the files written by this process since then
+        self._n_bytes = 0
+        self._n_items = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+        self.scan()
+
+    def __repr__(self):
+        return f"ArtifactStore({self.directory}, items={self._n_items}, bytes={self._n_bytes})"
+
+    def __len__(self) -> int:
+        return self._n_items
+
+    def __contains__(self, name: str) -> bool:
+        return (self.directory / name).is_file()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = False) -> Iterator[None]:
+        """lock of the directory across processes (and threads: one file descriptor per call)"""
+        with open(self._lock_path, "a") as fid:
+            if fcntl is not None:
+                fcntl.flock(fid, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _files(self) -> List[Tuple[float, str, int]]:
+        """(modification time, name, size) of the files on disk, oldest first"""
+        files = []
+        for path in self.directory.iterdir():
+            if not path.name.startswith("."):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if S_ISREG(stat.st_mode):
+                    files.append((stat.st_mtime, path.name, stat.st_size))
+        return sorted(files)
+
+    def scan(self):
+        """size of the store on disk (e.g. after a restart)"""
+        files = self._files()
+        with self._lock:
+            self._n_bytes = sum(size for _, _, size in files)
+            self._n_items = len(files)
+            self._update_gauges()
+
+    def _update_gauges(self):
+        ARTIFACT_BYTES.set(self._n_bytes)
+        ARTIFACT_ITEMS.set(self._n_items)
+
+    @staticmethod
+    def get_name(content: bytes, extension: str = ".png") -> str:
+        return hashlib.sha256(content).hexdigest()[:32] + extension
+
+    def put(self, content: bytes, extension: str = ".png") -> str:
+        """stores the content (once) and returns its file name; storing it again renews its time to live"""
+        name = self.get_name(content, extension)
+        path = self.directory / name
+        with self._file_lock():
+            try:
+                # no eviction runs while the lock is held, so the file is kept for ttl seconds from now
+                os.utime(path)
+            except FileNotFoundError:
+                # write to a temporary file first, so that a file is never served half-written
+                tmp_path = self.directory / f".{name}.{os.getpid()}.{threading.get_ident()}.tmp"
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, path)
+                ARTIFACTS_STORED.inc()
+                with self._lock:
+                    self._n_bytes += len(content)
+                    self._n_items += 1
+                    self._update_gauges()
+        if self._n_bytes > self.max_bytes:
+            self.evict()
+        return name
+
+    def evict(self) -> int:
+        """deletes expired files, then the oldest files while the store is too large"""
+        n = 0
+        with self._file_lock(exclusive=True):
+            files = self._files()
+            n_bytes = sum(size for _, _, size in files)
+            expired = time.time() - self.ttl
+            for mtime, name, size in files:
+                if mtime < expired:
+                    reason = "ttl"
+                elif n_bytes > self.max_bytes:
+                    reason = "size"
+                else:
+                    break
+                try:
+                    (self.directory / name).unlink()
+                except FileNotFoundError:
+                    pass
+                n_bytes -= size
+                n += 1
+                ARTIFACTS_EVICTED.labels(reason).inc()
+            with self._lock:
+                self._n_bytes = n_bytes
+                self._n_items = len(files) - n
+                self._update_gauges()
+        return n
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name="artifact-eviction", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                n = self.evict()
+                if n:
+                    logging.info(f"ArtifactStore: {n} files evicted.")
+            except OSError as ex:
+                logging.warning(f"ArtifactStore: eviction failed: {type(ex).__name__}: {ex}")
+
+    def info(self) -> Dict[str, Any]:
+        self.scan()
+        return {"items": self._n_items, "bytes": self._n_bytes, "max_bytes": self.max_bytes, "ttl": self.ttl}
+
+
+class ArtifactFiles(StaticFiles):
+    """static files of the artifact store; their names are content hashes, so clients may cache them"""
+    def __init__(self, *args, max_age: int = 24 * 3600, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_age = max_age
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = f"public, max-age={self.max_age}, immutable"
+        return response
@@ -0,0 +1,35 @@
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+
+from typing import Callable, Union, Any
+
+
+class CacheCollector(Collector):
+    """
+    Exposes the statistics of an in-process cache of the library (info() with hits, misses, items and max_items,
+    e.g. ParseCache) as dmc_<name>_* metrics. The cache is looked up at every scrape, so it may be replaced.
+    """
+    def __init__(self, name: str, get_cache: Callable[[], Union[Any, None]], description: str = ""):
+        self.name = name
+        self.get_cache = get_cache
+        self.description = description or name.replace("_", " ")
+
+    def collect(self):
+        cache = self.get_cache()
+        if cache is None:
+            return
+        info = cache.info()
+        yield CounterMetricFamily(f"dmc_{self.name}_hits", f"Number of hits of the {self.description}.",
+                                  value=info["hits"])
+        yield CounterMetricFamily(f"dmc_{self.name}_misses", f"Number of misses of the {self.description}.",
+                                  value=info["misses"])
+        yield GaugeMetricFamily(f"dmc_{self.name}_items", f"Number of entries of the {self.description}.",
+                                value=info["items"])
+        yield GaugeMetricFamily(f"dmc_{self.name}_max_items", f"Capacity of the {self.description} in entries.",
+                                value=info["max_items"])
+
+
+def register_cache(name: str, get_cache: Callable[[], Union[Any, None]], description: str = "") -> CacheCollector:
+    collector = CacheCollector(name, get_cache, description)
+    REGISTRY.register(collector)
+    return collector
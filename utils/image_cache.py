@@ -0,0 +1,74 @@
+import io
+import threading
+from collections import OrderedDict
+
+from prometheus_client import Counter, Gauge
+
+from typing import Hashable, Union, Dict, Any
+
+
+CACHE_HITS = Counter("dmc_image_cache_hits_total", "Number of images served from the image cache.")
+CACHE_MISSES = Counter("dmc_image_cache_misses_total", "Number of images that had to be rendered.")
+CACHE_BYTES = Gauge("dmc_image_cache_bytes", "Total size of the images in the image cache.")
+CACHE_ITEMS = Gauge("dmc_image_cache_items", "Number of images in the image cache.")
+
+
+class ImageCache:
+    """Thread-safe LRU cache of encoded images (bytes), limited by the total size of the images."""
+    def __init__(self, max_bytes: int = 64 * 2**20):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._n_bytes = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"ImageCache(max_bytes={self.max_bytes}, items={len(self._items)}, bytes={self._n_bytes})"
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def get(self, key: Hashable, count: bool = True) -> Union[bytes, None]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+        if count:
+            (CACHE_HITS if value is not None else CACHE_MISSES).inc()
+        return value
+
+    def put(self, key: Hashable, value: bytes) -> bool:
+        if len(value) > self.max_bytes:
+            return False
+
+        with self._lock:
+            if key in self._items:
+                self._n_bytes -= len(self._items.pop(key))
+            self._items[key] = value
+            self._n_bytes += len(value)
+            # evict least recently used images
+            while self._n_bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._n_bytes -= len(evicted)
+            CACHE_BYTES.set(self._n_bytes)
+            CACHE_ITEMS.set(len(self._items))
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._n_bytes = 0
+            CACHE_BYTES.set(0)
+            CACHE_ITEMS.set(0)
+
+    def info(self) -> Dict[str, Any]:
+        return {"items": len(self._items), "bytes": self._n_bytes, "max_bytes": self.max_bytes}
+
+
+def encode_image(img, image_format: str = "PNG") -> bytes:
+    """encodes a pillow image to bytes"""
+    buffer = io.BytesIO()
+    img.save(buffer, format=image_format)
+    return buffer.getvalue()
@@ -0,0 +1,329 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from prometheus_client import Counter, Gauge
+
+from utils.prewarm import lower_thread_priority
+
+from typing import Callable, Union, Dict, List, Tuple, Any, Iterable, Iterator
+
+
+JOB_ITEMS = Counter("dmc_job_items_total", "Number of processed items of batch jobs.", ["status"])
+JOBS_ACTIVE = Gauge("dmc_jobs_active", "Number of queued or running batch jobs.")
+
+# states of a job / of its items
+JOB_QUEUED, JOB_RUNNING, JOB_DONE, JOB_CANCELLED = "queued", "running", "done", "cancelled"
+ITEM_PENDING, ITEM_RUNNING, ITEM_DONE, ITEM_FAILED = "pending", "running", "done", "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    options TEXT,
+    created TEXT NOT NULL,
+    finished TEXT,
+    last_served REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    input TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message TEXT,
+    result BLOB,
+    error TEXT,
+    owner TEXT,
+    lease_until REAL,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS items_status ON items (job_id, status, idx);
+"""
+
+
+class JobStore:
+    """
+    Batch jobs and their items in a local SQLite database (WAL), so that jobs survive a restart of the service.
+    One connection is shared by all threads and serialized by a lock. Several processes (uvicorn workers) may share
+    the database: items are claimed atomically with a lease of lease_seconds, and only items whose lease expired
+    (their process died) are processed again.
+    """
+    def __init__(self, path: Union[str, Path] = "data/jobs.sqlite", lease_seconds: float = 300):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        # identifies the items claimed by this store
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._migrate()
+        self.recover()
+
+    def __repr__(self):
+        return f"JobStore({self.path})"
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _migrate(self):
+        # databases of earlier versions have no leases (their running items count as expired)
+        with self._lock:
+            columns = {name for _, name, *_ in self._db.execute("PRAGMA table_info(items)").fetchall()}
+            for column, column_type in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    try:
+                        self._db.execute(f"ALTER TABLE items ADD COLUMN {column} {column_type}")
+                    except sqlite3.OperationalError:
+                        # added by another process in the meantime
+                        pass
+
+    def _release_expired(self, now: float) -> int:
+        return self._db.execute(
+            "UPDATE items SET status = ?, owner = NULL, lease_until = NULL "
+            "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)", (ITEM_PENDING, ITEM_RUNNING, now)
+        ).rowcount
+
+    def recover(self) -> int:
+        """items whose lease expired (the process stopped while they were running) are processed again"""
+        with self._lock:
+            n = self._release_expired(time.time())
+        if n:
+            logging.info(f"JobStore: {n} interrupted items are pending again.")
+        self._update_gauge()
+        return n
+
+    def _update_gauge(self):
+        with self._lock:
+            n, = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (JOB_QUEUED, JOB_RUNNING)).fetchone()
+        JOBS_ACTIVE.set(n)
+
+    def create_job(self, items: Iterable[Dict[str, Any]], options: Dict[str, Any] = None, chunk_size: int = 1000) -> str:
+        """stores a job with its items (inserted in chunks, so that large batches need not be held in memory)"""
+        job_id = uuid.uuid4().hex
+        total = 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute(
+                    "INSERT INTO jobs (id, status, options, created) VALUES (?, ?, ?, ?)",
+                    (job_id, JOB_QUEUED, json.dumps(options or dict()), datetime.now().isoformat())
+                )
+                chunk = []
+                for item in items:
+                    chunk.append((job_id, total, json.dumps(item), ITEM_PENDING))
+                    total += 1
+                    if len(chunk) >= chunk_size:
+                        self._db.executemany("INSERT INTO items (job_id, idx, input, status) VALUES (?, ?, ?, ?)", chunk)
+                        chunk = []
+                if chunk:
+                    self._db.executemany("INSERT INTO items (job_id, idx, input, status) VALUES (?, ?, ?, ?)", chunk)
+                self._db.execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self._update_gauge()
+        return job_id
+
+    def claim_chunk(self, chunk_size: int = 50) -> Tuple[Union[str, None], List[Tuple[int, str]]]:
+        """
+        fair scheduling: takes the next pending items of the active job that was served least recently
+        (round robin), so that a large job does not block the jobs submitted after it. The items are leased to this
+        store; the write transaction (BEGIN IMMEDIATE) makes the claim atomic across processes.
+        """
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                self._release_expired(now)
+                jobs = self._db.execute(
+                    "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY last_served, created",
+                    (JOB_QUEUED, JOB_RUNNING)
+                ).fetchall()
+                for job_id, in jobs:
+                    items = self._db.execute(
+                        "UPDATE items SET status = ?, owner = ?, lease_until = ? WHERE job_id = ? AND idx IN "
+                        "(SELECT idx FROM items WHERE job_id = ? AND status = ? ORDER BY idx LIMIT ?) "
+                        "RETURNING idx, input",
+                        (ITEM_RUNNING, self.owner, now + self.lease_seconds, job_id, job_id, ITEM_PENDING, chunk_size)
+                    ).fetchall()
+                    if not items:
+                        self._finish_if_complete(job_id)
+                        continue
+                    self._db.execute(
+                        "UPDATE jobs SET status = ?, last_served = ? WHERE id = ?", (JOB_RUNNING, now, job_id)
+                    )
+                    self._db.execute("COMMIT")
+                    return job_id, sorted(items)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return None, []
+
+    def store_results(self, job_id: str, results: List[Tuple[int, str, bytes, str]]) -> int:
+        """
+        results (index, message string, content, error) of a chunk; only items still leased to this store are
+        updated (an item whose lease expired may have been claimed by another process). Returns their number.
+        """
+        n_done, n_errors = 0, 0
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                for idx, message, content, error in results:
+                    n = self._db.execute(
+                        "UPDATE items SET status = ?, message = ?, result = ?, error = ?, lease_until = NULL "
+                        "WHERE job_id = ? AND idx = ? AND status = ? AND owner = ?",
+                        (ITEM_FAILED if error else ITEM_DONE, message, content, error, job_id, idx, ITEM_RUNNING,
+                         self.owner)
+                    ).rowcount
+                    n_done += n
+                    n_errors += n if error is not None else 0
+                self._db.execute(
+                    "UPDATE jobs SET done = done + ?, errors = errors + ? WHERE id = ?", (n_done, n_errors, job_id)
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._finish_if_complete(job_id)
+        JOB_ITEMS.labels(ITEM_DONE).inc(n_done - n_errors)
+        JOB_ITEMS.labels(ITEM_FAILED).inc(n_errors)
+        return n_done
+
+    def _finish_if_complete(self, job_id: str):
+        with self._lock:
+            n_open, = self._db.execute(
+                "SELECT COUNT(*) FROM items WHERE job_id = ? AND status IN (?, ?)", (job_id, ITEM_PENDING, ITEM_RUNNING)
+            ).fetchone()
+            if n_open == 0:
+                self._db.execute(
+                    "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+                    (JOB_DONE, datetime.now().isoformat(), job_id, JOB_QUEUED, JOB_RUNNING)
+                )
+        self._update_gauge()
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            n = self._db.execute(
+                "UPDATE jobs SET status = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+                (JOB_CANCELLED, datetime.now().isoformat(), job_id, JOB_QUEUED, JOB_RUNNING)
+            ).rowcount
+        self._update_gauge()
+        return n > 0
+
+    def delete(self, job_id: str) -> bool:
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+            n = self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,)).rowcount
+            self._db.execute("COMMIT")
+        self._update_gauge()
+        return n > 0
+
+    def get_job(self, job_id: str) -> Union[Dict[str, Any], None]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, total, done, errors, options, created, finished FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "status", "total", "done", "errors", "options", "created", "finished")
+        job = dict(zip(keys, row))
+        job["options"] = json.loads(job["options"])
+        job["completed"] = self.completed(job_id)
+        return job
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            ids = [job_id for job_id, in self._db.execute("SELECT id FROM jobs ORDER BY created").fetchall()]
+        return [self.get_job(job_id) for job_id in ids]
+
+    def completed(self, job_id: str) -> int:
+        """number of items that are completed without a gap, i.e. the results that can be downloaded"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT MIN(idx) FROM items WHERE job_id = ? AND status IN (?, ?)", (job_id, ITEM_PENDING, ITEM_RUNNING)
+            ).fetchone()
+            if row[0] is not None:
+                return row[0]
+            n, = self._db.execute("SELECT COUNT(*) FROM items WHERE job_id = ?", (job_id,)).fetchone()
+        return n
+
+    def get_results(self, job_id: str, offset: int = 0, limit: int = 1000) -> Iterator[Tuple[int, str, bytes, str]]:
+        """completed results (index, message string, content, error) from offset on; stops at the first open item"""
+        end = min(self.completed(job_id), offset + limit)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT idx, message, result, error FROM items WHERE job_id = ? AND idx >= ? AND idx < ? ORDER BY idx",
+                (job_id, offset, end)
+            ).fetchall()
+        return iter(rows)
+
+
+class JobRunner:
+    """
+    Background workers for the batch jobs. The workers run at low priority and process one chunk at a time, so that
+    interactive requests are served in between. render is called with the input of an item and returns
+    (message string, content); it is expected to render at low priority too (e.g. in the batch lane).
+    """
+    def __init__(self, store: JobStore, render: Callable[[Dict[str, Any]], Tuple[str, bytes]],
+                 n_workers: int = 1, chunk_size: int = 50, poll_interval: float = 0.5):
+        self.store = store
+        self.render = render
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._wake_up = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def __repr__(self):
+        return f"JobRunner(workers={self.n_workers}, chunk_size={self.chunk_size})"
+
+    def start(self):
+        self._stop.clear()
+        for i in range(self.n_workers):
+            thread = threading.Thread(target=self.run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        self._wake_up.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def notify(self):
+        """wakes up the workers, e.g. after a job was submitted"""
+        self._wake_up.set()
+
+    def run(self):
+        lower_thread_priority()
+        while not self._stop.is_set():
+            job_id, items = self.store.claim_chunk(self.chunk_size)
+            if job_id is None:
+                self._wake_up.wait(self.poll_interval)
+                self._wake_up.clear()
+                continue
+            self.store.store_results(job_id, [self.process(idx, data) for idx, data in items])
+
+    def process(self, idx: int, data: str) -> Tuple[int, str, bytes, str]:
+        try:
+            message, content = self.render(json.loads(data))
+        except Exception as ex:
+            return idx, None, None, f"{type(ex).__name__}: {ex}"
+        return idx, message, content, None
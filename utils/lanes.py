@@ -0,0 +1,289 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from typing import Union, Dict, Any, Deque, Tuple
+
+
+LANE_IN_FLIGHT = Gauge("dmc_lane_in_flight", "Number of renders in progress per priority lane.", ["lane"])
+LANE_QUEUED = Gauge("dmc_lane_queued", "Number of requests waiting per priority lane.", ["lane"])
+LANE_REJECTED = Counter("dmc_lane_rejected_total", "Number of requests rejected by a full or timed-out lane.", ["lane", "reason"])
+LANE_WAIT_SECONDS = Histogram("dmc_lane_wait_seconds", "Time a request waited for a render slot.", ["lane"])
+
+# default lanes: interactive requests (operators, line terminals) before batch traffic
+DEFAULT_LANES = {
+    "interactive": {"priority": 0, "max_concurrency": 8, "max_queue": 200, "queue_timeout": 10},
+    "batch": {"priority": 1, "max_concurrency": 4, "max_queue": 1000, "queue_timeout": 60},
+}
+
+
+class LaneRejected(Exception):
+    def __init__(self, lane: str, reason: str):
+        super().__init__(f"Lane '{lane}' is {reason}.")
+        self.lane = lane
+        self.reason = reason
+
+
+class Lane:
+    """concurrency budget and queue of one priority lane (lower priority value = served first)"""
+    def __init__(self, name: str, priority: int = 0, max_concurrency: int = 8, max_queue: int = 100,
+                 queue_timeout: float = 10):
+        self.name = name
+        self.priority = priority
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.waiting: Deque[asyncio.Future] = deque()
+
+    def __repr__(self):
+        return f"Lane({self.name}, priority={self.priority}, in_flight={self.in_flight}, queued={len(self.waiting)})"
+
+    def update_metrics(self):
+        LANE_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        LANE_QUEUED.labels(self.name).set(len(self.waiting))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "priority": self.priority,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": len(self.waiting),
+        }
+
+
+class LaneScheduler:
+    """
+    Admission control in front of the renderer: at most capacity renders run at a time, each lane within its own
+    concurrency budget. A free slot goes to the waiting request of the lane with the highest priority, i.e. lower
+    lanes only get capacity that no higher lane is waiting for. Full queues and waits beyond the queue timeout of
+    a lane are rejected (LaneRejected).
+    Meant for a single event loop (one per worker process); threads outside the loop (background workers) take
+    their slots with thread_slot() once the loop is bound (bind()).
+    """
+    def __init__(self, capacity: int = 8, lanes: Dict[str, Dict[str, Any]] = None, default_lane: str = "interactive"):
+        lanes = lanes or DEFAULT_LANES
+        self.capacity = capacity
+        self.lanes: Dict[str, Lane] = {name: Lane(name, **options) for name, options in lanes.items()}
+        if default_lane not in self.lanes:
+            raise ValueError(f"Default lane '{default_lane}' is not one of the lanes {list(self.lanes)}.")
+        self.default_lane = default_lane
+        self.in_flight = 0
+        # lanes ordered by priority
+        self._order = sorted(self.lanes.values(), key=lambda ln: ln.priority)
+        self.loop: Union[asyncio.AbstractEventLoop, None] = None
+
+    def __repr__(self):
+        return f"LaneScheduler(capacity={self.capacity}, lanes={list(self.lanes)})"
+
+    def _can_start(self, lane: Lane) -> bool:
+        if self.in_flight >= self.capacity or lane.in_flight >= lane.max_concurrency:
+            return False
+        # lanes with higher priority that wait (and could start) go first
+        for other in self._order:
+            if other.priority >= lane.priority:
+                break
+            if other.waiting and other.in_flight < other.max_concurrency:
+                return False
+        return True
+
+    def _start(self, lane: Lane):
+        self.in_flight += 1
+        lane.in_flight += 1
+        lane.update_metrics()
+
+    async def acquire(self, lane_name: str = None):
+        lane = self.lanes[lane_name or self.default_lane]
+        if not lane.waiting and self._can_start(lane):
+            self._start(lane)
+            LANE_WAIT_SECONDS.labels(lane.name).observe(0)
+            return
+        if len(lane.waiting) >= lane.max_queue:
+            LANE_REJECTED.labels(lane.name, "full").inc()
+            raise LaneRejected(lane.name, "full")
+
+        future = asyncio.get_running_loop().create_future()
+        lane.waiting.append(future)
+        lane.update_metrics()
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=lane.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # the slot was granted in the meantime; give it back
+                self.release(lane.name)
+            else:
+                future.cancel()
+            LANE_REJECTED.labels(lane.name, "timeout").inc()
+            raise LaneRejected(lane.name, "busy (queue timeout)")
+        except asyncio.CancelledError:
+            # the client went away while waiting
+            if future.done() and not future.cancelled():
+                self.release(lane.name)
+            else:
+                future.cancel()
+            raise
+        finally:
+            if future in lane.waiting:
+                lane.waiting.remove(future)
+            lane.update_metrics()
+        LANE_WAIT_SECONDS.labels(lane.name).observe(time.perf_counter() - t0)
+
+    def release(self, lane_name: str = None):
+        lane = self.lanes[lane_name or self.default_lane]
+        self.in_flight -= 1
+        lane.in_flight -= 1
+        lane.update_metrics()
+        self._dispatch()
+
+    def _dispatch(self):
+        """hands free slots to the waiting requests in the order of the priorities"""
+        for lane in self._order:
+            while lane.waiting and self._can_start_waiting(lane):
+                future = lane.waiting.popleft()
+                if future.done():
+                    continue
+                self._start(lane)
+                future.set_result(True)
+            lane.update_metrics()
+
+    def _can_start_waiting(self, lane: Lane) -> bool:
+        return self.in_flight < self.capacity and lane.in_flight < lane.max_concurrency
+
+    def slot(self, lane_name: str = None) -> "LaneSlot":
+        """async context manager: async with scheduler.slot("batch"): ..."""
+        return LaneSlot(self, lane_name)
+
+    @property
+    def lowest_lane(self) -> str:
+        return self._order[-1].name
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """event loop of the scheduler (needed by thread_slot())"""
+        self.loop = loop
+
+    def thread_slot(self, lane_name: str = None, retry_interval: float = 1,
+                    deadline: Union[float, None] = None) -> "ThreadLaneSlot":
+        """context manager for threads outside the event loop: with scheduler.thread_slot("batch"): ..."""
+        if self.loop is None:
+            raise RuntimeError("The scheduler is not bound to an event loop (bind()).")
+        return ThreadLaneSlot(self, lane_name, retry_interval, deadline)
+
+    def status(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "in_flight": self.in_flight,
+                "lanes": {name: lane.status() for name, lane in self.lanes.items()}}
+
+
+class LaneSlot:
+    def __init__(self, scheduler: LaneScheduler, lane_name: str = None):
+        self.scheduler = scheduler
+        self.lane_name = lane_name
+
+    async def __aenter__(self):
+        await self.scheduler.acquire(self.lane_name)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.scheduler.release(self.lane_name)
+
+
+class _Attempt:
+    """one request of a thread for a slot; a slot granted after the thread gave up is released"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.granted = False
+        self.abandoned = False
+
+
+class ThreadLaneSlot:
+    """
+    slot of a lane for a thread outside the event loop of the scheduler (e.g. pre-warming, batch jobs). Each attempt
+    waits at most the queue timeout of the lane; a rejected attempt is retried after retry_interval, since background
+    work has no client to answer with 503. With a deadline (time.monotonic()), LaneRejected is raised once it passed.
+    """
+    # additional seconds to wait for an event loop that does not answer (e.g. blocked) before an attempt is given up
+    loop_grace = 1.0
+
+    def __init__(self, scheduler: LaneScheduler, lane_name: str = None, retry_interval: float = 1,
+                 deadline: Union[float, None] = None):
+        self.scheduler = scheduler
+        self.lane_name = lane_name
+        self.retry_interval = retry_interval
+        self.deadline = deadline
+
+    async def _acquire(self, attempt: _Attempt, timeout: float):
+        await asyncio.wait_for(self.scheduler.acquire(self.lane_name), timeout)
+        with attempt.lock:
+            if attempt.abandoned:
+                self.scheduler.release(self.lane_name)
+                return
+            attempt.granted = True
+
+    def _try(self, timeout: float) -> bool:
+        attempt = _Attempt()
+        future = asyncio.run_coroutine_threadsafe(self._acquire(attempt, timeout), self.scheduler.loop)
+        try:
+            future.result(timeout + self.loop_grace)
+        except (LaneRejected, asyncio.TimeoutError, concurrent.futures.TimeoutError):
+            pass
+        with attempt.lock:
+            if attempt.granted:
+                return True
+            attempt.abandoned = True
+        # a pending acquire() gives back a slot granted in the meantime when it is cancelled
+        future.cancel()
+        return False
+
+    def __enter__(self):
+        lane = self.scheduler.lanes[self.lane_name or self.scheduler.default_lane]
+        while True:
+            timeout = lane.queue_timeout
+            if self.deadline is not None:
+                timeout = min(timeout, self.deadline - time.monotonic())
+                if timeout <= 0:
+                    LANE_REJECTED.labels(lane.name, "timeout").inc()
+                    raise LaneRejected(lane.name, "busy (deadline exceeded)")
+            if self._try(timeout):
+                return self
+            delay = self.retry_interval
+            if self.deadline is not None:
+                delay = min(delay, max(0.0, self.deadline - time.monotonic()))
+            time.sleep(delay)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.scheduler.loop.call_soon_threadsafe(self.scheduler.release, self.lane_name)
+
+
+class LaneClassifier:
+    """
+    assigns a request to a lane: by API key (header X-API-Key, authoritative), by the header X-Priority (clients can
+    only declare a lane of the same or lower priority than the one of the endpoint), by the path of the endpoint,
+    or the default lane
+    """
+    def __init__(self, scheduler: LaneScheduler, api_keys: Dict[str, str] = None, endpoints: Dict[str, str] = None):
+        self.scheduler = scheduler
+        self.api_keys = api_keys or dict()
+        self.endpoints = endpoints or dict()
+        for lane in list(self.api_keys.values()) + list(self.endpoints.values()):
+            if lane not in scheduler.lanes:
+                raise ValueError(f"Unknown lane '{lane}'. Lanes: {list(scheduler.lanes)}.")
+
+    def __repr__(self):
+        return f"LaneClassifier(api_keys={len(self.api_keys)}, endpoints={self.endpoints})"
+
+    def classify(self, path: str, headers: Union[Dict[str, str], Any]) -> str:
+        api_key = headers.get("x-api-key")
+        if api_key in self.api_keys:
+            return self.api_keys[api_key]
+
+        lane = self.endpoints.get(path, self.scheduler.default_lane)
+        declared = headers.get("x-priority")
+        if declared in self.scheduler.lanes and \
+                self.scheduler.lanes[declared].priority >= self.scheduler.lanes[lane].priority:
+            lane = declared
+        return lane
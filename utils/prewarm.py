@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from prometheus_client import Counter, Gauge
+
+from typing import Callable, Union, Dict, Any, Iterator
+
+
+PREWARM_TOTAL = Gauge("dmc_prewarm_manifest_messages", "Number of messages in the current pre-warm manifest.")
+PREWARM_DONE = Gauge("dmc_prewarm_messages_done", "Number of processed messages of the current pre-warm manifest.")
+PREWARM_RENDERED = Counter("dmc_prewarm_rendered_total", "Number of images rendered into the cache by pre-warming.")
+PREWARM_ERRORS = Counter("dmc_prewarm_errors_total", "Number of manifest entries that could not be rendered.")
+
+
+def read_manifest(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """
+    Reads a JSONL manifest: one MessageData object per line. Records of the benchmark corpus
+    (with the MessageData under the key 'message_data') are accepted as well.
+    """
+    with open(path, "r") as fid:
+        for ln in fid:
+            if ln.strip():
+                record = json.loads(ln)
+                yield record["message_data"] if "message_data" in record else record
+
+
+def lower_thread_priority(niceness: int = 19) -> bool:
+    """
+    lowers the scheduling priority of the calling thread (Linux: niceness is per thread). This only covers the work
+    in the thread itself (and ghostscript if it renders in threads); the render processes of the api are shared with
+    the requests, so background renders must also go through a low-priority lane.
+    """
+    if not hasattr(os, "setpriority"):
+        return False
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), niceness)
+    except OSError:
+        return False
+    return True
+
+
+class Prewarmer:
+    """
+    Renders the messages of a manifest into the image cache in a background thread at low priority.
+    render is called with a MessageData dictionary and is expected to put the image into the cache (at low priority,
+    e.g. in the batch lane); it returns True if an image was rendered and False if it was already cached.
+    """
+    def __init__(self, render: Callable[[Dict[str, Any]], bool], manifest: Union[str, Path, None] = None):
+        self.render = render
+        self.manifest = Path(manifest) if manifest else None
+        self._thread: threading.Thread = None
+        self._stop = threading.Event()
+        self.started: datetime = None
+        self.finished: datetime = None
+        self.total = 0
+        self.done = 0
+        self.rendered = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return f"Prewarmer(manifest={self.manifest}, running={self.running})"
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, manifest: Union[str, Path, None] = None) -> bool:
+        """starts pre-warming in the background; returns False if it is already running"""
+        if self.running:
+            return False
+        if manifest:
+            self.manifest = Path(manifest)
+        if self.manifest is None:
+            raise ValueError("No manifest to pre-warm the cache from.")
+        if not self.manifest.is_file():
+            raise FileNotFoundError(f"Manifest {self.manifest} not found.")
+
+        self._stop.clear()
+        self.started, self.finished = datetime.now(), None
+        self.total, self.done, self.rendered, self.errors = 0, 0, 0, 0
+        self._thread = threading.Thread(target=self.run, name="prewarm", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        lower_thread_priority()
+
+        self.total = sum(1 for _ in read_manifest(self.manifest))
+        PREWARM_TOTAL.set(self.total)
+        PREWARM_DONE.set(0)
+        logging.info(f"Pre-warming the image cache with {self.total} messages from {self.manifest}.")
+
+        for data in read_manifest(self.manifest):
+            if self._stop.is_set():
+                break
+            try:
+                if self.render(data):
+                    self.rendered += 1
+                    PREWARM_RENDERED.inc()
+            except Exception as ex:
+                self.errors += 1
+                PREWARM_ERRORS.inc()
+                logging.warning(f"Pre-warming failed for {data}: {type(ex).__name__}: {ex}")
+            self.done += 1
+            PREWARM_DONE.set(self.done)
+
+        self.finished = datetime.now()
+        logging.info(f"Pre-warming finished: {self.status()}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "manifest": self.manifest.as_posix() if self.manifest else None,
+            "running": self.running,
+            "started": self.started,
+            "finished": self.finished,
+            "total": self.total,
+            "done": self.done,
+            "rendered": self.rendered,
+            "errors": self.errors,
+        }
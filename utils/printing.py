@@ -0,0 +1,306 @@
+import itertools
+import logging
+import queue
+import select
+import socket
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from typing import Union, Dict, List, Tuple, Any
+
+
+PRINT_JOBS = Counter("dmc_print_jobs_total", "Number of finished print jobs.", ["printer", "status"])
+PRINT_BYTES = Counter("dmc_print_bytes_total", "Number of bytes sent to the printer.", ["printer"])
+PRINT_BATCHES = Counter("dmc_print_batches_total", "Number of writes (batches of labels) to the printer.", ["printer"])
+PRINT_RECONNECTS = Counter("dmc_print_reconnects_total", "Number of (re-)connections to the printer.", ["printer"])
+PRINT_QUEUE = Gauge("dmc_print_queue_length", "Number of print jobs waiting for the printer.", ["printer"])
+PRINT_SEND_SECONDS = Histogram("dmc_print_send_seconds", "Duration of a write to the printer.", ["printer"])
+
+# raw printing port of label printers (JetDirect / AppSocket)
+DEFAULT_PRINTER_PORT = 9100
+
+
+def parse_printer_address(address: Union[str, Tuple[str, int]]) -> Tuple[str, int]:
+    """'host:port', 'host' (port 9100) or (host, port)"""
+    if isinstance(address, (tuple, list)):
+        return address[0], int(address[1])
+    host, _, port = address.rpartition(":") if ":" in address else (address, "", "")
+    return host, int(port) if port else DEFAULT_PRINTER_PORT
+
+
+class PrintJob:
+    """payload (label(s) in the language of the printer) for one printer; done is set once it was sent or failed"""
+    _ids = itertools.count(1)
+
+    def __init__(self, printer: str, payload: bytes):
+        self.id = next(self._ids)
+        self.printer = printer
+        self.payload = payload
+        self.status = "queued"
+        self.created = datetime.now()
+        self.sent: datetime = None
+        self.error: str = None
+        self.done = threading.Event()
+
+    def __repr__(self):
+        return f"PrintJob({self.id}, printer={self.printer}, status={self.status})"
+
+    def finish(self, error: str = None):
+        self.status = "failed" if error else "sent"
+        self.error = error
+        self.sent = datetime.now() if error is None else None
+        PRINT_JOBS.labels(self.printer, self.status).inc()
+        self.done.set()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "printer": self.printer,
+            "status": self.status,
+            "bytes": len(self.payload),
+            "created": self.created,
+            "sent": self.sent,
+            "error": self.error,
+        }
+
+
+class PrinterConnection:
+    """
+    persistent TCP connection to a printer that reconnects with exponential backoff. Raw printing has no
+    acknowledgement: a write counts as sent once the operating system accepted it.
+    """
+    def __init__(
+            self,
+            name: str,
+            host: str,
+            port: int = DEFAULT_PRINTER_PORT,
+            timeout: float = 5,
+            backoff: float = 0.5,
+            max_backoff: float = 30
+    ):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._socket: socket.socket = None
+        self._n_failures = 0
+        self._next_attempt = 0.0
+
+    def __repr__(self):
+        return f"PrinterConnection({self.name}, {self.host}:{self.port}, connected={self.connected})"
+
+    @property
+    def connected(self) -> bool:
+        return self._socket is not None
+
+    def wait_time(self) -> float:
+        """seconds until the next connection attempt is allowed"""
+        return max(0.0, self._next_attempt - time.monotonic())
+
+    def _peer_closed(self) -> bool:
+        """True if the printer closed the idle connection (readable with EOF or an error)"""
+        readable, _, _ = select.select([self._socket], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return self._socket.recv(1024, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def connect(self):
+        if self._socket is not None:
+            if not self._peer_closed():
+                return
+            self.close()
+        delay = self.wait_time()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            self._socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except OSError:
+            self._failed()
+            raise
+        PRINT_RECONNECTS.labels(self.name).inc()
+        self._n_failures = 0
+
+    def _failed(self):
+        self.close()
+        self._n_failures += 1
+        self._next_attempt = time.monotonic() + min(self.max_backoff, self.backoff * 2 ** (self._n_failures - 1))
+
+    def send(self, payload: bytes):
+        self.connect()
+        try:
+            with PRINT_SEND_SECONDS.labels(self.name).time():
+                self._socket.sendall(payload)
+        except OSError:
+            self._failed()
+            raise
+        PRINT_BYTES.labels(self.name).inc(len(payload))
+
+    def close(self):
+        if self._socket is not None:
+            try:
+                self._socket.close()
+            except OSError:
+                pass
+            self._socket = None
+
+
+class Printer:
+    """
+    Queue of print jobs for one printer, sent by a worker thread over a persistent connection. Waiting jobs are sent
+    in batches (one write of up to batch_size jobs / batch_bytes). A batch that cannot be sent is retried after
+    reconnecting (with backoff) up to max_retries times; then its jobs fail. As a write may break off after the
+    printer received a part of it, labels of a retried batch can be printed twice (at-least-once).
+    """
+    def __init__(
+            self,
+            name: str,
+            address: Union[str, Tuple[str, int]],
+            batch_size: int = 50,
+            batch_bytes: int = 2**20,
+            max_retries: int = 5,
+            **kwargs
+    ):
+        self.name = name
+        host, port = parse_printer_address(address)
+        self.connection = PrinterConnection(name, host, port, **kwargs)
+        self.batch_size = batch_size
+        self.batch_bytes = batch_bytes
+        self.max_retries = max_retries
+        self.queue: "queue.Queue[PrintJob]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: threading.Thread = None
+        self.n_jobs = 0
+        self.n_batches = 0
+        self.n_bytes = 0
+        self.n_failed = 0
+
+    def __repr__(self):
+        return f"Printer({self.name}, {self.connection.host}:{self.connection.port})"
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name=f"printer-{self.name}", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.connection.close()
+
+    def submit(self, job: PrintJob):
+        self.queue.put(job)
+        PRINT_QUEUE.labels(self.name).set(self.queue.qsize())
+
+    def next_batch(self, timeout: float = 0.5) -> List[PrintJob]:
+        """blocks for the first job, then takes all waiting jobs up to the limits of a batch"""
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        n_bytes = len(batch[0].payload)
+        while len(batch) < self.batch_size:
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(job)
+            n_bytes += len(job.payload)
+            if n_bytes >= self.batch_bytes:
+                break
+        PRINT_QUEUE.labels(self.name).set(self.queue.qsize())
+        return batch
+
+    def send_batch(self, batch: List[PrintJob]):
+        payload = b"".join(job.payload for job in batch)
+        error = "Printer stopped."
+        for attempt in range(self.max_retries + 1):
+            if self._stop.is_set() and attempt > 0:
+                break
+            try:
+                self.connection.send(payload)
+            except OSError as ex:
+                error = f"{type(ex).__name__}: {ex}"
+                logging.warning(f"Printer {self.name}: sending {len(batch)} jobs failed (attempt {attempt + 1}): {error}")
+                continue
+            self.n_jobs += len(batch)
+            self.n_batches += 1
+            self.n_bytes += len(payload)
+            PRINT_BATCHES.labels(self.name).inc()
+            for job in batch:
+                job.finish()
+            return
+
+        self.n_failed += len(batch)
+        for job in batch:
+            job.finish(error=error)
+
+    def run(self):
+        while not self._stop.is_set():
+            batch = self.next_batch()
+            if batch:
+                self.send_batch(batch)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "address": f"{self.connection.host}:{self.connection.port}",
+            "connected": self.connection.connected,
+            "queued": self.queue.qsize(),
+            "jobs": self.n_jobs,
+            "batches": self.n_batches,
+            "bytes": self.n_bytes,
+            "failed": self.n_failed,
+        }
+
+
+class PrintSpooler:
+    """print jobs for a set of named printers, e.g. {"line-1": "10.0.0.21:9100"}; keeps the most recent jobs"""
+    def __init__(self, printers: Dict[str, Union[str, Tuple[str, int]]] = None, max_jobs: int = 10000, **kwargs):
+        self.printers: Dict[str, Printer] = {
+            name: Printer(name, address, **kwargs) for name, address in (printers or dict()).items()
+        }
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[int, PrintJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"PrintSpooler(printers={list(self.printers)})"
+
+    def start(self):
+        for printer in self.printers.values():
+            printer.start()
+
+    def stop(self, timeout: float = None):
+        for printer in self.printers.values():
+            printer.stop(timeout)
+
+    def submit(self, printer: str, payload: Union[bytes, str]) -> PrintJob:
+        if printer not in self.printers:
+            raise KeyError(f"Unknown printer '{printer}'. Available printers: {list(self.printers)}.")
+        if isinstance(payload, str):
+            payload = payload.encode("ascii")
+
+        job = PrintJob(printer, payload)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self.printers[printer].submit(job)
+        return job
+
+    def get_job(self, job_id: int) -> Union[PrintJob, None]:
+        return self._jobs.get(job_id)
+
+    def status(self) -> Dict[str, Any]:
+        return {name: printer.status() for name, printer in self.printers.items()}
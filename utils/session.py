@@ -0,0 +1,142 @@
+import base64
+import json
+from datetime import datetime
+
+from DataMatrixCode import DataMatrixCode, FORMAT_ANSI_MH_10
+
+from typing import Union, Dict, List, Tuple, Any
+
+
+# output of a session that is not an encoded image: the module matrix as rows of "0" (light) and "1" (dark)
+OUTPUT_MODULES = "modules"
+
+
+class SessionOptions:
+    """options of a generation session, negotiated once by the first frame {"type": "options", ...}"""
+    def __init__(
+            self,
+            rectangular_dmc: bool = False,
+            n_quiet_zone_moduls: int = 2,
+            use_format_envelope: bool = False,
+            use_message_envelope: bool = True,
+            output_format: str = "png",
+            module_size_dots: int = None,
+            dpi: int = 203,
+            encoding: str = "base64",
+            max_in_flight: int = 16,
+            output_formats: List[str] = None
+    ):
+        output_format = output_format.lower()
+        if output_formats is not None and output_format not in output_formats + [OUTPUT_MODULES]:
+            raise ValueError(f"Unknown output format '{output_format}'. "
+                             f"Use one of {output_formats + [OUTPUT_MODULES]}.")
+        if encoding not in ("base64", "binary"):
+            raise ValueError(f"Unknown encoding '{encoding}'. Use 'base64' or 'binary'.")
+        if not 1 <= max_in_flight <= 1024:
+            raise ValueError(f"max_in_flight must be between 1 and 1024, not {max_in_flight}.")
+
+        self.rectangular_dmc = rectangular_dmc
+        self.n_quiet_zone_moduls = n_quiet_zone_moduls
+        self.use_format_envelope = use_format_envelope
+        self.use_message_envelope = use_message_envelope
+        self.output_format = output_format
+        self.module_size_dots = module_size_dots
+        self.dpi = dpi
+        self.encoding = encoding
+        self.max_in_flight = max_in_flight
+
+    def __repr__(self):
+        return f"SessionOptions({self.to_dict()})"
+
+    @classmethod
+    def from_dict(cls, options: Dict[str, Any], output_formats: List[str] = None) -> "SessionOptions":
+        options = {ky: val for ky, val in options.items() if ky != "type"}
+        return cls(**options, output_formats=output_formats)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+    def image_options(self) -> Dict[str, Any]:
+        return {
+            "rectangular_dmc": self.rectangular_dmc,
+            "n_quiet_zone_modules": self.n_quiet_zone_moduls,
+            "output_format": self.output_format,
+            "module_size_dots": self.module_size_dots,
+            "dpi": self.dpi,
+        }
+
+
+class SessionRequest:
+    """one request of a session: a raw message string or the (envelope) data of a message"""
+    def __init__(self, request_id: Union[int, str], text: str = None, data: Dict[str, Any] = None):
+        self.id = request_id
+        self.text = text
+        self.data = data
+        self.received = datetime.now()
+
+    def __repr__(self):
+        return f"SessionRequest({self.id})"
+
+    def get_message(self, options: SessionOptions) -> str:
+        """message string of the request; data are formatted with the envelope options of the session"""
+        if self.text is not None:
+            return self.text
+        # the fields are validated by the message builder; no data model per message
+        messages = self.data.get("messages")
+        if not messages or not isinstance(messages, list):
+            raise ValueError("Data of a message need a non-empty list 'messages' of envelopes {format, fields}.")
+        envelopes = [{msg.get("format", FORMAT_ANSI_MH_10): msg["fields"]} for msg in messages]
+        code = DataMatrixCode(
+            data=envelopes,
+            use_format_envelope=options.use_format_envelope,
+            use_message_envelope=options.use_message_envelope
+        )
+        return code.get_message()
+
+
+def parse_frame(frame: str, next_id: int) -> Union[SessionRequest, Dict[str, Any]]:
+    """
+    A text frame is either a JSON object ({"type": "options", ...} or a request {"id", "text"} / {"id", "data"})
+    or a raw message string. Requests without id are numbered consecutively.
+    """
+    try:
+        content = json.loads(frame)
+    except json.JSONDecodeError:
+        content = frame
+
+    if isinstance(content, str):
+        return SessionRequest(next_id, text=content)
+    if not isinstance(content, dict):
+        raise ValueError("A frame must be a JSON object or a message string.")
+    if content.get("type") == "options":
+        return content
+
+    request_id = content.get("id", next_id)
+    if "text" in content:
+        return SessionRequest(request_id, text=content["text"])
+    elif "data" in content:
+        return SessionRequest(request_id, data=content["data"])
+    else:
+        raise ValueError("A request needs either 'text' (message string) or 'data' (MessageData).")
+
+
+def modules_to_rows(modules) -> List[str]:
+    """module matrix (pillow image with one pixel per module) as rows of "0" (light) and "1" (dark)"""
+    width = modules.width
+    values = modules.convert("L").tobytes()
+    return ["".join("0" if v else "1" for v in values[i:i + width]) for i in range(0, len(values), width)]
+
+
+def build_response(request_id: Union[int, str], message: str, content: Union[bytes, List[str]],
+                   options: SessionOptions) -> Tuple[Dict[str, Any], Union[bytes, None]]:
+    """JSON response of a request and the binary frame that follows it (encoding 'binary')"""
+    response = {"id": request_id, "message": message}
+    if options.output_format == OUTPUT_MODULES:
+        response["modules"] = content
+        return response, None
+    elif options.encoding == "binary":
+        response["size"] = len(content)
+        return response, content
+    else:
+        response["image"] = base64.b64encode(content).decode("ascii")
+        return response, None
@@ -0,0 +1,155 @@
+import hashlib
+import logging
+import sqlite3
+import struct
+import threading
+import time
+from pathlib import Path
+
+from PIL import Image
+from prometheus_client import Counter, Gauge
+
+from typing import Hashable, Union, Dict, List, Any
+
+
+SHARED_CACHE_HITS = Counter("dmc_shared_cache_hits_total", "Number of hits of the host-wide cache.", ["namespace"])
+SHARED_CACHE_MISSES = Counter("dmc_shared_cache_misses_total", "Number of misses of the host-wide cache.", ["namespace"])
+SHARED_CACHE_ERRORS = Counter("dmc_shared_cache_errors_total", "Number of failed accesses of the host-wide cache.")
+SHARED_CACHE_BYTES = Gauge("dmc_shared_cache_bytes", "Total size of the entries of the host-wide cache "
+                                                      "(as of the last eviction check).")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key BLOB PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+"""
+
+
+class SharedCache:
+    """
+    Host-wide cache of bytes in a local SQLite database (WAL) that every worker process of the api opens, so that
+    what one worker rendered is found by the others. Entries are grouped by namespace. The cache is limited by
+    max_bytes; the least recently used entries are evicted. Accesses are recorded with a resolution of
+    touch_interval seconds, so that most reads do not write. Errors (e.g. a locked database) count as misses.
+    """
+    def __init__(self, path: Union[str, Path] = "data/cache.sqlite", max_bytes: int = 256 * 2**20,
+                 touch_interval: float = 60, timeout: float = 1):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.timeout = timeout
+        # one connection per thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._n_bytes_written = 0
+        db = self._connection()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(SCHEMA)
+
+    def __repr__(self):
+        return f"SharedCache({self.path}, max_bytes={self.max_bytes})"
+
+    def _connection(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def make_key(namespace: str, key: Hashable) -> bytes:
+        # repr of tuples of strings, numbers, booleans and None is the same in all processes (unlike hash())
+        return hashlib.sha256(repr((namespace, key)).encode("utf-8")).digest()
+
+    def get(self, namespace: str, key: Hashable) -> Union[bytes, None]:
+        db_key = self.make_key(namespace, key)
+        try:
+            db = self._connection()
+            row = db.execute("SELECT value, accessed FROM cache WHERE key = ?", (db_key,)).fetchone()
+            if row is not None and time.time() - row[1] > self.touch_interval:
+                db.execute("UPDATE cache SET accessed = ? WHERE key = ?", (time.time(), db_key))
+        except sqlite3.Error as ex:
+            logging.debug(f"SharedCache.get(): {type(ex).__name__}: {ex}")
+            SHARED_CACHE_ERRORS.inc()
+            row = None
+        (SHARED_CACHE_HITS if row is not None else SHARED_CACHE_MISSES).labels(namespace).inc()
+        return row[0] if row is not None else None
+
+    def put(self, namespace: str, key: Hashable, value: bytes) -> bool:
+        if len(value) > self.max_bytes:
+            return False
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (self.make_key(namespace, key), value, len(value), time.time())
+            )
+        except sqlite3.Error as ex:
+            logging.debug(f"SharedCache.put(): {type(ex).__name__}: {ex}")
+            SHARED_CACHE_ERRORS.inc()
+            return False
+
+        # the size of the database is checked after every 1/16 of max_bytes written by this process
+        with self._lock:
+            self._n_bytes_written += len(value)
+            check = self._n_bytes_written > self.max_bytes // 16
+            if check:
+                self._n_bytes_written = 0
+        if check:
+            self.evict()
+        return True
+
+    def evict(self, fill_ratio: float = 0.9) -> int:
+        """deletes the least recently used entries if the cache exceeds max_bytes (down to fill_ratio * max_bytes)"""
+        db = self._connection()
+        try:
+            n_bytes, = db.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()
+            keys: List[bytes] = []
+            if n_bytes > self.max_bytes:
+                excess = n_bytes - int(self.max_bytes * fill_ratio)
+                cursor = db.execute("SELECT key, size FROM cache ORDER BY accessed")
+                while excess > 0:
+                    rows = cursor.fetchmany(1000)
+                    if not rows:
+                        break
+                    for key, size in rows:
+                        keys.append(key)
+                        excess -= size
+                        n_bytes -= size
+                        if excess <= 0:
+                            break
+                cursor.close()
+                db.execute("BEGIN IMMEDIATE")
+                db.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+                db.execute("COMMIT")
+        except sqlite3.Error as ex:
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+            logging.warning(f"SharedCache.evict(): {type(ex).__name__}: {ex}")
+            SHARED_CACHE_ERRORS.inc()
+            return 0
+        SHARED_CACHE_BYTES.set(n_bytes)
+        return len(keys)
+
+    def clear(self):
+        self._connection().execute("DELETE FROM cache")
+        SHARED_CACHE_BYTES.set(0)
+
+    def info(self) -> Dict[str, Any]:
+        n_items, n_bytes = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {"path": str(self.path), "items": n_items, "bytes": n_bytes, "max_bytes": self.max_bytes}
+
+
+def pack_bitmap(img: Image.Image) -> bytes:
+    """binary (mode '1') pillow image as bytes: width, height and the packed pixels"""
+    return struct.pack("<II", img.width, img.height) + img.tobytes()
+
+
+def unpack_bitmap(content: bytes) -> Image.Image:
+    width, height = struct.unpack_from("<II", content)
+    return Image.frombytes("1", (width, height), content[8:])
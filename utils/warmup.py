@@ -0,0 +1,95 @@
+import io
+import logging
+import threading
+from datetime import datetime
+
+from DataMatrixCode import FORMAT_ANSI_MH_10, message_formats
+from DataMatrixCode.DMCText import put_into_message_envelope
+from DataMatrixCode.utils.format_specifications import compile_format_pattern
+
+from typing import List, Dict, Any
+
+
+# number of characters of the warm-up messages: covers the common symbol sizes (10x10 ... 52x52 modules)
+WARMUP_MESSAGE_LENGTHS = [6, 16, 30, 60, 120, 200]
+# rectangular symbols are limited to small messages
+WARMUP_MESSAGE_LENGTHS_RECTANGULAR = [6, 20, 40]
+
+
+def precompile_validators(di_format: str = FORMAT_ANSI_MH_10) -> int:
+    """loads the table of data identifiers and compiles the patterns of all format specifications"""
+    n = 0
+    for di, info in message_formats(di_format).get_di_mapping().items():
+        if info["Meta Data"] != "":
+            try:
+                compile_format_pattern(info["Meta Data"])
+                n += 1
+            except ValueError as ex:
+                logging.debug(f"precompile_validators(): skipping format specification of '{di}': {ex}")
+    return n
+
+
+def warm_up_renderer(
+        message_lengths: List[int] = None,
+        message_lengths_rectangular: List[int] = None,
+        n_quiet_zone_modules: int = 2
+) -> int:
+    """renders (and PNG-encodes) symbols of common sizes to load treepoem, ghostscript, and the pillow codecs"""
+    from DataMatrixCode import DMCGenerator
+
+    if message_lengths is None:
+        message_lengths = WARMUP_MESSAGE_LENGTHS
+    if message_lengths_rectangular is None:
+        message_lengths_rectangular = WARMUP_MESSAGE_LENGTHS_RECTANGULAR
+
+    symbols = [(n, False) for n in message_lengths] + [(n, True) for n in message_lengths_rectangular]
+    for n_characters, rectangular_dmc in symbols:
+        message = put_into_message_envelope("S" + ("1234567890" * (n_characters // 10 + 1))[:n_characters])
+        img = DMCGenerator(message).generate(n_quiet_zone_modules=n_quiet_zone_modules, rectangular_dmc=rectangular_dmc)
+        img.save(io.BytesIO(), format="PNG")
+    return len(symbols)
+
+
+class WarmUp:
+    """state of the warm-up phase of the api; ready is set once the warm-up succeeded"""
+    def __init__(self, render: bool = True):
+        self.render = render
+        self.ready = threading.Event()
+        self.started: datetime = None
+        self.finished: datetime = None
+        self.steps: Dict[str, Any] = dict()
+        self.error: str = None
+
+    def __repr__(self):
+        return f"WarmUp(render={self.render}, ready={self.ready.is_set()})"
+
+    def run(self) -> bool:
+        self.started = datetime.now()
+        logging.info("Warm-up started.")
+        try:
+            self.steps["validators"] = precompile_validators()
+            if self.render:
+                self.steps["symbols"] = warm_up_renderer()
+        except Exception as ex:
+            self.error = f"{type(ex).__name__}: {ex}"
+            logging.error(f"Warm-up failed: {self.error}")
+        else:
+            self.ready.set()
+        self.finished = datetime.now()
+        logging.info(f"Warm-up finished in {(self.finished - self.started).total_seconds():.2f}s: {self.steps}")
+        return self.ready.is_set()
+
+    def start(self) -> threading.Thread:
+        """runs the warm-up in a background thread, so that the server answers liveness probes in the meantime"""
+        thread = threading.Thread(target=self.run, name="warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready.is_set(),
+            "started": self.started,
+            "finished": self.finished,
+            "steps": self.steps,
+            "error": self.error,
+        }
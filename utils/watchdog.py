@@ -0,0 +1,360 @@
+import contextvars
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+
+import treepoem
+from PIL import Image
+from prometheus_client import Counter, Gauge
+
+from DataMatrixCode.DMCGenerator import RenderTimeout, check_deadline, render_barcode
+
+from typing import Callable, Union, Dict, List, Any
+
+
+RENDER_TIMEOUTS = Counter("dmc_render_timeouts_total", "Number of renders aborted at their deadline.")
+RENDER_CANCELLED = Counter("dmc_render_cancelled_total", "Number of renders cancelled because the client went away.")
+RENDER_RESTARTS = Counter("dmc_render_process_restarts_total", "Number of killed and restarted render processes.")
+RENDER_HANDOFF_BYTES = Counter("dmc_render_handoff_bytes_total", "Bytes of rendered symbols received from the render "
+                                                                 "processes.")
+RENDER_CIRCUIT_STATE = Gauge("dmc_render_circuit_state", "State of the circuit breaker of the renderer "
+                                                          "(0: closed, 1: open, 2: half open).")
+
+
+class RenderCancelled(Exception):
+    """the client of the render went away"""
+
+
+class RenderProcessError(RuntimeError):
+    """the render process crashed or ghostscript failed"""
+
+
+# errors of the input of a render (e.g. an unknown barcode type or option); all others are failures of the renderer
+INPUT_ERRORS = (ValueError, TypeError, NotImplementedError)
+
+
+def is_input_error(ex: Exception) -> bool:
+    """
+    whether a failed render is due to its input and not to the renderer; treepoem raises both BWIPP rejecting the
+    data and a missing or failing ghostscript as TreepoemError
+    """
+    if isinstance(ex, treepoem.TreepoemError):
+        return "bwipp" in str(ex).lower()
+    return isinstance(ex, INPUT_ERRORS)
+
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"The renderer is unavailable. Retry in {retry_after:.0f} s.")
+        self.retry_after = retry_after
+
+
+# ----- deadline and cancellation of a request
+_SCOPE: contextvars.ContextVar = contextvars.ContextVar("render_scope", default=None)
+
+
+class RenderScope:
+    """
+    deadline and cancellation of the renders of one request (or one label of a stream); use_cache=False keeps
+    one-off renders (batch jobs) out of the caches
+    """
+    def __init__(self, timeout: Union[float, None] = None, use_cache: bool = True):
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.cancelled = threading.Event()
+        self.use_cache = use_cache
+
+    def __repr__(self):
+        return f"RenderScope(deadline={self.deadline}, cancelled={self.cancelled.is_set()}, use_cache={self.use_cache})"
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise RenderCancelled("The client went away.")
+        check_deadline(self.deadline)
+
+    def run(self, fnc: Callable, *args, **kwargs):
+        """calls fnc within the scope (in the calling thread)"""
+        token = _SCOPE.set(self)
+        try:
+            return fnc(*args, **kwargs)
+        finally:
+            _SCOPE.reset(token)
+
+
+def current_scope() -> Union[RenderScope, None]:
+    return _SCOPE.get()
+
+
+# ----- render processes
+def _render_worker(conn):
+    if hasattr(os, "setsid"):
+        # own process group, so that ghostscript is killed together with the worker
+        os.setsid()
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+        try:
+            img = render_barcode(*task)
+            # the packed 1-bit pixels (a few KB per symbol)
+            conn.send(("ok", img.size, img.tobytes()))
+        except Exception as ex:
+            conn.send(("error" if is_input_error(ex) else "failure", type(ex).__name__, str(ex)))
+
+
+class RenderWorker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_render_worker, args=(child_conn,), name="dmc-render", daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def __repr__(self):
+        return f"RenderWorker(pid={self.process.pid}, alive={self.process.is_alive()})"
+
+    def kill(self):
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (AttributeError, OSError):
+            # no process groups (Windows) or setsid() did not run yet
+            self.process.kill()
+        self.process.join(1)
+        self.conn.close()
+
+    def close(self, timeout: float = 1):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class RenderPool:
+    """
+    Renders the symbols (ghostscript) in n_processes separate processes. A render that exceeds its deadline or the
+    timeout of the watchdog, or whose request was cancelled, is aborted by killing the process (and its ghostscript
+    child) and starting a new one. With n_processes=0 the symbols are rendered in the calling thread, and the
+    deadline can only be checked before and after the call of ghostscript.
+    """
+    def __init__(self, n_processes: int = 4, timeout: float = 10, poll_interval: float = 0.05):
+        self.n_processes = n_processes
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[RenderWorker]" = queue.Queue()
+        self._workers: List[RenderWorker] = []
+        self._lock = threading.Lock()
+        self._running = False
+        # processes that could not be started are started again at the next render after respawn_interval
+        self.respawn_interval = 1.0
+        self._next_spawn = 0.0
+
+    def __repr__(self):
+        return f"RenderPool(processes={self.n_processes}, timeout={self.timeout})"
+
+    def start(self):
+        with self._lock:
+            self._running = True
+            while len(self._workers) < self.n_processes:
+                worker = RenderWorker(self._context)
+                self._workers.append(worker)
+                self._idle.put(worker)
+
+    def stop(self, timeout: float = 1):
+        with self._lock:
+            self._running = False
+            workers, self._workers = self._workers, []
+            self._idle = queue.Queue()
+        for worker in workers:
+            worker.close(timeout)
+
+    def _spawn(self):
+        """starts the missing processes; a failed start is retried after respawn_interval instead of shrinking the pool"""
+        with self._lock:
+            n_missing = self.n_processes - len(self._workers) if self._running else 0
+        for _ in range(n_missing):
+            try:
+                new_worker = RenderWorker(self._context)
+            except Exception as ex:
+                logging.warning(f"RenderPool: a render process could not be started: {type(ex).__name__}: {ex}")
+                self._next_spawn = time.monotonic() + self.respawn_interval
+                return
+            with self._lock:
+                if not self._running or len(self._workers) >= self.n_processes:
+                    new_worker.close()
+                    return
+                self._workers.append(new_worker)
+            self._idle.put(new_worker)
+
+    def _replace(self, worker: RenderWorker):
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        worker.kill()
+        RENDER_RESTARTS.inc()
+        self._spawn()
+
+    def render(self, barcode_type: str, data: str, options: Union[Dict[str, Any], None] = None,
+               deadline: Union[float, None] = None) -> Image.Image:
+        scope = current_scope()
+        if scope is not None:
+            scope.check()
+            if scope.deadline is not None:
+                deadline = scope.deadline if deadline is None else min(deadline, scope.deadline)
+        if not self.n_processes:
+            try:
+                img = render_barcode(barcode_type, data, options)
+            except Exception as ex:
+                if is_input_error(ex):
+                    raise
+                raise RenderProcessError(f"{type(ex).__name__}: {ex}") from ex
+            check_deadline(deadline)
+            return img
+        if len(self._workers) < self.n_processes and time.monotonic() >= self._next_spawn:
+            self._spawn()
+
+        # the watchdog: no render runs longer than timeout
+        limit = time.monotonic() + self.timeout
+        deadline = limit if deadline is None else min(deadline, limit)
+        try:
+            worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+        except queue.Empty:
+            RENDER_TIMEOUTS.inc()
+            raise RenderTimeout("No render process became available before the deadline.")
+
+        try:
+            worker.conn.send((barcode_type, data, options))
+            while not worker.conn.poll(self.poll_interval):
+                if scope is not None and scope.cancelled.is_set():
+                    RENDER_CANCELLED.inc()
+                    raise RenderCancelled("The client went away.")
+                if time.monotonic() >= deadline:
+                    RENDER_TIMEOUTS.inc()
+                    raise RenderTimeout("Deadline of the render exceeded.")
+            status, *result = worker.conn.recv()
+        except (RenderTimeout, RenderCancelled):
+            self._replace(worker)
+            worker = None
+            raise
+        except (EOFError, OSError) as ex:
+            logging.warning(f"RenderPool: render process {worker.process.pid} died: {type(ex).__name__}: {ex}")
+            self._replace(worker)
+            worker = None
+            raise RenderProcessError("The render process died.")
+        finally:
+            if worker is not None:
+                self._idle.put(worker)
+
+        if status == "error":
+            name, detail = result
+            if name == "TreepoemError":
+                # as if rendered in this process (BWIPP rejected the data)
+                raise treepoem.TreepoemError(detail)
+            raise ValueError(f"{name}: {detail}")
+        if status == "failure":
+            # e.g. ghostscript is missing or failed
+            name, detail = result
+            raise RenderProcessError(f"{name}: {detail}")
+        size, content = result
+        RENDER_HANDOFF_BYTES.inc(len(content))
+        return Image.frombytes("1", size, content)
+
+    def status(self) -> Dict[str, Any]:
+        return {"processes": self.n_processes, "running": len(self._workers), "timeout": self.timeout,
+                "idle": self._idle.qsize()}
+
+
+# ----- circuit breaker
+class CircuitBreaker:
+    """
+    Fails fast while the renderer is unhealthy: after failure_threshold consecutive failures (deadlines, crashed or
+    failing ghostscript) calls are rejected with CircuitOpen for reset_timeout seconds. Then a single trial call is
+    let through (half open); its outcome closes the circuit again or reopens it. Errors of the input (see
+    is_input_error()) count as successful calls of the renderer.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+    FAILURES = (RenderTimeout, RenderProcessError, subprocess.SubprocessError, OSError)
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.n_failures = 0
+        self._opened = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"CircuitBreaker(state={self.state}, failures={self.n_failures})"
+
+    def _set_state(self, state: str):
+        self.state = state
+        RENDER_CIRCUIT_STATE.set({self.CLOSED: 0, self.OPEN: 1, self.HALF_OPEN: 2}[state])
+
+    def before(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                retry_after = self._opened + self.reset_timeout - time.monotonic()
+                if retry_after > 0:
+                    raise CircuitOpen(retry_after)
+                self._set_state(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._trial:
+                    raise CircuitOpen(1)
+                self._trial = True
+
+    def success(self):
+        with self._lock:
+            self._trial = False
+            self.n_failures = 0
+            if self.state != self.CLOSED:
+                logging.info("CircuitBreaker: the renderer recovered; circuit closed.")
+                self._set_state(self.CLOSED)
+
+    def failure(self):
+        with self._lock:
+            self._trial = False
+            self.n_failures += 1
+            if self.state == self.HALF_OPEN or self.n_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logging.warning(f"CircuitBreaker: {self.n_failures} failures of the renderer; circuit open.")
+                self._set_state(self.OPEN)
+                self._opened = time.monotonic()
+
+    def call(self, fnc: Callable, *args, **kwargs):
+        self.before()
+        try:
+            result = fnc(*args, **kwargs)
+        except self.FAILURES:
+            self.failure()
+            raise
+        except RenderCancelled:
+            # says nothing about the renderer
+            with self._lock:
+                self._trial = False
+            raise
+        except Exception as ex:
+            if is_input_error(ex):
+                self.success()
+            else:
+                self.failure()
+            raise
+        self.success()
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.n_failures}